@@ -4,8 +4,9 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
-import ctypes
+import logging
 import sys
+from functools import lru_cache
 
 from pathlib import Path
 from typing import cast, Dict, List, Optional, Tuple
@@ -48,10 +49,26 @@ XNN_TYPE_MAP = {
 }
 
 from executorch.backends.xnnpack.serialization.xnnpack_graph_serialize import (
-    _aligned_size,
-    _pad_to,
+    _padding_required,
     CONSTANT_TENSOR_ALIGNMENT,
 )
+from executorch.exir._serialize._cord import Cord
+
+
+@lru_cache(maxsize=None)
+def _load_aot_util() -> bool:
+    """
+    Loads the library with the native convert_to_qc4w kernel, once per process.
+    Returns False if it is not available.
+    """
+    try:
+        torch.ops.load_library(NodeVisitor.find_aot_util_path())
+    except (OSError, RuntimeError):
+        logging.info(
+            "libaot_util is not available, packing 4-bit weights with tensor ops"
+        )
+        return False
+    return True
 
 
 class InputTypeToIndex:
@@ -88,11 +105,11 @@ class NodeVisitor:
         self,
         exported_program: ExportedProgram,
         external_ids: Dict,
-        constant_data_bytes: bytearray,
+        constant_data: Cord,
     ) -> None:
         self._external_ids = external_ids or {}
         self._exported_program = exported_program or None
-        self._constant_data_bytes = constant_data_bytes
+        self._constant_data = constant_data
 
     @property
     def external_ids(self) -> Dict:
@@ -470,7 +487,7 @@ class NodeVisitor:
         import torch.nn.functional as F
 
         # Assert we got a properly quantized tensor.
-        min, max = inp.min().item(), inp.max().item()
+        min, max = (v.item() for v in torch.aminmax(inp))
         assert (
             max <= 7 and min >= -8
         ), f"convert_to_qc4w: [min,max] out of [-8, 7] range, got [{min}, {max}]"
@@ -488,27 +505,22 @@ class NodeVisitor:
             inp = F.pad(input=inp, pad=(0, 1, 0, 0), mode="constant", value=0)
 
         # Adjust inp tensor for zp
-        inp = inp.to(dtype=torch.uint8) + 8
-
-        # prepare result tensor
-        ric = int((ic + 1) / 2)
-        result = torch.zeros([oc, ric], dtype=torch.uint8)
-
-        try:
-            aot_path = NodeVisitor.find_aot_util_path()
-            torch.ops.load_library(aot_path)
-            result = torch.ops.xnnpack.convert_to_qc4w(inp)
-        except:
-            # Fallback to python implementation
-            # TODO Warn the user? They might be developing in-tree and didn't install,
-            # in which case, this will be very slow for large models.
-            for o in range(oc):
-                for i in range(ric):
-                    j = 2 * i
-                    result[o][i] = inp[o][j]
-                    result[o][i] += inp[o][j + 1] << 4
-
-        return result
+        inp = (inp.to(dtype=torch.uint8) + 8).contiguous()
+
+        if _load_aot_util():
+            return torch.ops.xnnpack.convert_to_qc4w(inp)
+        # Even input channels go in the low nibble, odd ones in the high nibble.
+        return inp[:, 0::2] | (inp[:, 1::2] << 4)
+
+    @staticmethod
+    def convert_from_qc4w(packed: torch.Tensor, ic: int) -> torch.Tensor:
+        """
+        Inverse of convert_to_qc4w: unpacks a [oc, (ic + 1) // 2] uint8 tensor into
+        the [oc, ic] int8 tensor of values in [-8, 7] it was packed from.
+        """
+        unpacked = torch.stack([packed & 0xF, packed >> 4], dim=-1)
+        unpacked = unpacked.view(packed.shape[0], -1)[:, :ic]
+        return unpacked.to(dtype=torch.int8) - 8
 
     def get_serialized_buffer_index(
         self,
@@ -576,18 +588,16 @@ class NodeVisitor:
         if quant_params is not None and quant_params.is_qc4w:
             const_val = self.convert_to_qc4w(const_val)
 
-        array_type = ctypes.c_char * const_val.untyped_storage().nbytes()
-        array = ctypes.cast(
-            const_val.untyped_storage().data_ptr(),
-            ctypes.POINTER(array_type),
-        ).contents
-
-        offset = len(self._constant_data_bytes)
-        size = const_val.untyped_storage().nbytes()
+        # Reference the storage instead of copying it; the data is only copied
+        # once, when the delegate blob is assembled.
+        storage = const_val.untyped_storage()
+        offset = len(self._constant_data)
+        size = storage.nbytes()
         xnn_graph.constant_data.append(ConstantDataOffset(offset=offset, size=size))
-        self._constant_data_bytes.extend(
-            _pad_to(bytes(array), _aligned_size(size, CONSTANT_TENSOR_ALIGNMENT))
-        )
+        self._constant_data.append(storage)
+        padding = _padding_required(size, CONSTANT_TENSOR_ALIGNMENT)
+        if padding:
+            self._constant_data.append(b"\x00" * padding)
 
         return buffer_idx
 
@@ -4,18 +4,22 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import functools
 import json
 import os
 import tempfile
 
 from dataclasses import dataclass, fields, is_dataclass
-from typing import ClassVar, Literal
+from typing import ClassVar, Literal, Union
 
 import pkg_resources
 from executorch.backends.xnnpack.serialization.xnnpack_graph_schema import XNNGraph
+from executorch.exir._serialize._cord import Cord
 from executorch.exir._serialize._dataclass import _DataclassEncoder
 
-from executorch.exir._serialize._flatbuffer import _flatc_compile
+from executorch.exir._serialize._flatbuffer import _flatc_compile, _use_flatc
+from executorch.exir._serialize._flatbuffer_builder import _dataclass_to_flatbuffer
+from executorch.exir._serialize._flatbuffer_schema import _parse_schema, _Schema
 
 # Byte order of numbers written to program headers. Always little-endian
 # regardless of the host system, since all commonly-used modern CPUs are little
@@ -283,8 +287,15 @@ def pretty_print_xnngraph(xnnpack_graph_json: str):
     pprint(d)
 
 
-def convert_to_flatbuffer(xnnpack_graph: XNNGraph) -> bytes:
-    sanity_check_xnngraph_dataclass(xnnpack_graph)
+@functools.lru_cache(maxsize=None)
+def _load_xnnpack_schema() -> _Schema:
+    """Returns the parsed XNNPACK flatbuffer schema."""
+    return _parse_schema(
+        "schema.fbs", lambda name: pkg_resources.resource_string(__name__, name)
+    )
+
+
+def _convert_to_flatbuffer_with_flatc(xnnpack_graph: XNNGraph) -> bytes:
     xnnpack_graph_json = json.dumps(xnnpack_graph, cls=_DataclassEncoder)
     with tempfile.TemporaryDirectory() as d:
         schema_path = os.path.join(d, "schema.fbs")
@@ -300,13 +311,28 @@ def convert_to_flatbuffer(xnnpack_graph: XNNGraph) -> bytes:
             return output_file.read()
 
 
+def convert_to_flatbuffer(xnnpack_graph: XNNGraph) -> bytes:
+    """Serializes the XNNGraph to binary flatbuffer data.
+
+    The data is written in process from the XNNGraph dataclasses. Setting the
+    ET_EXIR_SERIALIZE_WITH_FLATC environment variable to 1 converts the graph
+    to JSON and compiles it with `flatc` instead.
+    """
+    sanity_check_xnngraph_dataclass(xnnpack_graph)
+    if _use_flatc():
+        return _convert_to_flatbuffer_with_flatc(xnnpack_graph)
+    return bytes(_dataclass_to_flatbuffer(xnnpack_graph, _load_xnnpack_schema()))
+
+
 def serialize_xnnpack_binary(
-    xnnpack_graph: XNNGraph, constant_data_bytes: bytearray
+    xnnpack_graph: XNNGraph, constant_data: Union[bytes, bytearray, Cord]
 ) -> bytes:
     """Returns the runtime binary representation of the given XNNGraph.
 
     Args:
         xnnpack_graph: XNNGraph object to serialize.
+        constant_data: The constant data referenced by the graph. It is copied
+            into the result exactly once.
 
     Returns:
         The serialized form of the XNNGraph, ready for execution by XNNPACK Backend
@@ -330,13 +356,10 @@ def serialize_xnnpack_binary(
         flatbuffer_offset=padded_header_length,
         flatbuffer_size=len(flatbuffer_payload),
         constant_data_offset=padded_header_length + padded_flatbuffer_length,
-        constant_data_size=len(constant_data_bytes),
+        constant_data_size=len(constant_data),
     ).to_bytes()
 
-    return b"".join(
-        [
-            _pad_to(header, padded_header_length),
-            _pad_to(flatbuffer_payload, padded_flatbuffer_length),
-            constant_data_bytes,
-        ]
-    )
+    binary = Cord(_pad_to(header, padded_header_length))
+    binary.append(_pad_to(flatbuffer_payload, padded_flatbuffer_length))
+    binary.append(constant_data)
+    return bytes(binary)
@@ -7,6 +7,7 @@
 import unittest
 
 import torch
+from executorch.backends.xnnpack.operators.node_visitor import NodeVisitor
 
 
 class TestCustomQC4WConvert(unittest.TestCase):
@@ -52,3 +53,17 @@ class TestCustomQC4WConvert(unittest.TestCase):
         except:
             exception_thrown = True
         self.assertTrue(exception_thrown)
+
+
+class TestQC4WPacking(unittest.TestCase):
+    def test_pack_unpack(self):
+        for shape in [(20, 42), (20, 41), (1, 1)]:
+            inp = torch.randint(low=-8, high=8, size=shape, dtype=torch.int8)
+            packed = NodeVisitor.convert_to_qc4w(inp)
+            self.assertEqual(packed.shape, (shape[0], (shape[1] + 1) // 2))
+            self.assertEqual(packed.dtype, torch.uint8)
+            # Even input channels are in the low nibbles, odd ones in the high nibbles
+            self.assertTrue(torch.equal(packed[:, 0] & 0xF, (inp[:, 0] + 8).byte()))
+            self.assertTrue(
+                torch.equal(NodeVisitor.convert_from_qc4w(packed, shape[1]), inp)
+            )
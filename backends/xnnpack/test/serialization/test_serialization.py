@@ -4,18 +4,36 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import math
+import os
 import unittest
+from unittest.mock import patch
+
+import torch
 
 from executorch.backends.xnnpack.serialization.xnnpack_graph_schema import (
     ConstantDataOffset,
+    OutputMinMax,
+    PerChannelQuant,
+    XNNAdd,
+    XNNDatatype,
     XNNGraph,
+    XNNQuantizedTensorValue,
+    XNNTensorValue,
+    XNode,
+    XValue,
 )
 
 from executorch.backends.xnnpack.serialization.xnnpack_graph_serialize import (
     _HEADER_BYTEORDER,
+    _load_xnnpack_schema,
+    convert_to_flatbuffer,
     serialize_xnnpack_binary,
     XNNHeader,
 )
+from executorch.exir._serialize._cord import Cord
+from executorch.exir._serialize._flatbuffer import _USE_FLATC_ENV
+from executorch.exir._serialize._flatbuffer_reader import _read_flatbuffer
 
 
 class TestSerialization(unittest.TestCase):
@@ -48,3 +66,76 @@ class TestSerialization(unittest.TestCase):
         self.assertEqual(
             serialized_binary[flatbuffer_offset:][XNNHeader.MAGIC_OFFSET], b"XN01"
         )
+
+    def test_serialize_xnnpack_binary_with_cord(self):
+        xnn_graph = XNNGraph(
+            version="0",
+            xnodes=[],
+            xvalues=[],
+            num_externs=0,
+            input_ids=[],
+            output_ids=[],
+            constant_data=[ConstantDataOffset(0, 0)],
+        )
+        weight = torch.arange(6, dtype=torch.float32)
+        constant_data = Cord(weight.untyped_storage())
+        constant_data.append(b"\x00" * 8)
+
+        serialized_binary = serialize_xnnpack_binary(xnn_graph, constant_data)
+
+        header = XNNHeader.from_bytes(serialized_binary[: XNNHeader.EXPECTED_LENGTH])
+        self.assertEqual(header.constant_data_size, 32)
+        self.assertEqual(
+            serialized_binary[header.constant_data_offset :],
+            weight.numpy().tobytes() + b"\x00" * 8,
+        )
+
+    def test_convert_to_flatbuffer_matches_flatc(self):
+        def tensor_value(datatype, value_id):
+            return XNNTensorValue(
+                datatype=datatype,
+                num_dims=2,
+                dims=[2, 3],
+                constant_buffer_idx=0,
+                external_id=value_id,
+                flags=1,
+                id_out=value_id,
+            )
+
+        xnn_graph = XNNGraph(
+            version="0",
+            xnodes=[
+                XNode(
+                    xnode_union=XNNAdd(input1_id=0, input2_id=1, output_id=2, flags=0),
+                    debug_handle=3,
+                    output_min_max=OutputMinMax(output_min=-1.0, output_max="+inf"),
+                ),
+            ],
+            xvalues=[
+                XValue(xvalue_union=tensor_value(XNNDatatype.xnn_datatype_fp32, 0)),
+                XValue(
+                    xvalue_union=XNNQuantizedTensorValue(
+                        tensor_value=tensor_value(XNNDatatype.xnn_datatype_qcint8, 1),
+                        quant_params=PerChannelQuant(scale=[0.5, 0.25], channel_dim=0),
+                    )
+                ),
+                XValue(xvalue_union=tensor_value(XNNDatatype.xnn_datatype_fp32, 2)),
+            ],
+            num_externs=2,
+            input_ids=[0, 1],
+            output_ids=[2],
+            constant_data=[ConstantDataOffset(0, 0), ConstantDataOffset(16, 64)],
+        )
+
+        builder_data = convert_to_flatbuffer(xnn_graph)
+        with patch.dict(os.environ, {_USE_FLATC_ENV: "1"}):
+            flatc_data = convert_to_flatbuffer(xnn_graph)
+
+        schema = _load_xnnpack_schema()
+        builder_graph = _read_flatbuffer(builder_data, schema).to_dataclass(XNNGraph)
+        flatc_graph = _read_flatbuffer(flatc_data, schema).to_dataclass(XNNGraph)
+        self.assertEqual(builder_graph, flatc_graph)
+
+        # "+inf" is written as a float.
+        xnn_graph.xnodes[0].output_min_max.output_max = math.inf
+        self.assertEqual(builder_graph, xnn_graph)
@@ -29,6 +29,7 @@ from executorch.backends.xnnpack.utils.xnnpack_constants import (
     XNN_VALUE_FLAG_EXTERNAL_OUTPUT,
 )
 
+from executorch.exir._serialize._cord import Cord
 from executorch.exir.backend.backend_details import (
     BackendDetails,
     CompileSpec,
@@ -134,8 +135,8 @@ class XnnpackBackend(BackendDetails):
             constant_data=[ConstantDataOffset(0, 0)],
         )
 
-        constant_data_bytes = bytearray()
-        node_visitors = get_node_visitors(ep, node_to_external_map, constant_data_bytes)
+        constant_data = Cord()
+        node_visitors = get_node_visitors(ep, node_to_external_map, constant_data)
 
         for node in graph_module.graph.nodes:
             if node.op == "call_function":
@@ -160,8 +161,6 @@ class XnnpackBackend(BackendDetails):
             else:
                 raise RuntimeError(f"{node.op} is not supported in XNNPACK")
         return PreprocessResult(
-            processed_bytes=serialize_xnnpack_binary(
-                xnnpack_graph, constant_data_bytes
-            ),
+            processed_bytes=serialize_xnnpack_binary(xnnpack_graph, constant_data),
             debug_handle_map={},
         )
@@ -8,22 +8,30 @@
 # This source code is licensed under the license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Optional
+import os
+from typing import Any, Dict, List, Optional
 
 import torch
 
 import torch.fx as fx
 import torch.nn as nn
 import torch.nn.functional as F
-from model import Transformer  # pyre-ignore[21]
 from torch.utils._pytree import tree_flatten, tree_unflatten
 
+from .llama_transformer import Transformer
+
 aten = torch.ops.aten
 
 ## generate.py ##
 
 
-def encode_tokens(tokenizer, string, bos=True, device="cuda"):
+def default_device() -> torch.device:
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def encode_tokens(tokenizer, string, bos=True, device=None):
+    if device is None:
+        device = default_device()
 
     tokens = tokenizer.encode(string)
     if bos:
@@ -55,6 +63,9 @@ if lm_eval_available:
         eval_wrapper = base.BaseLM
         get_task_dict = tasks.get_task_dict
         evaluate = evaluator.evaluate
+else:
+    # The GPTQ runners do not need lm_eval, only the recording of their inputs does.
+    eval_wrapper = object
 
 
 def setup_cache_padded_seq_input_pos_max_seq_length_for_prefill(
@@ -112,7 +123,7 @@ class GPTFastEvalWrapper(eval_wrapper):  # pyre-ignore[11]
         super().__init__()
         self._model = model
         self._tokenizer = tokenizer
-        self._device = torch.device("cuda")
+        self._device = default_device()
         self._max_seq_length = 2048 if max_seq_length is None else max_seq_length
 
     @property
@@ -272,45 +283,37 @@ class MultiInput:
     def __getitem__(self, slice):
         return MultiInput(self.values[slice])
 
-    def cuda(self):
+    def to(self, device):
         self.values = [
-            val.cuda() if isinstance(val, torch.Tensor) else val for val in self.values
+            val.to(device) if isinstance(val, torch.Tensor) else val
+            for val in self.values
         ]
+        return self
 
+    def cuda(self):
+        return self.to("cuda")
 
-class GenericGPTQRunner(fx.Interpreter):
-    """
-    This is a generic GPTQ runner that takes an existing model and applies GPTQ.
-    It uses torch._dynamo.export to obtain a graph of the model and then hooks
-    into function calls and when it detects a linear, it applies GPTQ to the weight
-    given the calibration of inputs passed in at initialization. It puts the results
-    into the state_dict so that the quantized model weights/qparams can be loaded
-    directly into the model.
+    def stack(self) -> torch.Tensor:
+        """
+        Concatenates the values, which must be tensors of the same shape, along
+        their first dimension, to run them as one batch.
+        """
+        assert all(
+            isinstance(val, torch.Tensor) and val.shape == self.values[0].shape
+            for val in self.values
+        ), "Only inputs of the same shape can be batched"
+        return torch.cat(self.values)
 
-    This class is expected to work in concert with a GPTQSimpleQuantizer
-    class to define the specific type of quantization being done.
-    """
 
-    def __init__(
-        self, model, inputs: MultiInput, blocksize=128, percdamp=0.01, groupsize=128
-    ):
-        self.id_to_name = {
-            id(value): name for name, value in dict(model.named_parameters()).items()
-        }
+class GPTQRunnerBase:
+    """
+    The quantization mode and the GPTQ algorithm shared by the GPTQ runners.
+    Subclasses set blocksize, percdamp and groupsize.
+    """
 
-        # trace model for one input
-        one_input = [multi.values[0] for multi in inputs]  # pyre-ignore[16]
-        exported_model = torch._dynamo.export(
-            model, aten_graph=True, pre_dispatch=True, tracing_mode="fake"
-        )(*one_input)
-        super().__init__(exported_model.graph_module)
-        self.new_state_dict = model.state_dict()
-        self.blocksize = blocksize
-        self.percdamp = percdamp
-        self.groupsize = groupsize
-        self.inputs = inputs
-        self.gptq_done = False
-        self.debug = False
+    blocksize: int
+    percdamp: float
+    groupsize: int
 
     def configure_quantization_mode(
         self,
@@ -342,6 +345,123 @@ class GenericGPTQRunner(fx.Interpreter):
         # note any final packing for storage should happen here
         return self
 
+    def faster_quant(self, H, W):
+        percdamp = self.percdamp
+        blocksize = self.blocksize
+        groupsize = self.groupsize
+        orig_dtype = W.dtype
+        # W is updated in place, copy it to leave the weight of the model untouched.
+        W = W.detach().to(torch.float32, copy=True)
+        _, columns = W.shape[0], W.shape[1]
+        device = W.device
+
+        if groupsize == -1:
+            cur_qparams = self.get_qparams_func(W)
+        dead = torch.diag(H) == 0
+        H[dead, dead] = 1
+        W[:, dead] = 0
+
+        Losses = torch.zeros_like(W)
+        DQ = torch.zeros_like(W)
+
+        damp = percdamp * torch.mean(torch.diag(H))
+        diag = torch.arange(columns, device=device)
+        H[diag, diag] += damp
+        H = torch.linalg.cholesky(H)
+        H = torch.cholesky_inverse(H)
+        H = torch.linalg.cholesky(H, upper=True)
+        Hinv = H
+
+        all_qparams = []
+        for i1 in range(0, columns, blocksize):
+            i2 = min(i1 + blocksize, columns)
+            count = i2 - i1
+            W1 = W[:, i1:i2].clone()
+            DQ1 = torch.zeros_like(W1)
+            Err1 = torch.zeros_like(W1)
+            Losses1 = torch.zeros_like(W1)
+            Hinv1 = Hinv[i1:i2, i1:i2]
+            for i in range(count):
+                w = W1[:, i]
+                d = Hinv1[i, i]
+
+                if groupsize != -1 and (i1 + i) % groupsize == 0:  # start of new group
+                    cur_qparams = self.get_qparams_func(
+                        W[:, (i1 + i) : (i1 + i + groupsize)]
+                    )
+                    all_qparams.append(cur_qparams)
+
+                q = self.quantize_func(w.unsqueeze(1), cur_qparams).flatten()
+                dq = self.dequantize_func(q.unsqueeze(1), cur_qparams).flatten()
+
+                DQ1[:, i] = dq
+                Losses1[:, i] = (w - dq) ** 2 / d**2
+
+                err1 = (w - dq) / d
+                W1[:, i:] -= (
+                    err1.to(Hinv1.dtype).unsqueeze(1).matmul(Hinv1[i, i:].unsqueeze(0))
+                )
+                Err1[:, i] = err1
+
+            DQ[:, i1:i2] = DQ1
+            Losses[:, i1:i2] = Losses1 / 2
+
+            W[:, i2:] -= Err1.to(Hinv.dtype).matmul(Hinv[i1:i2, i2:])
+
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+
+        if all_qparams == []:
+            all_qparams.append(cur_qparams)
+
+        # convert a list of qparams objects into a single one. enerally by
+        # concatenating a bunch of n,1 scale/zeros tensors into a n,num_groups tensor
+        all_qparams = self.combine_qparams_list_func(all_qparams)
+        Q = self.quantize_func(DQ, all_qparams)
+        return Q, DQ.to(orig_dtype), all_qparams
+
+
+class GenericGPTQRunner(GPTQRunnerBase, fx.Interpreter):
+    """
+    This is a generic GPTQ runner that takes an existing model and applies GPTQ.
+    It uses torch._dynamo.export to obtain a graph of the model and then hooks
+    into function calls and when it detects a linear, it applies GPTQ to the weight
+    given the calibration of inputs passed in at initialization. It puts the results
+    into the state_dict so that the quantized model weights/qparams can be loaded
+    directly into the model.
+
+    This class is expected to work in concert with a GPTQSimpleQuantizer
+    class to define the specific type of quantization being done.
+    """
+
+    def __init__(
+        self,
+        model,
+        inputs: MultiInput,
+        blocksize=128,
+        percdamp=0.01,
+        groupsize=128,
+        device=None,
+    ):
+        self.id_to_name = {
+            id(value): name for name, value in dict(model.named_parameters()).items()
+        }
+
+        # trace model for one input
+        one_input = [multi.values[0] for multi in inputs]  # pyre-ignore[16]
+        exported_model = torch._dynamo.export(
+            model, aten_graph=True, pre_dispatch=True, tracing_mode="fake"
+        )(*one_input)
+        super().__init__(exported_model.graph_module)
+        self.new_state_dict = model.state_dict()
+        self.blocksize = blocksize
+        self.percdamp = percdamp
+        self.groupsize = groupsize
+        self.inputs = inputs
+        self.device = default_device() if device is None else torch.device(device)
+        self.gptq_done = False
+        self.debug = False
+
     def run(self):
         assert (
             self.get_qparams_func is not None
@@ -364,16 +484,16 @@ class GenericGPTQRunner(fx.Interpreter):
         return quantized_state_dict
 
     def call_function(self, target, args, kwargs, skip_quant=False):  # noqa: C901
-        def tensors_to_cuda(args):
+        def tensors_to_device(args):
             new_args = []
             for x in args:
-                new_args.append(x.cuda() if isinstance(x, torch.Tensor) else x)
+                new_args.append(x.to(self.device) if isinstance(x, torch.Tensor) else x)
             return new_args
 
         # flatten args and kwargs together
         flat_args, spec = tree_flatten((args, kwargs))
-        # move all single tensors to cuda, will move MultiInputs to cuda one at a time
-        flat_args = tensors_to_cuda(flat_args)
+        # move all single tensors to the device, will move MultiInputs to the device one at a time
+        flat_args = tensors_to_device(flat_args)
 
         has_multi_input = MultiInput in [type(x) for x in flat_args]
         if has_multi_input:
@@ -412,7 +532,7 @@ class GenericGPTQRunner(fx.Interpreter):
             total_batches = 0
 
         for inp in transposed_args:
-            inp = tensors_to_cuda(inp)
+            inp = tensors_to_device(inp)
             cur_args, cur_kwargs = tree_unflatten(inp, spec)
 
             if (
@@ -473,7 +593,7 @@ class GenericGPTQRunner(fx.Interpreter):
                 )  # matches
 
                 print(
-                    "SQNR for weight (can be low)", SQNR(W, DQ.cuda())
+                    "SQNR for weight (can be low)", SQNR(W, DQ.to(W.device))
                 )  # fine to not match
                 print(
                     "SQNR for output with GPTQ (hopefully 35+)",
@@ -505,75 +625,229 @@ class GenericGPTQRunner(fx.Interpreter):
 
         return MultiInput(outputs) if has_multi_input else outputs[0]
 
-    def faster_quant(self, H, W):
-        percdamp = self.percdamp
-        blocksize = self.blocksize
-        groupsize = self.groupsize
-        orig_dtype = W.dtype
-        W = W.detach().float()
-        _, columns = W.shape[0], W.shape[1]
-        device = W.device
-
-        if groupsize == -1:
-            cur_qparams = self.get_qparams_func(W)
-        dead = torch.diag(H) == 0
-        H[dead, dead] = 1
-        W[:, dead] = 0
 
-        Losses = torch.zeros_like(W)
-        DQ = torch.zeros_like(W)
+class _StopForward(Exception):
+    pass
 
-        damp = percdamp * torch.mean(torch.diag(H))
-        diag = torch.arange(columns, device=device)
-        H[diag, diag] += damp
-        H = torch.linalg.cholesky(H)
-        H = torch.cholesky_inverse(H)
-        H = torch.linalg.cholesky(H, upper=True)
-        Hinv = H
 
-        all_qparams = []
-        for i1 in range(0, columns, blocksize):
-            i2 = min(i1 + blocksize, columns)
-            count = i2 - i1
-            W1 = W[:, i1:i2].clone()
-            DQ1 = torch.zeros_like(W1)
-            Err1 = torch.zeros_like(W1)
-            Losses1 = torch.zeros_like(W1)
-            Hinv1 = Hinv[i1:i2, i1:i2]
-            for i in range(count):
-                w = W1[:, i]
-                d = Hinv1[i, i]
+class LayerwiseGPTQRunner(GPTQRunnerBase):
+    """
+    Applies GPTQ to a llama_transformer.Transformer one TransformerBlock at a time,
+    without tracing the model, which suits running on the CPU.
+
+    The calibration samples are stacked into one batch, and run through the model
+    in chunks of batch_size samples. Only the activations between two blocks and the
+    Hessian of one linear are kept in memory at a time. As with GenericGPTQRunner,
+    the Hessian of each linear is computed with the already quantized weights of the
+    linears before it.
+
+    If checkpoint_dir is set, the quantized weights of each block and the activations
+    after it are saved there, and a later run with the same directory and inputs
+    resumes after the last saved block.
+    """
 
-                if groupsize != -1 and (i1 + i) % groupsize == 0:  # start of new group
-                    cur_qparams = self.get_qparams_func(
-                        W[:, (i1 + i) : (i1 + i + groupsize)]
-                    )
-                    all_qparams.append(cur_qparams)
+    def __init__(
+        self,
+        model,
+        inputs: MultiInput,
+        blocksize=128,
+        percdamp=0.01,
+        groupsize=128,
+        batch_size=8,
+        checkpoint_dir: Optional[str] = None,
+    ):
+        self.model = model
+        # The InputRecorder records the tokens and their positions; the positions
+        # are the same for all samples.
+        self.tokens = inputs[0].stack()  # pyre-ignore[16]
+        self.new_state_dict = model.state_dict()
+        self.blocksize = blocksize
+        self.percdamp = percdamp
+        self.groupsize = groupsize
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
+        self.gptq_done = False
 
-                q = self.quantize_func(w.unsqueeze(1), cur_qparams).flatten()
-                dq = self.dequantize_func(q.unsqueeze(1), cur_qparams).flatten()
+    def _config(self) -> Dict[str, Any]:
+        # Checkpoints are only resumed with the same settings.
+        return {
+            "num_samples": self.tokens.shape[0],
+            "seq_length": self.tokens.shape[1],
+            "blocksize": self.blocksize,
+            "percdamp": self.percdamp,
+            "groupsize": self.groupsize,
+        }
 
-                DQ1[:, i] = dq
-                Losses1[:, i] = (w - dq) ** 2 / d**2
+    def _checkpoint_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, name)  # pyre-ignore[6]
+
+    def _save(self, name: str, obj: Any) -> None:
+        # Write to a temporary file first, so that an interruption never leaves a
+        # partial checkpoint behind.
+        path = self._checkpoint_path(name)
+        torch.save(obj, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def _resume(self) -> Optional[Dict[str, Any]]:
+        """
+        Loads the quantized weights of the blocks done by a previous run, and returns
+        its progress, or None if there is none.
+        """
+        if self.checkpoint_dir is None:
+            return None
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = self._checkpoint_path("progress.pt")
+        if not os.path.exists(path):
+            return None
+        progress = torch.load(path)
+        if progress["config"] != self._config():
+            raise ValueError(
+                f"The checkpoint in {self.checkpoint_dir} was made with {progress['config']}, not {self._config()}"
+            )
+        for index in range(progress["next_block"]):
+            self._update_state_dict(torch.load(self._checkpoint_path(f"{index}.pt")))
+        print(f"Resuming GPTQ from block {progress['next_block']}")
+        return progress
 
-                err1 = (w - dq) / d
-                W1[:, i:] -= (
-                    err1.to(Hinv1.dtype).unsqueeze(1).matmul(Hinv1[i, i:].unsqueeze(0))
-                )
-                Err1[:, i] = err1
+    def _update_state_dict(self, names_and_values: Dict[str, torch.Tensor]) -> None:
+        for fqn, values in names_and_values.items():
+            # delete old weight
+            self.new_state_dict.pop(fqn + ".weight", None)
+            for name, value in values.items():
+                self.new_state_dict[fqn + "." + name] = value
+
+    def _run_chunks(self, fn, hidden: torch.Tensor) -> List[torch.Tensor]:
+        return [fn(chunk) for chunk in hidden.split(self.batch_size)]
+
+    def _hessian(self, fn, hidden: torch.Tensor, linear: nn.Linear) -> torch.Tensor:
+        """
+        Returns the Hessian of the GPTQ loss of linear, whose inputs are computed by
+        running fn on the chunks of hidden.
+        """
+        H = torch.zeros(linear.in_features, linear.in_features, dtype=torch.float32)
+
+        def accumulate(module, args):
+            x = args[0].float()
+            x = x.reshape(-1, x.shape[-1])
+            H.addmm_(x.t(), x)
+            # The rest of the forward is not needed.
+            raise _StopForward()
+
+        handle = linear.register_forward_pre_hook(accumulate)
+        try:
+            for chunk in hidden.split(self.batch_size):
+                try:
+                    fn(chunk)
+                except _StopForward:
+                    pass
+        finally:
+            handle.remove()
+        # The same as the running average of GenericGPTQRunner.
+        return H.mul_(2 / hidden.shape[0])
+
+    def _quantize_linears(
+        self, fn, hidden: torch.Tensor, module: nn.Module, prefix: str
+    ) -> Dict[str, Dict[str, torch.Tensor]]:
+        """
+        Quantizes the linears of module in the order they run, running fn on hidden
+        to get their inputs, and returns the names and values to put in the state dict.
+        The linears keep their dequantized weights until the outputs of module are
+        computed.
+        """
+        names = {
+            linear: name
+            for name, linear in module.named_modules()
+            if isinstance(linear, nn.Linear)
+        }
+        order = []
+        handles = [
+            linear.register_forward_pre_hook(lambda linear, args: order.append(linear))
+            for linear in names
+        ]
+        try:
+            fn(hidden[:1])
+        finally:
+            for handle in handles:
+                handle.remove()
+
+        names_and_values = {}
+        for linear in dict.fromkeys(order):
+            name = names[linear]
+            if self.skip_layer_func is not None and self.skip_layer_func(linear.weight):
+                continue
+            H = self._hessian(fn, hidden, linear)
+            Q, DQ, qparams = self.faster_quant(H, linear.weight.detach())
+            fqn = prefix + name
+            print(fqn)
+            names_and_values[fqn] = self.make_names_and_values_dict_func(Q, qparams)
+            linear.weight = nn.Parameter(DQ, requires_grad=False)
+        return names_and_values
+
+    @torch.no_grad()
+    def run(self):
+        assert (
+            self.get_qparams_func is not None
+        ), "need to configure quantization mode before running"
+        model = self.model
+        seq_length = self.tokens.shape[1]
+        freqs_cos = model.freqs_cos[:seq_length]
+        freqs_sin = model.freqs_sin[:seq_length]
+
+        progress = self._resume()
+        if progress is None:
+            first_block = 0
+            hidden = torch.cat(self._run_chunks(model.tok_embeddings, self.tokens))
+        else:
+            first_block = progress["next_block"]
+            hidden = progress["hidden"]
+
+        # Restore the float weights of the model once they are not needed anymore.
+        original_weights = {
+            name: linear.weight
+            for name, linear in model.named_modules()
+            if isinstance(linear, nn.Linear)
+        }
+        try:
+            for index in range(first_block, len(model.layers)):
+                layer = model.layers[index]
 
-            DQ[:, i1:i2] = DQ1
-            Losses[:, i1:i2] = Losses1 / 2
+                def run_layer(x):
+                    return layer(x, freqs_cos, freqs_sin)[0]
 
-            W[:, i2:] -= Err1.to(Hinv.dtype).matmul(Hinv[i1:i2, i2:])
+                names_and_values = self._quantize_linears(
+                    run_layer, hidden, layer, f"layers.{index}."
+                )
+                hidden = torch.cat(self._run_chunks(run_layer, hidden))
+                self._update_state_dict(names_and_values)
+                if self.checkpoint_dir is not None:
+                    self._save(f"{index}.pt", names_and_values)
+                    self._save(
+                        "progress.pt",
+                        {
+                            "config": self._config(),
+                            "next_block": index + 1,
+                            "hidden": hidden,
+                        },
+                    )
 
-        torch.cuda.synchronize()
+            def run_output(x):
+                return model.output(model.norm(x))
 
-        if all_qparams == []:
-            all_qparams.append(cur_qparams)
+            self._update_state_dict(
+                self._quantize_linears(run_output, hidden, model.output, "output")
+            )
+        finally:
+            for name, linear in model.named_modules():
+                if name in original_weights:
+                    linear.weight = original_weights[name]
+        self.gptq_done = True
 
-        # convert a list of qparams objects into a single one. enerally by
-        # concatenating a bunch of n,1 scale/zeros tensors into a n,num_groups tensor
-        all_qparams = self.combine_qparams_list_func(all_qparams)
-        Q = self.quantize_func(DQ, all_qparams)
-        return Q, DQ.to(orig_dtype), all_qparams
+    def get_quantized_state_dict(self):
+        assert (
+            self.gptq_done
+        ), "need to run GPTQRunner before you can get_quantized_state_dict"
+        quantized_state_dict = self.new_state_dict
+        # Don't want to store/load the kv_cache so remove it from the state_dict
+        for param_fqn in [fqn for fqn in quantized_state_dict if "kv_cache" in fqn]:
+            quantized_state_dict.pop(param_fqn)
+        return quantized_state_dict
@@ -10,6 +10,8 @@
 
 import json
 import logging
+import resource
+import sys
 from enum import Enum
 from json import JSONDecodeError
 from typing import Any, Callable, Dict, List, Optional
@@ -40,6 +42,15 @@ FORMAT = "[%(levelname)s %(asctime)s %(filename)s:%(lineno)s] %(message)s"
 logging.basicConfig(level=logging.INFO, format=FORMAT)
 
 
+def log_peak_rss(stage: str) -> None:
+    """Logs the peak resident set size of the process so far."""
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    logging.info(f"Peak RSS after {stage}: {peak_rss / 2**30:.2f} GiB")
+
+
 class WeightType(Enum):
     LLAMA = "LLAMA"
     FAIRSEQ2 = "FAIRSEQ2"
@@ -69,10 +80,22 @@ def load_llama_model(
     weight_type: WeightType = WeightType.LLAMA,
     verbose: bool = False,
     max_seq_len: int = 128,
+    dtype_override: Optional[DType] = None,
+    sliding_window: Optional[int] = None,
+    attention_sink_size: int = 0,
 ) -> "LlamaEdgeManager":
     """
     A helper util that builds a Llama2 model. It returns a LlamaEdgeManager that
     can help further lower the model to ExecuTorch.
+    Args:
+        dtype_override (Optional[DType]): The dtype to convert the model to, instead
+            of the dtype of the checkpoint. The parameters are views of the
+            memory-mapped checkpoint, which are replaced by converted copies one at
+            a time, as to_dtype does.
+        sliding_window (Optional[int]): If set, the kv cache is a ring buffer of
+            attention_sink_size + sliding_window tokens, and each token attends to
+            the first attention_sink_size tokens and the last sliding_window ones.
+        attention_sink_size (int): The number of first tokens always attended to.
     Returns:
         An instance of LlamaEdgeManager which contains the eager mode model.
     """
@@ -89,6 +112,11 @@ def load_llama_model(
         use_sdpa_with_kv_cache=use_sdpa_with_kv_cache,
         fairseq2=weight_type == WeightType.FAIRSEQ2,
         max_seq_len=max_seq_len,
+        dtype_override=(
+            dtype_override.to_torch_dtype() if dtype_override is not None else None
+        ),
+        sliding_window=sliding_window,
+        attention_sink_size=attention_sink_size,
     )
     state_dict = model.state_dict()
     dtype = state_dict[next(iter(state_dict))].dtype
@@ -107,6 +135,7 @@ def load_llama_model(
         dtype = DType.fp32
     else:
         raise ValueError(f"Unsupported dtype {dtype}")
+    log_peak_rss("loading the model")
 
     return LlamaEdgeManager(
         model=model,
@@ -179,6 +208,7 @@ class LlamaEdgeManager:
             logging.info(f"model.to {torch_dtype}")
             self.model = self.model.to(dtype=torch_dtype)
             self.dtype = dtype_override
+            log_peak_rss("to_dtype")
 
         # convert kv cache to dtype as well. This should be removed after mutable buffer is supported.
         # assuming the kv cache are the last 2 tensors in the example inputs
@@ -206,6 +236,7 @@ class LlamaEdgeManager:
 
         if self.verbose:
             logging.info(f"Applied source transforms: {self.applied_source_transforms}")
+        log_peak_rss("source_transform")
         return self
 
     def _get_dynamic_shape(self) -> Optional[Dict[str, Any]]:
@@ -286,6 +317,7 @@ class LlamaEdgeManager:
                 edge_compile_config=edge_config,
                 verbose=True,
             )
+        log_peak_rss("export_to_edge")
         return self
 
     def to_backend(self, partitioner: Optional[Partitioner]) -> "LlamaEdgeManager":
@@ -308,6 +340,7 @@ class LlamaEdgeManager:
                     )
                 )
                 logging.info(f"Applied partitioners: {partitioner}")
+            log_peak_rss("to_backend")
         return self
 
     def to_executorch(self) -> "LlamaEdgeManager":
@@ -335,6 +368,7 @@ class LlamaEdgeManager:
                 ].non_const_buffer_sizes
             ),
         )
+        log_peak_rss("to_executorch")
         return self
 
     def save_to_pte(self, output_name: str) -> None:
@@ -345,3 +379,4 @@ class LlamaEdgeManager:
         """
         assert output_name, "Need a valid output name"
         save_pte_program(self.export_program, output_name, self.output_dir)
+        log_peak_rss("save_to_pte")
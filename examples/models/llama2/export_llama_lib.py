@@ -40,6 +40,7 @@ from .builder import DType, LlamaEdgeManager, load_llama_model, WeightType
 
 from .quantize import (
     EmbeddingOnlyInt8QuantHandler,
+    Int8DynActInt4WeightGPTQQuantHandler,
     Int8DynActInt4WeightQuantHandler,
     WeightOnlyInt8QuantHandler,
 )
@@ -217,12 +218,23 @@ def quantize(
     percdamp: float = 0.01,
     blocksize: int = 128,
     tokenizer_path: Optional[Path] = None,
+    gptq_layerwise: bool = False,
+    gptq_checkpoint_dir: Optional[str] = None,
+    num_workers: Optional[int] = None,
 ) -> torch.nn.Module:
     """
     Quantizes a model by converting all weights to int8.
     Args:
         model: A model to quantize.
         qmode: quantization mode, e.g. int8, 8da4w, 8da4w-gptq
+        checkpoint_path: The llama checkpoint of the model. For int8 and 8da4w, the
+            weights are quantized from a memory mapping of it.
+        gptq_layerwise: For 8da4w-gptq, apply GPTQ one transformer block at a time
+            with a LayerwiseGPTQRunner, which suits running on the CPU.
+        gptq_checkpoint_dir: With gptq_layerwise, the directory that the progress
+            of GPTQ is saved to after each block, and resumed from.
+        num_workers: For int8 and 8da4w, the number of threads quantizing layers in
+            parallel. Defaults to the number of CPUs.
     Returns:
         A quantized model.
     """
@@ -231,19 +243,23 @@ def quantize(
     else:
         torch_dtype = torch.float16
 
-    if checkpoint_path is None:
-        checkpoint_path = Path("checkpoints/meta-llama/Llama-2-7b-chat-hf/model.pth")
-
     if calibration_tasks is None:
         calibration_tasks = ["wikitext"]
 
+    weights_path = str(checkpoint_path) if checkpoint_path is not None else None
     if qmode == "int8":
         # Add quantization mode options here: group size, bit width, etc.
-        return WeightOnlyInt8QuantHandler(model).quantized_model()
+        return WeightOnlyInt8QuantHandler(
+            model,
+            checkpoint_path=weights_path,
+            num_workers=num_workers,
+        ).quantized_model()
     elif qmode == "8da4w":
         model = Int8DynActInt4WeightQuantHandler(
             model,
             precision=torch_dtype,
+            checkpoint_path=weights_path,
+            num_workers=num_workers,
         ).quantized_model()
         print("quantized model:", model)
         return model
@@ -251,11 +267,32 @@ def quantize(
         from torchao.quantization.quant_api import Int8DynActInt4WeightGPTQQuantizer
 
         if tokenizer_path is None:
+            if checkpoint_path is None:
+                checkpoint_path = Path(
+                    "checkpoints/meta-llama/Llama-2-7b-chat-hf/model.pth"
+                )
             tokenizer_path = checkpoint_path.parent / "tokenizer.model"
         assert tokenizer_path.is_file(), tokenizer_path
         tokenizer = SentencePieceProcessor(  # pyre-ignore[28]
             model_file=str(tokenizer_path)
         )
+        if gptq_layerwise:
+            return Int8DynActInt4WeightGPTQQuantHandler(
+                model, groupsize, precision=torch_dtype
+            ).quantized_model(
+                tokenizer,
+                blocksize,
+                percdamp,
+                groupsize,
+                calibration_tasks,
+                calibration_limit,
+                calibration_seq_length,
+                pad_calibration_inputs,
+                layerwise=True,
+                checkpoint_dir=gptq_checkpoint_dir,
+            )
+        if gptq_checkpoint_dir is not None:
+            raise ValueError("gptq_checkpoint_dir requires gptq_layerwise")
         gptq_quantizer = Int8DynActInt4WeightGPTQQuantizer(
             tokenizer,
             blocksize,
@@ -319,6 +356,24 @@ def build_args_parser() -> argparse.ArgumentParser:
         help="type of quantization",
     )
 
+    parser.add_argument(
+        "--quantize_workers",
+        type=int,
+        default=None,
+        help="The number of threads quantizing layers in parallel, by default the number of CPUs",
+    )
+    parser.add_argument(
+        "--gptq_layerwise",
+        default=False,
+        action="store_true",
+        help="For 8da4w-gptq, apply GPTQ one transformer block at a time, which is faster on the CPU",
+    )
+    parser.add_argument(
+        "--gptq_checkpoint_dir",
+        default=None,
+        help="For --gptq_layerwise, save the progress of GPTQ to this directory after each transformer block, and resume from it",
+    )
+
     parser.add_argument(
         "-c",
         "--checkpoint",
@@ -344,6 +399,18 @@ def build_args_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Whether to use sdpa_with_kv_cache update op when using kv cache",
     )
+    parser.add_argument(
+        "--sliding_window",
+        type=int,
+        default=None,
+        help="Use a ring buffer kv cache that only keeps the last sliding_window tokens, which are the ones attended to",
+    )
+    parser.add_argument(
+        "--attention_sink_size",
+        type=int,
+        default=0,
+        help="The number of first tokens that are always kept in the sliding window kv cache",
+    )
     parser.add_argument(
         "-p",
         "--params",
@@ -477,21 +544,36 @@ def _prepare_for_llama_export(modelname: str, args) -> LlamaEdgeManager:
     else:
         dtype_override = None
 
+    # The quantizers read the weights from a memory mapping of the checkpoint, which
+    # fairseq2 checkpoints cannot be read from, as their keys are converted while
+    # they are loaded.
+    quantize_checkpoint_path = None
+    if not args.fairseq2:
+        quantize_checkpoint_path = checkpoint_path
+
     # source transforms
     transforms = []
     if args.quantized_ckpt or args.quantization_mode:
         modelname = f"{modelname}_q"
+        tokenizer_path = (
+            Path(args.tokenizer_path)
+            if args.tokenizer_path is not None
+            else Path(checkpoint_path).parent / "tokenizer.model"
+        )
         transforms.append(
             partial(
                 quantize,
                 qmode=args.quantization_mode,
                 activation_dtype=dtype_override,
                 checkpoint_path=(
-                    Path(path) if (path := args.checkpoint) is not None else None
-                ),
-                tokenizer_path=(
-                    Path(path) if (path := args.tokenizer_path) is not None else None
+                    Path(quantize_checkpoint_path)
+                    if quantize_checkpoint_path is not None
+                    else None
                 ),
+                tokenizer_path=tokenizer_path,
+                gptq_layerwise=args.gptq_layerwise,
+                gptq_checkpoint_dir=args.gptq_checkpoint_dir,
+                num_workers=args.quantize_workers,
             )
         )
 
@@ -505,7 +587,11 @@ def _prepare_for_llama_export(modelname: str, args) -> LlamaEdgeManager:
         bitwidth = int(bitwidth)
         transforms.append(
             lambda model: EmbeddingOnlyInt8QuantHandler(
-                model, bitwidth=bitwidth, group_size=group_size
+                model,
+                bitwidth=bitwidth,
+                group_size=group_size,
+                checkpoint_path=quantize_checkpoint_path,
+                num_workers=args.quantize_workers,
             ).quantized_model()
         )
 
@@ -521,6 +607,14 @@ def _prepare_for_llama_export(modelname: str, args) -> LlamaEdgeManager:
             weight_type=weight_type,
             verbose=args.verbose,
             max_seq_len=args.max_seq_length,
+            # Quantization reads the memory-mapped weights in the dtype of the
+            # checkpoint, converting each one as it quantizes it, and to_dtype then
+            # converts the weights left in float. Converting the whole model first
+            # would allocate all of it in the target dtype before quantization
+            # replaces most of it, and would change the quantized weights.
+            dtype_override=None if transforms else dtype_override,
+            sliding_window=args.sliding_window,
+            attention_sink_size=args.attention_sink_size,
         )
         .set_output_dir(output_dir_path)
         .set_metadata(args.metadata)
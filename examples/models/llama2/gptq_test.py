@@ -0,0 +1,134 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import torch
+
+from .GPTQ import GenericGPTQRunner, LayerwiseGPTQRunner, MultiInput
+from .llama_transformer import ModelArgs, Transformer
+from .quantize import Int8DynActInt4WeightGPTQQuantHandler
+
+
+class GPTQTest(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.args = ModelArgs(
+            dim=32, n_layers=2, n_heads=4, vocab_size=64, max_seq_len=32
+        )
+        self.model = Transformer(self.args).eval()
+        self.samples = [torch.randint(0, 64, (1, 32)) for _ in range(8)]
+
+    def _quantize(self, runner_cls, **kwargs):
+        """
+        Applies GPTQ to a copy of the model with runner_cls, and returns the quantized
+        state dict.
+        """
+        model = Transformer(self.args).eval()
+        model.load_state_dict(self.model.state_dict())
+        handler = Int8DynActInt4WeightGPTQQuantHandler(model, groupsize=16)
+        runner = runner_cls(
+            model, [MultiInput(self.samples)], blocksize=16, groupsize=16, **kwargs
+        )
+        runner.configure_quantization_mode(
+            handler.get_qparams_func,
+            handler.quantize_func,
+            handler.dequantize_func,
+            handler.combine_qparams_list_func,
+            handler.make_names_and_values_dict_func,
+            handler.skip_layer_func,
+        )
+        runner.run()
+        return runner.get_quantized_state_dict()
+
+    def _quantized_model(self, state_dict) -> torch.nn.Module:
+        model = Transformer(self.args).eval()
+        Int8DynActInt4WeightGPTQQuantHandler(model, groupsize=16).convert_for_runtime()
+        model.load_state_dict(state_dict)
+        return model
+
+    @torch.no_grad()
+    def test_layerwise(self) -> None:
+        expected = self._quantize(GenericGPTQRunner)
+        state_dict = self._quantize(LayerwiseGPTQRunner, batch_size=3)
+        self.assertEqual(state_dict.keys(), expected.keys())
+
+        # GPTQ feeds the rounding error of each weight into the next ones of its
+        # row, so summing the Hessians in a different order flips a few weights
+        # to a neighboring value.
+        num_weights = 0
+        num_different = 0
+        for name, tensor in state_dict.items():
+            self.assertEqual(tensor.dtype, expected[name].dtype, msg=name)
+            self.assertEqual(tensor.shape, expected[name].shape, msg=name)
+            if tensor.dtype == torch.int8:
+                num_weights += tensor.numel()
+                num_different += (tensor != expected[name]).sum().item()
+        self.assertLess(num_different / num_weights, 0.05)
+
+        tokens = torch.cat(self.samples)
+        output = self.model(tokens)
+        expected_output = self._quantized_model(expected)(tokens)
+        layerwise_output = self._quantized_model(state_dict)(tokens)
+        expected_error = torch.linalg.norm(expected_output - output)
+        self.assertLess(
+            torch.linalg.norm(layerwise_output - output), 1.1 * expected_error
+        )
+        self.assertLess(
+            torch.linalg.norm(layerwise_output - expected_output),
+            0.5 * expected_error,
+        )
+
+    @torch.no_grad()
+    def test_resume(self) -> None:
+        expected = self._quantize(LayerwiseGPTQRunner, batch_size=3)
+
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        quantize_linears = LayerwiseGPTQRunner._quantize_linears
+        prefixes = []
+
+        def interrupt(runner, fn, hidden, module, prefix):
+            prefixes.append(prefix)
+            if prefix == "layers.1.":
+                raise KeyboardInterrupt()
+            return quantize_linears(runner, fn, hidden, module, prefix)
+
+        with patch.object(LayerwiseGPTQRunner, "_quantize_linears", interrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self._quantize(
+                    LayerwiseGPTQRunner,
+                    batch_size=3,
+                    checkpoint_dir=checkpoint_dir.name,
+                )
+        self.assertEqual(prefixes, ["layers.0.", "layers.1."])
+
+        # The second run starts from the first block that was not saved.
+        def record(runner, fn, hidden, module, prefix):
+            prefixes.append(prefix)
+            return quantize_linears(runner, fn, hidden, module, prefix)
+
+        prefixes.clear()
+        with patch.object(LayerwiseGPTQRunner, "_quantize_linears", record):
+            state_dict = self._quantize(
+                LayerwiseGPTQRunner, batch_size=3, checkpoint_dir=checkpoint_dir.name
+            )
+        self.assertEqual(prefixes, ["layers.1.", "output"])
+
+        self.assertEqual(state_dict.keys(), expected.keys())
+        for name, tensor in state_dict.items():
+            torch.testing.assert_close(tensor, expected[name], msg=name)
+
+        # Checkpoints are only resumed with the same settings.
+        with self.assertRaises(ValueError):
+            self._quantize(
+                LayerwiseGPTQRunner,
+                batch_size=3,
+                checkpoint_dir=checkpoint_dir.name,
+                percdamp=0.1,
+            )
@@ -83,6 +83,11 @@ class ModelArgs:
         False  # Use custom sdpa op that updates kv cache in-place
     )
     rope_freq_base: float = 10000.0  # The base frequency for RoPE
+    # If set, the kv cache is a ring buffer that only keeps the first
+    # attention_sink_size tokens and the last sliding_window tokens, which are the
+    # ones attended to.
+    sliding_window: Optional[int] = None
+    attention_sink_size: int = 0
     # Additional Model Metadata needed at runtime
     bos_idx: int = 1
     eos_idx: int = 3
@@ -96,6 +101,12 @@ class ModelArgs:
         if self.use_sdpa_with_kv_cache_op:
             assert self.use_kv_cache, "use_sdpa_with_kv_cache_op requires use_kv_cache"
 
+        if self.sliding_window is not None:
+            assert self.use_kv_cache, "sliding_window requires use_kv_cache"
+            assert (
+                not self.use_sdpa_with_kv_cache_op
+            ), "sliding_window is not supported by use_sdpa_with_kv_cache_op"
+
 
 def repeat_kv(x: torch.Tensor, n_rep: int) -> torch.Tensor:
     """torch.repeat_interleave(x, dim=2, repeats=n_rep)"""
@@ -109,6 +120,85 @@ def repeat_kv(x: torch.Tensor, n_rep: int) -> torch.Tensor:
     )
 
 
+def ring_kv_cache_slots(
+    positions: torch.Tensor, sliding_window: int, attention_sink_size: int
+) -> torch.Tensor:
+    """Returns the slots of a ring buffer kv cache holding the tokens at positions."""
+    return torch.where(
+        positions < attention_sink_size,
+        positions,
+        attention_sink_size + (positions - attention_sink_size) % sliding_window,
+    )
+
+
+def ring_kv_cache_mask(
+    start_pos: int,
+    seqlen: int,
+    sliding_window: int,
+    attention_sink_size: int,
+    dtype: torch.dtype,
+) -> torch.Tensor:
+    """
+    Returns the attention mask of the queries at positions [start_pos, start_pos +
+    seqlen) over the keys of a ring buffer kv cache holding the tokens before
+    start_pos, followed by the seqlen new keys.
+
+    A query attends to the attention sink tokens, and to the tokens of the last
+    sliding_window positions up to its own.
+    """
+    cache_len = attention_sink_size + sliding_window
+    slots = torch.arange(cache_len)
+    # The position of the last token written to each slot, which is negative for
+    # the slots that were never written.
+    last_pos = start_pos - 1
+    slot_pos = torch.where(
+        slots < attention_sink_size,
+        torch.where(slots <= last_pos, slots, -1),
+        last_pos - (last_pos - slots) % sliding_window,
+    )
+    slot_pos = torch.where(
+        (slots >= attention_sink_size) & (slot_pos < attention_sink_size),
+        -1,
+        slot_pos,
+    )
+    new_pos = start_pos + torch.arange(seqlen)
+    key_pos = torch.cat([slot_pos, new_pos]).unsqueeze(0)
+    query_pos = new_pos.unsqueeze(1)
+    allowed = (
+        (key_pos >= 0)
+        & (key_pos <= query_pos)
+        & ((key_pos < attention_sink_size) | (query_pos - key_pos < sliding_window))
+    )
+    return torch.zeros(allowed.shape, dtype=dtype).masked_fill(~allowed, float("-inf"))
+
+
+def grouped_query_attention(
+    xq: torch.Tensor, keys: torch.Tensor, values: torch.Tensor, mask: torch.Tensor
+) -> torch.Tensor:
+    """
+    Scaled dot product attention of the query heads over the shared key and value
+    heads of their group, without repeating the keys and values for each head.
+
+    Args:
+        xq: (bs, n_heads, seqlen, head_dim)
+        keys, values: (bs, n_kv_heads, kv_len, head_dim)
+        mask: (seqlen, kv_len)
+
+    Returns:
+        (bs, n_heads, seqlen, head_dim)
+    """
+    bsz, n_heads, seqlen, head_dim = xq.shape
+    n_kv_heads = keys.shape[1]
+    n_rep = n_heads // n_kv_heads
+    # The heads of a group are consecutive, as with repeat_kv. Fold them into the
+    # query length, so that each group attends to its key and value head.
+    xq = xq.reshape(bsz, n_kv_heads, n_rep * seqlen, head_dim)
+    output = F.scaled_dot_product_attention(
+        xq, keys, values, attn_mask=mask.repeat(n_rep, 1), dropout_p=0.0
+    )
+    return output.reshape(bsz, n_heads, seqlen, head_dim)
+
+
 def precompute_freqs_cis(dim: int, end: int, theta: float):
     freqs = 1.0 / (
         theta ** (torch.arange(0, dim, 2, device="cpu")[: (dim // 2)].float() / dim)
@@ -178,15 +268,23 @@ class Attention(nn.Module):
 
         self.use_sdpa_with_kv_cache_op = args.use_sdpa_with_kv_cache_op
         self.layer_id = layer_id
+        self.sliding_window = args.sliding_window
+        self.attention_sink_size = args.attention_sink_size
+        cache_len = args.max_seq_len
+        if self.sliding_window is not None:
+            cache_len = self.attention_sink_size + self.sliding_window
+
+        # The ring buffer kv cache computes its masks, this one would take
+        # max_seq_len^2 elements.
+        if self.sliding_window is None:
+            mask = torch.full(
+                (1, 1, args.max_seq_len, args.max_seq_len),
+                float("-inf"),
+                device="cpu",
+            )
 
-        mask = torch.full(
-            (1, 1, args.max_seq_len, args.max_seq_len),
-            float("-inf"),
-            device="cpu",
-        )
-
-        mask = torch.triu(mask, diagonal=1)
-        self.register_buffer("mask", mask)
+            mask = torch.triu(mask, diagonal=1)
+            self.register_buffer("mask", mask)
 
         # This is what we would use if ExecuTorch could support mutable buffers. We can't at this time, so instead
         # what is done is this module takes in the cache as io.
@@ -198,7 +296,7 @@ class Attention(nn.Module):
         # )
         self.kv_cache_sizes = [
             args.max_batch_size,
-            args.max_seq_len,
+            cache_len,
             self.n_kv_heads,
             self.head_dim,
         ]
@@ -255,6 +353,10 @@ class Attention(nn.Module):
                 output = output.view(bsz, seqlen, -1)
                 output = self.wo(output)
                 return output, cache_k, cache_v
+            elif self.sliding_window is not None:
+                return self._forward_ring_kv_cache(
+                    xq, xk, xv, start_pos, cache_k, cache_v
+                )
             else:
                 # Replace the entry in the cache for this token
                 # The following lines are equivalent to:
@@ -273,10 +375,6 @@ class Attention(nn.Module):
             keys = xk
             values = xv
 
-        # grouped multiquery attention: expand out keys and values
-        keys = repeat_kv(keys, self.n_rep)  # (bs, seqlen, n_local_heads, head_dim)
-        values = repeat_kv(values, self.n_rep)  # (bs, seqlen, n_local_heads, head_dim)
-
         # make heads into a batch dimension
         xq = xq.transpose(1, 2)  # (bs, n_local_heads, seqlen, head_dim)
         keys = keys.transpose(1, 2)
@@ -292,10 +390,26 @@ class Attention(nn.Module):
         # tensor will be 2-dimensional, regarldess of the values of l & s
         mask = torch.squeeze(mask, [0, 1])
 
-        output = F.scaled_dot_product_attention(
-            xq, keys, values, attn_mask=mask, dropout_p=0.0
-        )
+        if self.n_rep > 1:
+            # grouped multiquery attention: share the keys and values of each group
+            # instead of expanding them out
+            output = grouped_query_attention(
+                xq, keys, values, mask.expand(seqlen, keys.shape[2])
+            )
+        else:
+            output = F.scaled_dot_product_attention(
+                xq, keys, values, attn_mask=mask, dropout_p=0.0
+            )
 
+        return self._output(output, cache_k, cache_v)
+
+    def _output(
+        self,
+        output: torch.Tensor,
+        cache_k: Optional[torch.Tensor],
+        cache_v: Optional[torch.Tensor],
+    ):
+        bsz, _, seqlen, _ = output.shape
         output = output.transpose(1, 2).contiguous().view(bsz, seqlen, -1)
 
         output = self.wo(output)
@@ -305,6 +419,46 @@ class Attention(nn.Module):
         else:
             return output, None, None
 
+    def _forward_ring_kv_cache(
+        self,
+        xq: torch.Tensor,
+        xk: torch.Tensor,
+        xv: torch.Tensor,
+        start_pos: int,
+        cache_k: torch.Tensor,
+        cache_v: torch.Tensor,
+    ):
+        """
+        Attention with a ring buffer kv cache of attention_sink_size + sliding_window
+        slots, whose cost does not depend on start_pos.
+
+        The queries attend to the tokens in the cache and to the new tokens, which
+        then replace the oldest tokens of the window in the cache. seqlen must not be
+        larger than sliding_window.
+        """
+        bsz, seqlen, _, _ = xq.shape
+        assert seqlen <= self.sliding_window  # pyre-ignore[58]
+        mask = ring_kv_cache_mask(
+            start_pos,
+            seqlen,
+            self.sliding_window,  # pyre-ignore[6]
+            self.attention_sink_size,
+            xq.dtype,
+        )
+        keys = torch.cat([cache_k[:bsz], xk], dim=1).transpose(1, 2)
+        values = torch.cat([cache_v[:bsz], xv], dim=1).transpose(1, 2)
+
+        slots = ring_kv_cache_slots(
+            start_pos + torch.arange(seqlen),
+            self.sliding_window,  # pyre-ignore[6]
+            self.attention_sink_size,
+        )
+        cache_k[:bsz].index_copy_(1, slots, xk)
+        cache_v[:bsz].index_copy_(1, slots, xv)
+
+        output = grouped_query_attention(xq.transpose(1, 2), keys, values, mask)
+        return self._output(output, cache_k, cache_v)
+
 
 class FeedForward(nn.Module):
     def __init__(self, args: ModelArgs):
@@ -0,0 +1,175 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+from typing import List
+
+import torch
+import torch.nn.functional as F
+
+from .llama_transformer import (
+    grouped_query_attention,
+    ModelArgs,
+    repeat_kv,
+    ring_kv_cache_mask,
+    Transformer,
+)
+
+
+def _banded_mask(seqlen: int, sliding_window: int, attention_sink_size: int):
+    """
+    The mask of a sliding window attention over the whole sequence: each token
+    attends to the attention sink tokens and to the last sliding_window tokens up to
+    its own.
+    """
+    query_pos = torch.arange(seqlen).unsqueeze(1)
+    key_pos = torch.arange(seqlen).unsqueeze(0)
+    allowed = (key_pos <= query_pos) & (
+        (key_pos < attention_sink_size) | (query_pos - key_pos < sliding_window)
+    )
+    return torch.zeros(seqlen, seqlen).masked_fill(~allowed, float("-inf"))
+
+
+class LlamaTransformerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+
+    def _args(self, **kwargs) -> ModelArgs:
+        return ModelArgs(
+            dim=32,
+            n_layers=2,
+            n_heads=4,
+            n_kv_heads=2,
+            vocab_size=64,
+            max_seq_len=24,
+            max_batch_size=1,
+            **kwargs,
+        )
+
+    def _ring_model(self, sliding_window: int, attention_sink_size: int):
+        return Transformer(
+            self._args(
+                use_kv_cache=True,
+                sliding_window=sliding_window,
+                attention_sink_size=attention_sink_size,
+            )
+        ).eval()
+
+    def _run_chunks(
+        self, model: Transformer, tokens: torch.Tensor, chunk_sizes: List[int]
+    ) -> torch.Tensor:
+        """Runs tokens through the kv cache model in chunks, and returns the logits."""
+        cache_k = torch.zeros(model.get_cache_sizes())
+        cache_v = torch.zeros(model.get_cache_sizes())
+        logits = []
+        start_pos = 0
+        for chunk_size in chunk_sizes:
+            chunk_logits, cache_k, cache_v = model(
+                tokens[:, start_pos : start_pos + chunk_size],
+                torch.tensor(start_pos),
+                cache_k,
+                cache_v,
+            )
+            logits.append(chunk_logits)
+            start_pos += chunk_size
+        return torch.cat(logits, dim=1)
+
+    @torch.no_grad()
+    def test_ring_kv_cache(self) -> None:
+        for sliding_window, attention_sink_size, chunk_sizes in (
+            (4, 0, [1] * 20),
+            (4, 2, [3, 1, 4, 2, 1, 1, 4, 3, 1]),
+            (6, 1, [6, 1, 1, 5, 2, 3, 1, 1]),
+            (3, 3, [2, 3, 1, 1, 3, 2, 1, 3, 2, 1, 1]),
+            (16, 4, [5, 1, 1, 1, 2, 1, 9]),
+        ):
+            with self.subTest(
+                sliding_window=sliding_window,
+                attention_sink_size=attention_sink_size,
+            ):
+                model = self._ring_model(sliding_window, attention_sink_size)
+                reference = Transformer(self._args()).eval()
+                reference.load_state_dict(model.state_dict(), strict=False)
+                seqlen = sum(chunk_sizes)
+                mask = _banded_mask(
+                    reference.params.max_seq_len, sliding_window, attention_sink_size
+                )
+                for layer in reference.layers:
+                    layer.attention.mask = mask[None, None]
+
+                tokens = torch.randint(0, 64, (1, seqlen))
+                torch.testing.assert_close(
+                    self._run_chunks(model, tokens, chunk_sizes), reference(tokens)
+                )
+
+    def test_ring_kv_cache_mask(self) -> None:
+        # Sink tokens 0 and 1, and window slots holding positions 6, 7, 4 and 5.
+        mask = ring_kv_cache_mask(8, 2, 4, 2, torch.float32)
+        allowed = mask == 0
+        self.assertEqual(
+            allowed.tolist(),
+            [
+                # Position 8 attends to 0, 1, 5, 6, 7 and itself.
+                [True, True, True, True, False, True, True, False],
+                # Position 9 attends to 0, 1, 6, 7, 8 and itself.
+                [True, True, True, True, False, False, True, True],
+            ],
+        )
+        # Slots that were never written are masked.
+        mask = ring_kv_cache_mask(1, 1, 4, 2, torch.float32)
+        self.assertEqual(
+            (mask == 0).tolist(), [[True, False, False, False, False, False, True]]
+        )
+
+    def test_grouped_query_attention(self) -> None:
+        head_dim = 8
+        seqlen = 5
+        kv_len = 7
+        for n_heads, n_kv_heads in ((4, 4), (4, 2), (6, 2), (4, 1)):
+            with self.subTest(n_heads=n_heads, n_kv_heads=n_kv_heads):
+                xq = torch.randn(2, n_heads, seqlen, head_dim)
+                keys = torch.randn(2, n_kv_heads, kv_len, head_dim)
+                values = torch.randn(2, n_kv_heads, kv_len, head_dim)
+                mask = torch.zeros(seqlen, kv_len).masked_fill(
+                    torch.rand(seqlen, kv_len) < 0.3, float("-inf")
+                )
+                # Every query attends to at least one key.
+                mask[:, 0] = 0
+
+                n_rep = n_heads // n_kv_heads
+                expected = F.scaled_dot_product_attention(
+                    xq,
+                    repeat_kv(keys.transpose(1, 2), n_rep).transpose(1, 2),
+                    repeat_kv(values.transpose(1, 2), n_rep).transpose(1, 2),
+                    attn_mask=mask,
+                )
+                torch.testing.assert_close(
+                    grouped_query_attention(xq, keys, values, mask), expected
+                )
+
+    @torch.no_grad()
+    def test_export_ring_kv_cache(self) -> None:
+        model = self._ring_model(sliding_window=4, attention_sink_size=2)
+        cache_k = torch.zeros(model.get_cache_sizes())
+        cache_v = torch.zeros(model.get_cache_sizes())
+        exported = torch.export.export(
+            model,
+            (torch.tensor([[1]]), torch.tensor(0), cache_k.clone(), cache_v.clone()),
+        )
+
+        # The exported model matches the eager one, before and after the ring
+        # buffer wraps around.
+        tokens = torch.randint(0, 64, (1, 12))
+        exported_cache_k, exported_cache_v = cache_k.clone(), cache_v.clone()
+        for start_pos in range(tokens.shape[1]):
+            inputs = (tokens[:, start_pos : start_pos + 1], torch.tensor(start_pos))
+            expected, cache_k, cache_v = model(*inputs, cache_k, cache_v)
+            logits, exported_cache_k, exported_cache_v = exported.module()(
+                *inputs, exported_cache_k, exported_cache_v
+            )
+            torch.testing.assert_close(logits, expected)
+            torch.testing.assert_close(exported_cache_k, cache_k)
+            torch.testing.assert_close(exported_cache_v, cache_v)
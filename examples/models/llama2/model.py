@@ -101,8 +101,8 @@ the checkpoint format to avoid generating faulty models.
         # get checkpoint dtype
         self.dtype = None
         if len(checkpoint) > 0:
-            first = checkpoint[next(iter(checkpoint))]
-            self.dtype = first.dtype
+            first_key = next(iter(checkpoint))
+            self.dtype = checkpoint[first_key].dtype
             mismatched_dtypes = [
                 (key, value.dtype)
                 for key, value in checkpoint.items()
@@ -110,8 +110,12 @@ the checkpoint format to avoid generating faulty models.
             ]
             if len(mismatched_dtypes) > 0:
                 print(
-                    f"Mixed dtype model. Dtype of {first.key}: {first.dtype}. Mismatches in the checkpoint: {mismatched_dtypes}"
+                    f"Mixed dtype model. Dtype of {first_key}: {self.dtype}. Mismatches in the checkpoint: {mismatched_dtypes}"
                 )
+        # The dtype that get_eager_model converts the model to.
+        dtype_override = kwargs.get("dtype_override", None)
+        if dtype_override is not None:
+            self.dtype = dtype_override
         with open(params_path, "r") as f:
             params = json.loads(f.read())
         max_seq_len = self.max_seq_len
@@ -121,6 +125,8 @@ the checkpoint format to avoid generating faulty models.
             max_batch_size=max_batch_size,
             use_kv_cache=self.use_kv_cache,
             use_sdpa_with_kv_cache_op=self.use_sdpa_with_kv_cache_op,
+            sliding_window=kwargs.get("sliding_window", None),
+            attention_sink_size=kwargs.get("attention_sink_size", 0),
             **params,
         )
         if kwargs.get("fairseq2", False):
@@ -0,0 +1,67 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import tempfile
+import unittest
+
+import torch
+
+from .llama_transformer import ModelArgs, Transformer
+from .model import Llama2Model
+
+
+class Llama2ModelTest(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        params = {
+            "dim": 32,
+            "multiple_of": 4,
+            "n_heads": 4,
+            "n_layers": 2,
+            "norm_eps": 1e-05,
+            "vocab_size": 64,
+        }
+        self.params_path = os.path.join(temp_dir.name, "params.json")
+        with open(self.params_path, "w") as f:
+            json.dump(params, f)
+        model = Transformer(ModelArgs(**params)).to(torch.bfloat16)
+        # Like llama checkpoints, the checkpoint has no attention mask buffers.
+        self.checkpoint = {
+            name: tensor
+            for name, tensor in model.state_dict().items()
+            if not name.endswith(".mask")
+        }
+        self.checkpoint_path = os.path.join(temp_dir.name, "checkpoint.pth")
+        torch.save(self.checkpoint, self.checkpoint_path)
+
+    def test_dtype(self) -> None:
+        model = Llama2Model(checkpoint=self.checkpoint_path, params=self.params_path)
+        self.assertEqual(model.dtype, torch.bfloat16)
+        state_dict = model.get_eager_model().state_dict()
+        for name, tensor in self.checkpoint.items():
+            self.assertEqual(state_dict[name].dtype, torch.bfloat16, msg=name)
+            torch.testing.assert_close(state_dict[name], tensor, msg=name)
+
+    def test_dtype_override(self) -> None:
+        model = Llama2Model(
+            checkpoint=self.checkpoint_path,
+            params=self.params_path,
+            dtype_override=torch.float32,
+        )
+        self.assertEqual(model.dtype, torch.float32)
+        eager_model = model.get_eager_model()
+        state_dict = eager_model.state_dict()
+        for name, tensor in self.checkpoint.items():
+            self.assertEqual(state_dict[name].dtype, torch.float32, msg=name)
+            torch.testing.assert_close(state_dict[name], tensor.float(), msg=name)
+
+        # The model runs in the overridden dtype.
+        (tokens,) = model.get_example_inputs()
+        self.assertEqual(eager_model(tokens).dtype, torch.float32)
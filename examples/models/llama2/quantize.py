@@ -4,9 +4,13 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
-from functools import reduce
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial, reduce
 from math import gcd
-from typing import Dict, Optional, Tuple
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 import torch
 import torch.nn as nn
@@ -17,7 +21,6 @@ from .ops.quantized_ops import *  # noqa
 from torchao.quantization.quant_primitives import (
     get_group_qparams_symmetric,
     group_quantize_tensor_symmetric,
-    pack_scales_and_zeros,
     per_token_dynamic_quant,
 )
 
@@ -132,6 +135,100 @@ def dynamically_quantize_per_channel(
     return quant, scales, zero_points
 
 
+def load_checkpoint_mmap(checkpoint_path: str) -> Dict[str, torch.Tensor]:
+    """
+    Loads a checkpoint saved with torch.save, with its tensors backed by a memory
+    mapping of the file. Tensors are only read from disk when they are used.
+    """
+    checkpoint = torch.load(
+        checkpoint_path, map_location="cpu", mmap=True, weights_only=True
+    )
+    # Some checkpoints hold the weights in a "model" field, see Llama2Model.
+    return checkpoint.get("model", checkpoint)
+
+
+def _source_state_dict(
+    mod: nn.Module, checkpoint_path: Optional[str]
+) -> Dict[str, torch.Tensor]:
+    """
+    Returns the state dict that the weights to quantize are read from: the checkpoint
+    if one is given, whose keys must match the state dict of mod, otherwise the state
+    dict of mod.
+    """
+    if checkpoint_path is None:
+        return mod.state_dict()
+    return load_checkpoint_mmap(checkpoint_path)
+
+
+# Quantizes the weight of one module, and returns the state dict entries to update.
+QuantizeJob = Callable[[], Dict[str, torch.Tensor]]
+
+
+def quantize_state_dict(
+    state_dict: Dict[str, torch.Tensor],
+    jobs: List[QuantizeJob],
+    num_workers: Optional[int] = None,
+) -> Dict[str, torch.Tensor]:
+    """
+    Runs jobs on a pool of threads, and writes the entries they return into
+    state_dict in the order of jobs.
+
+    The quantization kernels release the GIL, so modules are quantized in parallel.
+    At most 2 * num_workers jobs are in flight, so that only their float weights are
+    resident at once when state_dict is memory-mapped.
+
+    Args:
+        state_dict: The state dict to update.
+        jobs: The jobs quantizing each module.
+        num_workers: The number of threads. Defaults to the number of CPUs.
+
+    Returns:
+        The updated state_dict.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending: Deque[Future] = deque()
+        for job in jobs:
+            pending.append(executor.submit(job))
+            if len(pending) >= 2 * num_workers:
+                state_dict.update(pending.popleft().result())
+        while pending:
+            state_dict.update(pending.popleft().result())
+    print(f"Quantized {len(jobs)} modules in {time.perf_counter() - start:.2f}s")
+    return state_dict
+
+
+def _quantize_weight_per_channel(
+    fqn: str,
+    weight: torch.Tensor,
+    range_min: int,
+    range_max: int,
+    group_size: Optional[int],
+) -> Dict[str, torch.Tensor]:
+    quantized, scales, _ = dynamically_quantize_per_channel(
+        weight.float(),
+        range_min,
+        range_max,
+        torch.int8,
+        group_size,
+        scales_dtype=weight.dtype,
+    )
+    return {
+        f"{fqn}.weight": quantized,
+        # squeeze makes groupsize=rowsize unidimensional
+        f"{fqn}.scales": scales.squeeze(dim=-1),
+    }
+
+
+def _bitwidth_range(bitwidth: int) -> Tuple[int, int]:
+    if bitwidth == 4:
+        return -8, 7
+    elif bitwidth == 8:
+        return -128, 127
+    raise ValueError(f"Unsupported bitwidth {bitwidth}")
+
+
 class QuantHandler:
     def __init__(self, mod):
         self.mod = mod
@@ -168,6 +265,22 @@ def replace_linear_weight_only_int8_per_channel(module, node_type):
 
 
 class WeightOnlyInt8QuantHandler:
+    """
+    Quantizes the weights of linear layers to int8, or int4 stored as int8.
+
+    Args:
+        mod: The model to quantize.
+        node_type: "*" for all linear layers, "output" for the output layer only, or
+            "!output" for all but the output layer.
+        bitwidth: 8 or 4.
+        group_size: The number of weights of a row that share a scale. Defaults to
+            whole rows.
+        checkpoint_path: If given, the float weights of the layers to quantize are
+            read from a memory mapping of this checkpoint instead of from mod. The
+            keys of the checkpoint must match the state dict of mod.
+        num_workers: The number of threads quantizing layers in parallel.
+    """
+
     def __init__(
         self,
         mod,
@@ -175,6 +288,8 @@ class WeightOnlyInt8QuantHandler:
         node_type: str = "*",
         bitwidth: Optional[int] = None,
         group_size: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        num_workers: Optional[int] = None,
     ):
         self.mod = mod
         self.group_size = group_size
@@ -183,24 +298,18 @@ class WeightOnlyInt8QuantHandler:
             self.bitwidth = 8
         else:
             self.bitwidth = bitwidth
+        self.checkpoint_path = checkpoint_path
+        self.num_workers = num_workers
 
     @torch.no_grad()
     def create_quantized_state_dict(self) -> Dict:
         cur_state_dict = self.mod.state_dict()
+        source_state_dict = _source_state_dict(self.mod, self.checkpoint_path)
+        range_min, range_max = _bitwidth_range(self.bitwidth)
 
-        if self.bitwidth == 4:
-            range_min = -8
-            range_max = 7
-        elif self.bitwidth == 8:
-            range_min = -128
-            range_max = 127
-        else:
-            raise ValueError(f"Unsupported bitwidth {self.bitwidth}")
-
+        jobs = []
         for fqn, mod in self.mod.named_modules():
-            # print(f"maybe? quantize {fqn}...{type(mod)}")
             if isinstance(mod, torch.nn.Linear) or isinstance(mod, fsLinear):
-                # print(f"candidate {fqn}, nodetype {self.node_type}")
                 if (
                     (self.node_type == "*")
                     or (self.node_type == "output" and fqn in ["output", "final_proj"])
@@ -209,28 +318,21 @@ class WeightOnlyInt8QuantHandler:
                         and fqn not in ["output", "final_proj"]
                     )
                 ):
-                    print(
-                        f"quantize {self.node_type} {fqn, mod} with groupsize {self.group_size}, bitwidth {self.bitwidth}"
-                    )
-
-                    # print(f"initial weight shape {mod.weight.shape}")
-                    input_weight = mod.weight.float()
-
-                    # print(f"expanded weight shape {input_weight.shape}")
-                    weight, scales, _ = dynamically_quantize_per_channel(
-                        input_weight,
-                        range_min,
-                        range_max,
-                        torch.int8,
-                        self.group_size,
-                        scales_dtype=mod.weight.dtype,
+                    jobs.append(
+                        partial(
+                            _quantize_weight_per_channel,
+                            fqn,
+                            source_state_dict[f"{fqn}.weight"],
+                            range_min,
+                            range_max,
+                            self.group_size,
+                        )
                     )
 
-                    cur_state_dict[f"{fqn}.weight"] = weight
-                    # squeeze makes groupsize=rowsize unidimensional
-                    cur_state_dict[f"{fqn}.scales"] = scales.squeeze(dim=-1)
-
-        return cur_state_dict
+        print(
+            f"quantize {len(jobs)} {self.node_type} linear layers with groupsize {self.group_size}, bitwidth {self.bitwidth}"
+        )
+        return quantize_state_dict(cur_state_dict, jobs, self.num_workers)
 
     def convert_for_runtime(self) -> nn.Module:
         replace_linear_weight_only_int8_per_channel(self.mod, self.node_type)
@@ -297,53 +399,56 @@ def replace_embedding_weight_only_grouped_int8_per_channel(
 
 
 class EmbeddingOnlyInt8QuantHandler:
-    def __init__(self, mod, *, bitwidth: int = 8, group_size: Optional[int] = None):
+    """
+    Quantizes the weights of embedding tables to int8, or int4 stored as int8.
+
+    See WeightOnlyInt8QuantHandler for checkpoint_path and num_workers.
+    """
+
+    def __init__(
+        self,
+        mod,
+        *,
+        bitwidth: int = 8,
+        group_size: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        num_workers: Optional[int] = None,
+    ):
         self.mod = mod
         self.group_size = group_size
         self.bitwidth = bitwidth
+        self.checkpoint_path = checkpoint_path
+        self.num_workers = num_workers
 
     @torch.no_grad()
     def create_quantized_state_dict(self) -> Dict:
         cur_state_dict = self.mod.state_dict()
+        source_state_dict = _source_state_dict(self.mod, self.checkpoint_path)
+        range_min, range_max = _bitwidth_range(self.bitwidth)
 
-        if self.bitwidth == 4:
-            range_min = -8
-            range_max = 7
-        elif self.bitwidth == 8:
-            range_min = -128
-            range_max = 127
-        else:
-            raise ValueError(f"Unsupported bitwidth {self.bitwidth}")
-
+        jobs = []
         for fqn, mod in self.mod.named_modules():
             if (
                 isinstance(mod, nn.Embedding)
                 or isinstance(mod, fsEmbedding)
                 or isinstance(mod, fsStandardEmbedding)
             ):
-                print("****")
                 print(f"Embedding identified: {fqn, mod}")
-                print(f"weights size: {mod.weight.size()}")
-                # print(f"quantize {fqn}...")
-
-                print(
-                    f"quantize {fqn, mod} with groupsize {self.group_size}, bitwidth {self.bitwidth}"
-                )
-                weight, scales, _ = dynamically_quantize_per_channel(
-                    mod.weight.float(),
-                    range_min,
-                    range_max,
-                    torch.int8,
-                    self.group_size,
-                    scales_dtype=mod.weight.dtype,
+                jobs.append(
+                    partial(
+                        _quantize_weight_per_channel,
+                        fqn,
+                        source_state_dict[f"{fqn}.weight"],
+                        range_min,
+                        range_max,
+                        self.group_size,
+                    )
                 )
 
-                # Update state dict
-                cur_state_dict[f"{fqn}.weight"] = weight
-                # squeeze makes groupsize=rowsize unidimensional
-                cur_state_dict[f"{fqn}.scales"] = scales.squeeze(dim=-1)
-
-        return cur_state_dict
+        print(
+            f"quantize {len(jobs)} embeddings with groupsize {self.group_size}, bitwidth {self.bitwidth}"
+        )
+        return quantize_state_dict(cur_state_dict, jobs, self.num_workers)
 
     def convert_for_runtime(self) -> nn.Module:
         replace_embedding_weight_only_grouped_int8_per_channel(
@@ -494,6 +599,13 @@ def replace_linear_8da4w(
 
 
 class Int8DynActInt4WeightQuantHandler:
+    """
+    Quantizes the weights of linear layers to int4 with groupwise scales, for use with
+    int8 dynamically quantized activations.
+
+    See WeightOnlyInt8QuantHandler for checkpoint_path and num_workers.
+    """
+
     def __init__(
         self,
         mod,
@@ -501,23 +613,47 @@ class Int8DynActInt4WeightQuantHandler:
         padding_allowed=False,
         precision=torch.float32,
         scales_precision=torch.float32,
+        checkpoint_path: Optional[str] = None,
+        num_workers: Optional[int] = None,
     ):
         self.mod = mod
         self.group_size = group_size
         self.padding_allowed = padding_allowed
         self.precision = precision
         self.scales_precision = scales_precision
+        self.checkpoint_path = checkpoint_path
+        self.num_workers = num_workers
         # assert group_size in [32, 64, 128, 256]
 
+    def _quantize_linear(
+        self, fqn: str, weight: torch.Tensor
+    ) -> Dict[str, torch.Tensor]:
+        """Quantizes the weight of the linear layer fqn."""
+        (
+            weight_int4pack,
+            scales,
+            zeros,
+        ) = prepare_int4_weight_and_scales_and_zeros(
+            weight.to(self.precision),
+            self.group_size,
+            self.scales_precision,
+        )
+        return {
+            f"{fqn}.weight": weight_int4pack.to("cpu"),
+            f"{fqn}.scales": scales.to("cpu"),
+            f"{fqn}.zeros": zeros.to("cpu"),
+        }
+
     @torch.no_grad()
     def create_quantized_state_dict(self):
         cur_state_dict = self.mod.state_dict()
+        source_state_dict = _source_state_dict(self.mod, self.checkpoint_path)
+        jobs = []
         for fqn, mod in self.mod.named_modules():
             if isinstance(mod, torch.nn.Linear):
                 assert not mod.bias
                 out_features = mod.out_features
                 in_features = mod.in_features
-                print("in features:", in_features, " out features:", out_features)
                 # assert out_features % 8 == 0, "require out_features % 8 == 0"
                 print(f"linear: {fqn}, in={in_features}, out={out_features}")
 
@@ -525,7 +661,6 @@ class Int8DynActInt4WeightQuantHandler:
                     in_features % self.group_size == 0
                 ), f"require in_features:{in_features} % self.group_size:{self.group_size} == 0"
 
-                weight = mod.weight.data
                 """
                 if not _check_linear_int4_k(
                     in_features, self.group_size
@@ -546,20 +681,13 @@ class Int8DynActInt4WeightQuantHandler:
                             + "and that group_size"
                         )
                 """
-                (
-                    weight_int4pack,
-                    scales,
-                    zeros,
-                ) = prepare_int4_weight_and_scales_and_zeros(
-                    weight.to(self.precision),
-                    self.group_size,
-                    self.scales_precision,
+                jobs.append(
+                    partial(
+                        self._quantize_linear, fqn, source_state_dict[f"{fqn}.weight"]
+                    )
                 )
-                cur_state_dict[f"{fqn}.weight"] = weight_int4pack.to("cpu")
-                cur_state_dict[f"{fqn}.scales"] = scales.to("cpu")
-                cur_state_dict[f"{fqn}.zeros"] = zeros.to("cpu")
 
-        return cur_state_dict
+        return quantize_state_dict(cur_state_dict, jobs, self.num_workers)
 
     def convert_for_runtime(self):
         replace_linear_8da4w(
@@ -660,17 +788,12 @@ class Int8DynActInt4WeightLinear(torch.nn.Module):
 
 #### GPTQ ########
 
-try:
-    from GPTQ import (  # pyre-ignore[21]
-        evaluate,
-        GenericGPTQRunner,
-        get_task_dict,
-        InputRecorder,
-        lm_eval,
-        MultiInput,
-    )
+from .GPTQ import GenericGPTQRunner, InputRecorder, LayerwiseGPTQRunner, MultiInput
 
-except:
+try:
+    from .GPTQ import evaluate, get_task_dict, lm_eval
+except ImportError:
+    # lm_eval is only needed to record the calibration inputs.
     pass
 
 
@@ -792,7 +915,16 @@ class GPTQQuantHandler(QuantHandler):
         calibration_limit,
         calibration_seq_length,
         pad_calibration_inputs,
+        layerwise: bool = False,
+        batch_size: int = 8,
+        checkpoint_dir: Optional[str] = None,
     ) -> Dict:
+        """
+        If layerwise is True, GPTQ is applied with a LayerwiseGPTQRunner, which runs
+        the calibration samples in batches of batch_size, one block of the model at a
+        time, and saves its progress to checkpoint_dir if set. Otherwise the model is
+        traced and run by a GenericGPTQRunner.
+        """
         inputs = GPTQQuantHandler.get_inputs(
             self.mod,
             tokenizer,
@@ -801,14 +933,26 @@ class GPTQQuantHandler(QuantHandler):
             calibration_seq_length,
             pad_calibration_inputs,
         )
-        print("Tracing model for GPTQ")
-        GPTQ_runner = GenericGPTQRunner(
-            self.mod,
-            inputs,
-            blocksize,
-            percdamp,
-            groupsize,
-        ).configure_quantization_mode(
+        if layerwise:
+            GPTQ_runner = LayerwiseGPTQRunner(
+                self.mod,
+                inputs,
+                blocksize,
+                percdamp,
+                groupsize,
+                batch_size,
+                checkpoint_dir,
+            )
+        else:
+            print("Tracing model for GPTQ")
+            GPTQ_runner = GenericGPTQRunner(
+                self.mod,
+                inputs,
+                blocksize,
+                percdamp,
+                groupsize,
+            )
+        GPTQ_runner.configure_quantization_mode(
             self.get_qparams_func,  # pyre-ignore[16]
             self.quantize_func,  # pyre-ignore[16]
             self.dequantize_func,  # pyre-ignore[16]
@@ -826,22 +970,27 @@ class GPTQQuantHandler(QuantHandler):
 
 
 class Int8DynActInt4WeightGPTQQuantHandler(GPTQQuantHandler):
+    """
+    Quantizes the weights of linear layers with GPTQ to int4 with groupwise scales,
+    for use with int8 dynamically quantized activations, like
+    Int8DynActInt4WeightQuantHandler. Linear layers whose in_features are not a
+    multiple of groupsize are left in float.
+    """
+
     def __init__(
         self,
+        mod,
         groupsize=128,
-        inner_k_tiles=8,
-        padding_allowed=True,
         precision=torch.float32,
+        scales_precision=torch.float32,
     ):
-
+        self.mod = mod
         self.groupsize = groupsize
-        self.inner_k_tiles = inner_k_tiles
-        self.padding_allowed = padding_allowed
         self.precision = precision
-        self.dyn_quant_func = lambda x: per_token_dynamic_quant(x)
+        self.scales_precision = scales_precision
         n_bit = 4
         self.get_qparams_func = lambda w: get_group_qparams_symmetric(
-            w, n_bit, groupsize, self.precision
+            w, n_bit, groupsize, self.scales_precision
         )
         quant_min = -(2 ** (n_bit - 1))
         quant_max = 2 ** (n_bit - 1) - 1
@@ -861,37 +1010,34 @@ class Int8DynActInt4WeightGPTQQuantHandler(GPTQQuantHandler):
         self.combine_qparams_list_func = lambda qparams_list: [
             torch.cat(x, dim=1) for x in zip(*qparams_list)
         ]
-        # skip unless padding_allowed=True or its correctly sized
-        self.skip_layer_func = lambda linear_weight: not (
-            _check_linear_int4_k(linear_weight.shape[-1], groupsize, inner_k_tiles)
-            or padding_allowed
+        # Int8DynActInt4WeightLinear does not pad its inputs.
+        self.skip_layer_func = lambda linear_weight: not _check_linear_int4_k(
+            linear_weight.shape[-1], groupsize
         )
-
-        # we need to do the padding here, both for q and the qparams if necessary
-        def make_names_and_values_dict_func(q, qparams):
-            k = q.shape[1]
-            new_k = _calc_padded_size_linear_int4(k, groupsize, inner_k_tiles)
-            # how much we need to pad the weight
-            delta_k = new_k - q.shape[1]
-            final_q = F.pad(q, pad=(0, delta_k))
-            scales_and_zeros = pack_scales_and_zeros(*qparams, precision=self.precision)
-            # how many new groups we need for padded weight
-            delta_groups = new_k // groupsize - scales_and_zeros.shape[0]
-            # TODO: split scales and zero_points
-            final_s_and_z = F.pad(
-                scales_and_zeros, pad=(0, 0, 0, 0, 0, delta_groups), value=1
-            )
-            return {"weight": final_q, "scales_and_zeros": final_s_and_z}
-
-        self.make_names_and_values_dict_func = make_names_and_values_dict_func
+        # The names of the buffers of Int8DynActInt4WeightLinear.
+        self.make_names_and_values_dict_func = lambda q, qparams: {
+            "weight": q,
+            "scales": qparams[0],
+            "zeros": qparams[1],
+        }
         super().__init__()
 
-    def convert_for_runtime(self, model):
+    def convert_for_runtime(self) -> nn.Module:
         replace_linear_8da4w(
-            model,
+            self.mod,
             self.groupsize,
-            self.padding_allowed,
-            torch.int8,
+            False,
             self.precision,
+            self.scales_precision,
         )
-        return model
+        return self.mod
+
+    def quantized_model(self, *args, **kwargs) -> nn.Module:
+        """
+        Quantizes mod, passing the arguments to create_quantized_state_dict, and
+        returns it.
+        """
+        model_updated_state_dict = self.create_quantized_state_dict(*args, **kwargs)
+        self.convert_for_runtime()
+        self.mod.load_state_dict(model_updated_state_dict)
+        return self.mod
@@ -0,0 +1,112 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+import unittest
+
+import torch
+
+from .llama_transformer import ModelArgs, Transformer
+from .quantize import EmbeddingOnlyInt8QuantHandler, WeightOnlyInt8QuantHandler
+
+
+class QuantizeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        torch.manual_seed(0)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.args = ModelArgs(
+            dim=32, n_layers=2, n_heads=4, vocab_size=64, max_seq_len=16
+        )
+        self.tokens = torch.randint(0, 64, (1, 8))
+
+    def _save_checkpoint(self, model: Transformer) -> str:
+        # Like llama checkpoints, the checkpoint has no attention mask buffers.
+        state_dict = {
+            name: tensor
+            for name, tensor in model.state_dict().items()
+            if not name.endswith(".mask")
+        }
+        checkpoint_path = os.path.join(self.temp_dir.name, "checkpoint.pth")
+        torch.save(state_dict, checkpoint_path)
+        return checkpoint_path
+
+    def test_checkpoint_path(self) -> None:
+        model = Transformer(self.args)
+        checkpoint_path = self._save_checkpoint(model)
+
+        for handler in (WeightOnlyInt8QuantHandler, EmbeddingOnlyInt8QuantHandler):
+            with self.subTest(handler=handler.__name__):
+                expected = Transformer(self.args)
+                expected.load_state_dict(model.state_dict())
+                expected = handler(expected).quantized_model()
+
+                # The weights to quantize are read from the checkpoint, not from
+                # the model, whose other entries are kept.
+                quantized = Transformer(self.args)
+                quantized.load_state_dict(model.state_dict())
+                with torch.no_grad():
+                    for parameter in quantized.parameters():
+                        parameter.zero_()
+                quantized = handler(
+                    quantized, checkpoint_path=checkpoint_path
+                ).quantized_model()
+
+                self.assertEqual(
+                    quantized.state_dict().keys(), expected.state_dict().keys()
+                )
+                quantized_keys = set(expected.state_dict()) - set(model.state_dict())
+                for name, tensor in quantized.state_dict().items():
+                    if name.rsplit(".", 1)[0] + ".scales" in quantized_keys:
+                        torch.testing.assert_close(
+                            tensor, expected.state_dict()[name], msg=name
+                        )
+                    elif name.endswith(".weight"):
+                        self.assertEqual(tensor.count_nonzero(), 0, msg=name)
+
+    def test_chained_checkpoint_path(self) -> None:
+        model = Transformer(self.args)
+        checkpoint_path = self._save_checkpoint(model)
+        quantized = Transformer(self.args)
+        quantized.load_state_dict(model.state_dict())
+        expected = EmbeddingOnlyInt8QuantHandler(
+            WeightOnlyInt8QuantHandler(model).quantized_model()
+        ).quantized_model()
+
+        # Quantizing the embeddings from the checkpoint keeps the quantized linears.
+        for handler in (WeightOnlyInt8QuantHandler, EmbeddingOnlyInt8QuantHandler):
+            quantized = handler(
+                quantized, checkpoint_path=checkpoint_path, num_workers=2
+            ).quantized_model()
+
+        self.assertEqual(quantized.state_dict().keys(), expected.state_dict().keys())
+        for name, tensor in quantized.state_dict().items():
+            torch.testing.assert_close(tensor, expected.state_dict()[name], msg=name)
+        torch.testing.assert_close(quantized(self.tokens), expected(self.tokens))
+
+    def test_num_workers(self) -> None:
+        model = Transformer(self.args)
+        expected = EmbeddingOnlyInt8QuantHandler(
+            model, num_workers=1
+        ).create_quantized_state_dict()
+        # Modules are quantized in parallel, and written back in the same order.
+        state_dict = EmbeddingOnlyInt8QuantHandler(
+            model, num_workers=4
+        ).create_quantized_state_dict()
+        self.assertEqual(list(state_dict), list(expected))
+        for name, tensor in state_dict.items():
+            torch.testing.assert_close(tensor, expected[name], msg=name)
+
+        expected = WeightOnlyInt8QuantHandler(
+            model, num_workers=1
+        ).create_quantized_state_dict()
+        state_dict = WeightOnlyInt8QuantHandler(
+            model, num_workers=4
+        ).create_quantized_state_dict()
+        self.assertEqual(list(state_dict), list(expected))
+        for name, tensor in state_dict.items():
+            torch.testing.assert_close(tensor, expected[name], msg=name)
@@ -8,11 +8,17 @@
 
 from executorch.exir._serialize._program import (
     deserialize_pte_binary as _deserialize_pte_binary,
+    LazyProgram as _LazyProgram,
+    load_pte_file as _load_pte_file,
     serialize_pte_binary as _serialize_pte_binary,
+    write_pte_binary as _write_pte_binary,
 )
 
 # Internal APIs that should not be used outside of exir.
 __all__ = [
     "_deserialize_pte_binary",
+    "_LazyProgram",
+    "_load_pte_file",
     "_serialize_pte_binary",
+    "_write_pte_binary",
 ]
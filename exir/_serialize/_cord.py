@@ -4,8 +4,70 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import ctypes
 import io
-from typing import List, Optional, Union
+import os
+from dataclasses import dataclass
+from typing import Any, List, Optional, Union
+
+# The largest number of buffers to pass to a single os.writev() call.
+_IOV_MAX: int = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+
+# Size of the chunks used when copying file ranges without os.sendfile().
+_COPY_CHUNK_SIZE: int = 1 << 20
+
+
+@dataclass(frozen=True)
+class FileRange:
+    """A range of bytes in a file, read only when the data is needed."""
+
+    path: str
+    offset: int
+    length: int
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self) -> bytes:
+        """Reads the bytes in the range."""
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(self.length)
+        if len(data) != self.length:
+            raise ValueError(
+                f"Expected {self.length} bytes at offset {self.offset} of "
+                + f"{self.path}, read {len(data)}"
+            )
+        return data
+
+
+# The types of the pieces that a Cord holds.
+_Buffer = Union[bytes, memoryview, FileRange]
+
+
+def _storage_view(storage: Any) -> memoryview:
+    """Returns a view of the memory of a CPU torch.UntypedStorage.
+
+    The view keeps the storage alive, so the storage does not need to be
+    referenced anywhere else. Torch is not imported; any object with the same
+    `data_ptr()`, `nbytes()` and `device` interface is accepted.
+    """
+    device = getattr(storage, "device", None)
+    if device is not None and getattr(device, "type", device) != "cpu":
+        raise ValueError(f"Can only append storages on the CPU, received {device}")
+    nbytes = storage.nbytes()
+    if nbytes == 0:
+        return memoryview(b"")
+    array = (ctypes.c_char * nbytes).from_address(storage.data_ptr())
+    # The memoryview references the array, which references the storage.
+    array._storage = storage
+    return memoryview(array).cast("B")
+
+
+def _is_storage(data: Any) -> bool:
+    return callable(getattr(data, "data_ptr", None)) and callable(
+        getattr(data, "nbytes", None)
+    )
 
 
 class Cord:
@@ -14,11 +76,18 @@ class Cord:
     Users can use a Cord to assemble large files and data blobs using references
     to and slices of other data, instead of copying and appending that data to a
     `bytes` or `bytearray` object.
+
+    A Cord can reference `bytes`, any object that supports the buffer protocol
+    (`bytearray`, `memoryview`, `mmap`, numpy arrays), CPU torch storages, and
+    ranges of files. None of these are copied until the Cord is converted to
+    `bytes`; `write_to_file()` writes them without copying when it can.
+    Mutable buffers are referenced, not snapshotted, so they must not be
+    modified while the Cord is in use.
     """
 
-    def __init__(self, data: Optional[Union[bytes, "Cord"]] = None) -> None:
+    def __init__(self, data: Optional[Union[Any, "Cord"]] = None) -> None:
         """Initialize Cord data structure."""
-        self._buffers: List[bytes] = []
+        self._buffers: List[_Buffer] = []
         self._byte_size: int = 0
 
         if data is not None:
@@ -30,20 +99,154 @@ class Cord:
 
     def __bytes__(self) -> bytes:
         """Return the contents of the Cord as a single `bytes` object."""
-        return b"".join(self._buffers)
+        return b"".join(
+            b.read() if isinstance(b, FileRange) else b for b in self._buffers
+        )
 
-    def append(self, data: Union[bytes, "Cord"]) -> None:
-        """Append a bytes or Cord to the current Cord."""
-        if isinstance(data, bytes):
-            self._buffers.append(data)
-            self._byte_size += len(data)
+    def __getitem__(self, key: slice) -> "Cord":
+        """Returns a Cord containing a contiguous range of this Cord's bytes.
+
+        No data is copied: buffers that lie entirely within the range are
+        shared with the new Cord, and the buffers that the range boundaries
+        fall inside of are replaced by views of the relevant parts.
+        """
+        if not isinstance(key, slice):
+            raise TypeError(f"Cord indices must be slices, received {type(key)}")
+        start, stop, step = key.indices(self._byte_size)
+        if step != 1:
+            raise ValueError(f"Cord slices do not support steps, received {step}")
+        result = Cord()
+        pos = 0
+        for buffer in self._buffers:
+            if pos >= stop:
+                break
+            end = pos + len(buffer)
+            if end > start:
+                lo = max(start - pos, 0)
+                hi = min(stop, end) - pos
+                if lo == 0 and hi == len(buffer):
+                    result._append_buffer(buffer)
+                elif isinstance(buffer, FileRange):
+                    result._append_buffer(
+                        FileRange(buffer.path, buffer.offset + lo, hi - lo)
+                    )
+                else:
+                    result._append_buffer(memoryview(buffer)[lo:hi])
+            pos = end
+        return result
+
+    def _append_buffer(self, buffer: _Buffer) -> None:
+        self._buffers.append(buffer)
+        self._byte_size += len(buffer)
+
+    def append(self, data: Union[Any, "Cord"]) -> None:
+        """Append data to the current Cord, without copying it.
+
+        Args:
+            data: A Cord, `bytes`, a `FileRange`, a CPU torch storage, or any
+                other object that supports the buffer protocol.
+        """
+        if isinstance(data, (bytes, FileRange)):
+            self._append_buffer(data)
         elif isinstance(data, Cord):
             self._buffers.extend(data._buffers)
             self._byte_size += len(data)
+        elif _is_storage(data):
+            self._append_buffer(_storage_view(data))
         else:
-            raise TypeError(f"Can only append bytes or Cords, received {type(data)}")
+            try:
+                view = memoryview(data)
+            except TypeError:
+                raise TypeError(
+                    "Can only append Cords, buffers, storages or FileRanges, "
+                    + f"received {type(data)}"
+                )
+            if view.format != "B" or view.ndim != 1:
+                view = view.cast("B")
+            self._append_buffer(view)
 
     def write_to_file(self, outfile: io.BufferedIOBase) -> None:
-        """Write the Cord to a file."""
+        """Write the Cord to a file.
+
+        When `outfile` is backed by a file descriptor, in-memory buffers are
+        written with os.writev() and file ranges with os.sendfile(), so no
+        intermediate copies are made in Python.
+        """
+        fd = _fileno(outfile) if hasattr(os, "writev") else None
+        if fd is None:
+            for item in self._buffers:
+                outfile.write(item.read() if isinstance(item, FileRange) else item)
+            return
+
+        # Write at the file object's logical position, and leave it after the
+        # written data.
+        seekable = outfile.seekable()
+        if seekable:
+            position = outfile.tell()
+        outfile.flush()
+        if seekable:
+            os.lseek(fd, position, os.SEEK_SET)
+        pending: List[memoryview] = []
         for item in self._buffers:
-            outfile.write(item)
+            if isinstance(item, FileRange):
+                _writev_all(fd, pending)
+                pending = []
+                _sendfile_all(fd, item)
+            elif len(item):
+                pending.append(memoryview(item))
+        _writev_all(fd, pending)
+        if seekable:
+            outfile.seek(os.lseek(fd, 0, os.SEEK_CUR))
+
+
+def _fileno(outfile: Any) -> Optional[int]:
+    """Returns the file descriptor behind `outfile`, if it has one."""
+    try:
+        return outfile.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _writev_all(fd: int, views: List[memoryview]) -> None:
+    """Writes all of `views` to `fd`, retrying after partial writes."""
+    while views:
+        batch = views[:_IOV_MAX]
+        written = os.writev(fd, batch)
+        done = 0
+        while done < len(batch) and written >= len(batch[done]):
+            written -= len(batch[done])
+            done += 1
+        views = views[done:]
+        if written:
+            views[0] = views[0][written:]
+
+
+def _sendfile_all(fd: int, file_range: FileRange) -> None:
+    """Copies `file_range` to `fd`, in the kernel when possible."""
+    with open(file_range.path, "rb") as infile:
+        offset = file_range.offset
+        remaining = file_range.length
+        if hasattr(os, "sendfile"):
+            try:
+                while remaining > 0:
+                    sent = os.sendfile(fd, infile.fileno(), offset, remaining)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+            except OSError:
+                # Not supported for this kind of file; fall back to copying.
+                pass
+        infile.seek(offset)
+        while remaining > 0:
+            chunk = infile.read(min(remaining, _COPY_CHUNK_SIZE))
+            if not chunk:
+                break
+            _writev_all(fd, [memoryview(chunk)])
+            remaining -= len(chunk)
+        if remaining:
+            raise ValueError(
+                f"{file_range.path} ended {remaining} bytes before the end of "
+                + f"range [{file_range.offset}, "
+                + f"{file_range.offset + file_range.length})"
+            )
@@ -6,6 +6,7 @@
 
 # pyre-strict
 
+import functools
 import importlib.resources
 import os
 import re
@@ -14,13 +15,27 @@ import subprocess
 import tempfile
 
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional, Sequence
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from executorch.exir._serialize._cord import Cord
+from executorch.exir._serialize._flatbuffer_builder import _dataclass_to_flatbuffer
+from executorch.exir._serialize._flatbuffer_reader import (
+    _FlatbufferTable,
+    _read_flatbuffer,
+)
+from executorch.exir._serialize._flatbuffer_schema import _parse_schema, _Schema
+from executorch.exir.schema import Program
 
 
 # If this environment variable is set to true, save the flatc input files when
 # serialization fails.
 _SAVE_FLATC_ENV: str = "ET_EXIR_SAVE_FLATC_INPUTS_ON_FAILURE"
 
+# If this environment variable is set to true, serialize and deserialize
+# programs by converting them to and from JSON with `flatc`, instead of using
+# the in-process builder and reader.
+_USE_FLATC_ENV: str = "ET_EXIR_SERIALIZE_WITH_FLATC"
+
 
 def _is_valid_alignment(alignment: int) -> bool:
     """Returns True if the alignment is valid, or is None."""
@@ -112,6 +127,10 @@ class _ResourceFiles:
         for name in self._files.keys():
             self._files[name] = patch_fn(self._files[name])
 
+    def read(self, name: str) -> bytes:
+        """Returns the current contents of the named file."""
+        return self._files[name]
+
     def write_to(self, out_dir: str) -> None:
         """Writes the files to the specified directory. File names are based on
         the original resource names.
@@ -132,20 +151,19 @@ class _SchemaInfo:
     max_alignment: int
 
 
-def _prepare_schema(
-    out_dir: str,
+# The root program schema, and the schema files that it includes.
+_PROGRAM_SCHEMA: str = "program.fbs"
+_PROGRAM_SCHEMA_DEPS: Sequence[str] = ("scalar_type.fbs",)
+
+
+def _load_program_schema_files(
     constant_tensor_alignment: Optional[int] = None,
     delegate_alignment: Optional[int] = None,
-) -> _SchemaInfo:
-    """Returns the path to the program schema file after copying it and its deps
-    into out_dir. May patch the schema contents depending on the parameters to
-    this function.
+) -> Tuple[_ResourceFiles, int]:
+    """Returns the program schema files, possibly with patched alignments, along
+    with the largest "force_align" value found in them.
     """
-    program_schema = "program.fbs"
-    # Included by the root program schema; must also be present.
-    deps = ["scalar_type.fbs"]
-
-    schemas = _ResourceFiles([program_schema] + deps)
+    schemas = _ResourceFiles([_PROGRAM_SCHEMA] + list(_PROGRAM_SCHEMA_DEPS))
 
     # Update annotated alignments in the schema files.
     schemas.patch_files(
@@ -158,20 +176,52 @@ def _prepare_schema(
     # Find the largest alignment used in the patched schema files.
     get_alignments = _SchemaMaxAlignmentGetter()
     schemas.patch_files(get_alignments)
+    return schemas, get_alignments.max_alignment
+
+
+def _prepare_schema(
+    out_dir: str,
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+) -> _SchemaInfo:
+    """Returns the path to the program schema file after copying it and its deps
+    into out_dir. May patch the schema contents depending on the parameters to
+    this function.
+    """
+    schemas, max_alignment = _load_program_schema_files(
+        constant_tensor_alignment=constant_tensor_alignment,
+        delegate_alignment=delegate_alignment,
+    )
 
     # Write the patched schema files to the filesystem.
     schemas.write_to(out_dir)
 
     return _SchemaInfo(
-        root_path=os.path.join(out_dir, program_schema),
-        max_alignment=get_alignments.max_alignment,
+        root_path=os.path.join(out_dir, _PROGRAM_SCHEMA),
+        max_alignment=max_alignment,
     )
 
 
+@functools.lru_cache(maxsize=None)
+def _load_program_schema(
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+) -> Tuple[_Schema, int]:
+    """Returns the parsed program schema and its largest "force_align" value.
+
+    Cached, since the same alignments are typically used for every program.
+    """
+    schemas, max_alignment = _load_program_schema_files(
+        constant_tensor_alignment=constant_tensor_alignment,
+        delegate_alignment=delegate_alignment,
+    )
+    return _parse_schema(_PROGRAM_SCHEMA, schemas.read), max_alignment
+
+
 @dataclass
 class _FlatbufferResult:
     # Serialized flatbuffer data.
-    data: bytes
+    data: Cord
 
     # The maximum "force_align" value from the schema used to serialize the data.
     max_alignment: int
@@ -313,10 +363,48 @@ def _program_json_to_flatbuffer(
             ) from err
         with open(output_path, "rb") as output_file:
             return _FlatbufferResult(
-                data=output_file.read(), max_alignment=schema_info.max_alignment
+                data=Cord(output_file.read()), max_alignment=schema_info.max_alignment
             )
 
 
+def _use_flatc() -> bool:
+    """Returns True if programs should be serialized with `flatc`."""
+    return os.getenv(_USE_FLATC_ENV, "").strip() not in {"", "0"}
+
+
+def _program_to_flatbuffer(
+    program: Program,
+    *,
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+) -> _FlatbufferResult:
+    """Converts a Program into binary flatbuffer data without running `flatc`.
+
+    Produces data that is compatible with _program_json_to_flatbuffer(), but
+    writes it directly from the Program dataclasses. Buffer.storage and
+    BackendDelegateInlineData.data blobs are referenced by the returned Cord
+    instead of being copied.
+
+    Args:
+        program: The Program to convert.
+        constant_tensor_alignment: If provided, the alignment to use for tensor
+            data embedded in the output flatbuffer data. If not provided, uses
+            the alignment in the schema.
+        delegate_alignment: If provided, the alignment to use for delegate
+            data embedded in the output flatbuffer data. If not provided, uses
+            the alignment in the schema.
+
+    Returns: The flatbuffer data and associated metadata.
+    """
+    schema, max_alignment = _load_program_schema(
+        constant_tensor_alignment=constant_tensor_alignment,
+        delegate_alignment=delegate_alignment,
+    )
+    return _FlatbufferResult(
+        data=_dataclass_to_flatbuffer(program, schema), max_alignment=max_alignment
+    )
+
+
 def _program_flatbuffer_to_json(program_flatbuffer: bytes) -> bytes:
     """Converts binary flatbuffer data into Program-compatible JSON.
 
@@ -336,3 +424,20 @@ def _program_flatbuffer_to_json(program_flatbuffer: bytes) -> bytes:
         _flatc_decompile(temp_dir, schema_info.root_path, bin_path)
         with open(json_path, "rb") as output_file:
             return output_file.read()
+
+
+def _read_program_flatbuffer(program_flatbuffer: Any) -> _FlatbufferTable:
+    """Returns a lazy view of the Program in some binary flatbuffer data.
+
+    The data is parsed in place using the schema in
+    //executorch/schema/program.fbs; nothing is decoded until it is accessed,
+    and byte vectors are returned as memoryviews of `program_flatbuffer`.
+
+    Args:
+        program_flatbuffer: Any object supporting the buffer protocol, like
+            bytes, a memoryview or an mmap.
+    """
+    # No need to patch the alignment when reading. "force_align" is only
+    # used during serialization.
+    schema, _ = _load_program_schema()
+    return _read_flatbuffer(program_flatbuffer, schema)
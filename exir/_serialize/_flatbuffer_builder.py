@@ -0,0 +1,269 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Serializes dataclass instances directly into binary flatbuffer data.
+
+This is an in-process replacement for converting dataclasses to JSON and
+running `flatc --binary` on the result. The layout of the input dataclasses
+must mirror the schema in the same way that `_DataclassEncoder` expects:
+field names match the schema, and union members are identified by the name of
+their dataclass type.
+"""
+
+import struct
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from executorch.exir._serialize._cord import Cord
+from executorch.exir._serialize._flatbuffer_schema import (
+    _FieldDef,
+    _FieldType,
+    _Schema,
+    _TableDef,
+)
+
+_UOFFSET: struct.Struct = struct.Struct("<I")
+_SOFFSET: struct.Struct = struct.Struct("<i")
+
+# Byte vectors at least this large are referenced by the output instead of
+# being copied into it.
+_ZERO_COPY_THRESHOLD: int = 1024
+
+
+def _padding(size: int, alignment: int) -> int:
+    """Returns the padding required to make `size` a multiple of `alignment`."""
+    return -size % alignment
+
+
+class _FlatbufferBuilder:
+    """Builds flatbuffer data back to front, like flatbuffers::FlatBufferBuilder.
+
+    Objects are written children-first, so every offset points towards the
+    end of the buffer. Positions are tracked as distances from the end of the
+    buffer, which stay valid as more data is prepended. Written data is kept as
+    a list of chunks in reverse order; large byte vectors are kept by reference
+    so that constant and delegate data are never copied.
+    """
+
+    def __init__(self, schema: _Schema) -> None:
+        self._schema = schema
+        # Chunks in reverse order, and whether each one should be referenced
+        # rather than copied when assembling the output.
+        self._chunks: List[Tuple[Any, bool]] = []
+        self._size: int = 0
+        self._min_align: int = 1
+        # Serialized vtable -> its distance from the end of the buffer.
+        self._vtables: Dict[bytes, int] = {}
+
+    def _prep(self, alignment: int, additional_bytes: int) -> None:
+        """Pads the buffer so that it will be aligned to `alignment` after
+        `additional_bytes` more bytes are written.
+        """
+        self._min_align = max(self._min_align, alignment)
+        pad = _padding(self._size + additional_bytes, alignment)
+        if pad:
+            self._push(b"\x00" * pad)
+
+    def _push(self, data: Any, reference: bool = False) -> int:
+        """Prepends `data` and returns its distance from the end of the buffer."""
+        self._chunks.append((data, reference))
+        self._size += len(data)
+        return self._size
+
+    def _write_string(self, value: str) -> int:
+        data = value.encode("utf-8")
+        self._prep(4, len(data) + 1)
+        self._push(data + b"\x00")
+        return self._push(_UOFFSET.pack(len(data)))
+
+    def _write_scalar_vector(
+        self,
+        element_type: _FieldType,
+        value: Sequence[Any],
+        force_align: Optional[int],
+    ) -> int:
+        if isinstance(value, (bytes, bytearray, memoryview)) and element_type.size == 1:
+            data = value
+        else:
+            fmt = element_type.struct_format
+            data = struct.pack(f"<{len(value)}{fmt}", *value)
+        # The length prefix must immediately precede the (aligned) data.
+        alignment = max(4, element_type.size, force_align or 1)
+        self._prep(alignment, len(data))
+        self._push(data, reference=len(data) >= _ZERO_COPY_THRESHOLD)
+        return self._push(_UOFFSET.pack(len(value)))
+
+    def _write_offset_vector(self, targets: List[int]) -> int:
+        self._prep(4, 4 * (len(targets) + 1))
+        # Distance from the end of the buffer to the length prefix.
+        start = self._size + 4 * (len(targets) + 1)
+        offsets = [start - 4 * (i + 1) - target for i, target in enumerate(targets)]
+        self._push(struct.pack(f"<{len(offsets)}I", *offsets))
+        return self._push(_UOFFSET.pack(len(targets)))
+
+    def _write_value(
+        self, field_type: _FieldType, value: Any, field_def: _FieldDef
+    ) -> int:
+        """Writes a non-inline value and returns its position."""
+        kind = field_type.kind
+        if kind == "string":
+            return self._write_string(value)
+        if kind == "table":
+            assert field_type.ref is not None
+            return self.write_table(value, self._schema.tables[field_type.ref])
+        assert kind == "vector" and field_type.element is not None
+        element = field_type.element
+        if element.kind in ("scalar", "enum"):
+            if element.kind == "enum" and not isinstance(
+                value, (bytes, bytearray, memoryview)
+            ):
+                value = [self._enum_value(element, v) for v in value]
+            return self._write_scalar_vector(element, value, field_def.force_align)
+        return self._write_offset_vector(
+            [self._write_value(element, v, field_def) for v in value]
+        )
+
+    def _enum_value(self, field_type: _FieldType, value: Any) -> int:
+        if isinstance(value, str):
+            assert field_type.ref is not None
+            return self._schema.enums[field_type.ref].values[value]
+        return int(value)
+
+    def _write_field(
+        self, field_def: _FieldDef, value: Any
+    ) -> List[Tuple[int, int, Any]]:
+        """Writes any out-of-line data for a field.
+
+        Returns a list of (vtable slot, size, inline value) entries, where the
+        inline value is either packed scalar bytes or the position of data
+        that the field should point to.
+        """
+        field_type = field_def.type
+        kind = field_type.kind
+        if kind == "scalar" or kind == "enum":
+            if kind == "enum":
+                value = self._enum_value(field_type, value)
+            elif isinstance(value, str) and field_type.scalar in ("float", "double"):
+                # flatc accepts strings like "+inf" and "nan" for floats in JSON.
+                value = float(value)
+            if value == field_def.default:
+                return []
+            packed = struct.pack("<" + field_type.struct_format, value)
+            return [(field_def.id, field_type.size, packed)]
+        if kind == "union":
+            assert field_type.ref is not None
+            union = self._schema.unions[field_type.ref]
+            member = type(value).__name__
+            if member not in union.members:
+                raise ValueError(f"{member} is not a member of union {union.name}")
+            table_name, index = union.members[member]
+            target = self.write_table(value, self._schema.tables[table_name])
+            return [
+                (field_def.id - 1, 1, struct.pack("<B", index)),
+                (field_def.id, 4, target),
+            ]
+        return [(field_def.id, 4, self._write_value(field_type, value, field_def))]
+
+    def write_table(self, obj: Any, table: _TableDef) -> int:
+        """Writes `obj` as an instance of `table` and returns its position.
+
+        Scalars equal to their schema default and `None` values are omitted,
+        as `flatc` does.
+        """
+        inline: List[Tuple[int, int, Any]] = []
+        for field_def in table.fields:
+            value = getattr(obj, field_def.name, None)
+            if field_def.deprecated or value is None:
+                continue
+            try:
+                inline.extend(self._write_field(field_def, value))
+            except struct.error as err:
+                raise ValueError(
+                    f"Cannot serialize {table.name}.{field_def.name}={value!r}: {err}"
+                ) from err
+
+        # Lay out the fields largest-first to minimize padding. The table
+        # begins with the signed offset to its vtable.
+        inline.sort(key=lambda f: -f[1])
+        alignment = 4
+        layout: List[Tuple[int, int, int, Any]] = []
+        table_size = 4
+        for slot, size, data in inline:
+            table_size += _padding(table_size, size)
+            layout.append((slot, table_size, size, data))
+            table_size += size
+            alignment = max(alignment, size)
+        table_size += _padding(table_size, alignment)
+
+        self._prep(alignment, table_size)
+        table_pos = self._size + table_size
+
+        num_slots = max((f[0] for f in layout), default=-1) + 1
+        slot_offsets = [0] * num_slots
+        table_data = bytearray(table_size)
+        for slot, offset, size, data in layout:
+            slot_offsets[slot] = offset
+            if isinstance(data, bytes):
+                table_data[offset : offset + size] = data
+            else:
+                # An offset to data written earlier, relative to this field.
+                _UOFFSET.pack_into(table_data, offset, table_pos - offset - data)
+        vtable = struct.pack(
+            f"<{num_slots + 2}H", 4 + 2 * num_slots, table_size, *slot_offsets
+        )
+
+        vtable_pos = self._vtables.get(vtable)
+        if vtable_pos is None:
+            # The new vtable immediately precedes the table.
+            vtable_pos = table_pos + len(vtable)
+        _SOFFSET.pack_into(table_data, 0, vtable_pos - table_pos)
+        self._push(bytes(table_data))
+        if vtable not in self._vtables:
+            self._vtables[vtable] = self._push(vtable)
+        return table_pos
+
+    def finish(self, root_pos: int, file_identifier: Optional[str]) -> Cord:
+        """Writes the root offset and file identifier, and returns the data.
+
+        The first element of the returned Cord always holds the root offset
+        and file identifier, so that a header can be inserted after them
+        without copying the rest of the data.
+        """
+        identifier = file_identifier.encode("ascii") if file_identifier else b""
+        self._prep(self._min_align, 4 + len(identifier))
+        total_size = self._size + 4 + len(identifier)
+
+        out = Cord(_UOFFSET.pack(total_size - root_pos) + identifier)
+        # Coalesce runs of small chunks, and reference the large ones.
+        pending: List[bytes] = []
+        for data, reference in reversed(self._chunks):
+            if reference:
+                if pending:
+                    out.append(b"".join(pending))
+                    pending = []
+                out.append(data)
+            else:
+                pending.append(data)
+        if pending:
+            out.append(b"".join(pending))
+        return out
+
+
+def _dataclass_to_flatbuffer(obj: Any, schema: _Schema) -> Cord:
+    """Serializes `obj` as the root table of `schema`.
+
+    Args:
+        obj: A dataclass instance matching the schema's root_type.
+        schema: The parsed flatbuffer schema.
+
+    Returns:
+        The binary flatbuffer data. Large byte vectors in `obj` are referenced
+        rather than copied.
+    """
+    builder = _FlatbufferBuilder(schema)
+    root_pos = builder.write_table(obj, schema.root_table)
+    return builder.finish(root_pos, schema.file_identifier)
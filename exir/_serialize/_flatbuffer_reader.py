@@ -0,0 +1,272 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Reads binary flatbuffer data in place, without converting it to JSON.
+
+Tables are exposed as lazy views: a field is only decoded when it is accessed,
+and byte vectors are returned as memoryview slices of the underlying data.
+When that data comes from an mmap, inspecting a single field of a very large
+file only touches the pages that hold it.
+"""
+
+import enum
+import functools
+import struct
+from typing import (
+    Any,
+    Dict,
+    get_args,
+    get_origin,
+    get_type_hints,
+    Iterator,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from executorch.exir._serialize._flatbuffer_schema import (
+    _FieldDef,
+    _FieldType,
+    _Schema,
+    _TableDef,
+)
+
+_U16: struct.Struct = struct.Struct("<H")
+_U32: struct.Struct = struct.Struct("<I")
+_I32: struct.Struct = struct.Struct("<i")
+
+# Resolving the annotations of a dataclass is relatively slow, and is done for
+# every table that is converted.
+_type_hints: Any = functools.lru_cache(maxsize=None)(get_type_hints)
+
+_NoneType: type = type(None)
+
+
+class _FlatbufferReader:
+    """Shared state for the views over one flatbuffer."""
+
+    def __init__(self, data: Any, schema: _Schema) -> None:
+        self.buf: memoryview = memoryview(data).cast("B")
+        self.schema = schema
+        # Table name -> field name -> field definition.
+        self.fields: Dict[str, Dict[str, _FieldDef]] = {
+            name: {f.name: f for f in table.fields}
+            for name, table in schema.tables.items()
+        }
+
+    def deref(self, pos: int) -> int:
+        """Follows the uoffset stored at `pos`."""
+        return pos + _U32.unpack_from(self.buf, pos)[0]
+
+    def read_string(self, pos: int) -> str:
+        length = _U32.unpack_from(self.buf, pos)[0]
+        return str(self.buf[pos + 4 : pos + 4 + length], "utf-8")
+
+    def read_value(self, field_type: _FieldType, pos: int) -> Any:
+        """Reads the non-scalar value that the uoffset at `pos` refers to."""
+        target = self.deref(pos)
+        kind = field_type.kind
+        if kind == "string":
+            return self.read_string(target)
+        if kind == "table":
+            assert field_type.ref is not None
+            return _FlatbufferTable(self, target, self.schema.tables[field_type.ref])
+        assert kind == "vector" and field_type.element is not None
+        element = field_type.element
+        length = _U32.unpack_from(self.buf, target)[0]
+        start = target + 4
+        if element.kind in ("scalar", "enum"):
+            if element.size == 1 and element.scalar != "bool":
+                # Zero-copy view of byte data.
+                return self.buf[start : start + length]
+            return list(
+                struct.unpack_from(f"<{length}{element.struct_format}", self.buf, start)
+            )
+        return _FlatbufferVector(self, element, start, length)
+
+
+class _FlatbufferVector(Sequence[Any]):
+    """A lazy view of a flatbuffer vector of tables or strings."""
+
+    def __init__(
+        self,
+        reader: _FlatbufferReader,
+        element: _FieldType,
+        start: int,
+        length: int,
+    ) -> None:
+        self._reader = reader
+        self._element = element
+        self._start = start
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"Index {index} out of range [0, {self._length})")
+        pos = self._start + 4 * index
+        if self._element.kind == "string":
+            return self._reader.read_string(self._reader.deref(pos))
+        return self._reader.read_value(self._element, pos)
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self._length):
+            yield self[i]
+
+
+class _FlatbufferTable:
+    """A lazy view of a flatbuffer table.
+
+    Fields are decoded on attribute access. Absent fields read as their schema
+    default (for scalars) or None (for everything else).
+    """
+
+    def __init__(
+        self,
+        reader: _FlatbufferReader,
+        pos: int,
+        table: _TableDef,
+        member_name: Optional[str] = None,
+    ) -> None:
+        self._reader = reader
+        self._pos = pos
+        self._table = table
+        # The union member name, if this table was reached through a union.
+        self.type_name: str = member_name or table.name
+        vtable = pos - _I32.unpack_from(reader.buf, pos)[0]
+        vtable_size = _U16.unpack_from(reader.buf, vtable)[0]
+        self._slots: memoryview = reader.buf[vtable + 4 : vtable + vtable_size]
+
+    def _field_pos(self, slot: int) -> int:
+        """Returns the position of the field in `slot`, or 0 if it is absent."""
+        if slot < 0 or 2 * slot >= len(self._slots):
+            return 0
+        offset = _U16.unpack_from(self._slots, 2 * slot)[0]
+        return self._pos + offset if offset else 0
+
+    def has_field(self, name: str) -> bool:
+        """Returns True if the named field is present in the data."""
+        return self._field_pos(self._reader.fields[self._table.name][name].id) != 0
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            field_def = self._reader.fields[self._table.name][name]
+        except KeyError:
+            raise AttributeError(f"Table {self._table.name} has no field {name}")
+        field_type = field_def.type
+        pos = self._field_pos(field_def.id)
+        if field_type.kind in ("scalar", "enum"):
+            if not pos:
+                return field_def.default
+            return struct.unpack_from(
+                "<" + field_type.struct_format, self._reader.buf, pos
+            )[0]
+        if not pos:
+            return None
+        if field_type.kind == "union":
+            assert field_type.ref is not None
+            type_pos = self._field_pos(field_def.id - 1)
+            index = self._reader.buf[type_pos] if type_pos else 0
+            if index == 0:
+                return None
+            member, table = self._reader.schema.unions[field_type.ref].member_for_index(
+                index
+            )
+            return _FlatbufferTable(
+                self._reader,
+                self._reader.deref(pos),
+                self._reader.schema.tables[table],
+                member_name=member,
+            )
+        return self._reader.read_value(field_type, pos)
+
+    def to_dataclass(self, cls: Any) -> Any:
+        """Recursively converts this table into an instance of `cls`.
+
+        Follows the same conventions as `_json_to_dataclass`: union members are
+        matched by class name, enums are converted to the annotated enum type,
+        and `bytes` fields are copied out of the underlying data.
+        """
+        hints = _type_hints(cls)
+        data: Dict[str, Any] = {}
+        for name in cls.__dataclass_fields__:
+            data[name] = _convert(getattr(self, name), hints[name], f"{cls}.{name}")
+        return cls(**data)
+
+
+# pyre-ignore[2]: Arbitrary type annotations.
+def _convert(value: Any, hint: Any, where: str) -> Any:
+    """Converts a value read from a view into the annotated Python type."""
+    origin = get_origin(hint)
+    if origin is Union:
+        args = [a for a in get_args(hint) if a is not _NoneType]
+        if value is None:
+            if len(args) < len(get_args(hint)):
+                return None
+            raise TypeError(f"Invalid Buffer. Received no value for field: {where}")
+        if isinstance(value, _FlatbufferTable) and len(args) > 1:
+            # A union: pick the member class by name.
+            matches = [a for a in args if a.__name__ == value.type_name]
+            if not matches:
+                raise TypeError(f"No member {value.type_name} in {hint} at {where}")
+            return value.to_dataclass(matches[0])
+        return _convert(value, args[0], where)
+    if origin is list:
+        (element_hint,) = get_args(hint)
+        return [_convert(v, element_hint, where) for v in (value or [])]
+    if value is None:
+        if hint is str:
+            return ""
+        raise TypeError(f"Invalid Buffer. Received no value for field: {where}")
+    if isinstance(value, _FlatbufferTable):
+        return value.to_dataclass(hint)
+    if isinstance(value, memoryview):
+        # Byte vectors become bytes if annotated as such, or lists otherwise.
+        return bytes(value) if hint is bytes else list(value)
+    if isinstance(hint, enum.EnumMeta):
+        return hint(value)
+    return value
+
+
+def _read_flatbuffer(
+    data: Any, schema: _Schema, check_identifier: bool = True
+) -> _FlatbufferTable:
+    """Returns a lazy view of the root table of some flatbuffer data.
+
+    Args:
+        data: The flatbuffer data. Any object supporting the buffer protocol;
+            e.g., bytes, a memoryview or an mmap. The data is not copied.
+        schema: The schema that describes the data.
+        check_identifier: If True and the schema declares a file_identifier,
+            make sure that the data contains the same identifier.
+
+    Raises:
+        ValueError: If the data is too short or has the wrong file identifier.
+    """
+    reader = _FlatbufferReader(data, schema)
+    if len(reader.buf) < 8:
+        raise ValueError(f"Flatbuffer data length {len(reader.buf)} < 8")
+    if check_identifier and schema.file_identifier:
+        identifier = bytes(reader.buf[4:8]).decode(errors="replace")
+        if identifier != schema.file_identifier:
+            raise ValueError(
+                f"Flatbuffer file identifier {identifier!r} does not match "
+                + f"{schema.file_identifier!r}"
+            )
+    return _FlatbufferTable(reader, reader.deref(0), schema.root_table)
+
+
+def _flatbuffer_to_dataclass(data: Any, schema: _Schema, cls: Any) -> Any:
+    """Decodes the root table of some flatbuffer data into an instance of `cls`."""
+    return _read_flatbuffer(data, schema).to_dataclass(cls)
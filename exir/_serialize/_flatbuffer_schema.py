@@ -0,0 +1,433 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""A minimal parser for flatbuffer schema (.fbs) files.
+
+Only supports the subset of the schema language used by the ExecuTorch
+schemas: tables, enums, unions, includes, and the `force_align`, `deprecated`
+and `id` field attributes. Structs, fixed-size arrays and rpc services are
+rejected.
+
+The parsed schema is consumed by the in-process flatbuffer builder and reader,
+which lets us avoid round-tripping large programs through JSON and `flatc`.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# Scalar type name -> (struct format character, size in bytes).
+_SCALAR_TYPES: Dict[str, Tuple[str, int]] = {
+    "bool": ("?", 1),
+    "byte": ("b", 1),
+    "ubyte": ("B", 1),
+    "short": ("h", 2),
+    "ushort": ("H", 2),
+    "int": ("i", 4),
+    "uint": ("I", 4),
+    "float": ("f", 4),
+    "long": ("q", 8),
+    "ulong": ("Q", 8),
+    "double": ("d", 8),
+}
+
+# Alternate spellings for the scalar types above.
+_SCALAR_ALIASES: Dict[str, str] = {
+    "int8": "byte",
+    "uint8": "ubyte",
+    "int16": "short",
+    "uint16": "ushort",
+    "int32": "int",
+    "uint32": "uint",
+    "int64": "long",
+    "uint64": "ulong",
+    "float32": "float",
+    "float64": "double",
+}
+
+_TOKEN_RE: re.Pattern[str] = re.compile(
+    r"""
+      (?P<skip>\s+|//[^\n]*|/\*.*?\*/)
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<number>[-+]?(?:0[xX][0-9a-fA-F]+|\d+\.?\d*(?:[eE][-+]?\d+)?))
+    | (?P<ident>[A-Za-z_][A-Za-z0-9_.]*)
+    | (?P<punct>[{}\[\]():;,=])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+@dataclass
+class _FieldType:
+    # One of "scalar", "enum", "string", "table", "union" or "vector".
+    kind: str
+    # For "scalar" and "enum", the name of the (underlying) scalar type. For
+    # "table", "union" and "enum", `ref` is the name of the referenced type.
+    scalar: Optional[str] = None
+    ref: Optional[str] = None
+    # For "vector", the type of the elements.
+    element: Optional["_FieldType"] = None
+
+    @property
+    def struct_format(self) -> str:
+        """The struct format character of a scalar or enum type."""
+        assert self.scalar is not None, f"{self} is not a scalar type"
+        return _SCALAR_TYPES[self.scalar][0]
+
+    @property
+    def size(self) -> int:
+        """The inline size of this type in bytes."""
+        if self.scalar is not None:
+            return _SCALAR_TYPES[self.scalar][1]
+        # Strings, tables, unions and vectors are stored as 32-bit offsets.
+        return 4
+
+
+@dataclass
+class _FieldDef:
+    name: str
+    type: _FieldType
+    # Index of the field in the table's vtable. For unions this is the slot of
+    # the value; the type discriminator lives in the preceding slot.
+    id: int = -1
+    default: Union[int, float, bool] = 0
+    # The "force_align" attribute; only meaningful for vectors.
+    force_align: Optional[int] = None
+    deprecated: bool = False
+
+
+@dataclass
+class _TableDef:
+    name: str
+    fields: List[_FieldDef] = field(default_factory=list)
+
+
+@dataclass
+class _EnumDef:
+    name: str
+    scalar: str
+    values: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class _UnionDef:
+    name: str
+    # Member name (the alias, if one is given) -> (table name, type index).
+    # Type index 0 is reserved for NONE.
+    members: Dict[str, Tuple[str, int]] = field(default_factory=dict)
+
+    def member_for_index(self, index: int) -> Tuple[str, str]:
+        """Returns the (member name, table name) with the given type index."""
+        for name, (table, i) in self.members.items():
+            if i == index:
+                return name, table
+        raise ValueError(f"Union {self.name} has no member with index {index}")
+
+
+@dataclass
+class _Schema:
+    tables: Dict[str, _TableDef] = field(default_factory=dict)
+    enums: Dict[str, _EnumDef] = field(default_factory=dict)
+    unions: Dict[str, _UnionDef] = field(default_factory=dict)
+    root_type: Optional[str] = None
+    file_identifier: Optional[str] = None
+
+    @property
+    def root_table(self) -> _TableDef:
+        if self.root_type is None:
+            raise ValueError("Schema does not declare a root_type")
+        return self.tables[self.root_type]
+
+    def max_force_align(self) -> int:
+        """Returns the largest force_align value found in the schema, or 1."""
+        alignments = [
+            f.force_align
+            for t in self.tables.values()
+            for f in t.fields
+            if f.force_align is not None
+        ]
+        return max(alignments, default=1)
+
+
+def _short_name(name: str) -> str:
+    """Strips any namespace qualifiers from a type name."""
+    return name.rsplit(".", 1)[-1]
+
+
+class _Tokens:
+    """A cursor over the tokens of a schema file."""
+
+    def __init__(self, text: str, source: str) -> None:
+        self._source = source
+        self._tokens: List[Tuple[str, str]] = list(self._tokenize(text))
+        self._pos = 0
+
+    def _tokenize(self, text: str) -> Iterator[Tuple[str, str]]:
+        pos = 0
+        while pos < len(text):
+            m = _TOKEN_RE.match(text, pos)
+            if m is None:
+                raise ValueError(
+                    f"{self._source}: unexpected character {text[pos]!r} "
+                    + f"at offset {pos}"
+                )
+            pos = m.end()
+            kind = m.lastgroup
+            assert kind is not None
+            if kind != "skip":
+                yield kind, m.group()
+
+    def peek(self) -> Optional[str]:
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos][1]
+        return None
+
+    def next(self) -> Tuple[str, str]:
+        if self._pos >= len(self._tokens):
+            raise ValueError(f"{self._source}: unexpected end of schema")
+        tok = self._tokens[self._pos]
+        self._pos += 1
+        return tok
+
+    def expect(self, value: str) -> None:
+        _, tok = self.next()
+        if tok != value:
+            raise ValueError(f"{self._source}: expected {value!r}, got {tok!r}")
+
+    def accept(self, value: str) -> bool:
+        if self.peek() == value:
+            self._pos += 1
+            return True
+        return False
+
+    def ident(self) -> str:
+        kind, tok = self.next()
+        if kind != "ident":
+            raise ValueError(f"{self._source}: expected identifier, got {tok!r}")
+        return tok
+
+    def string(self) -> str:
+        kind, tok = self.next()
+        if kind != "string":
+            raise ValueError(f"{self._source}: expected string, got {tok!r}")
+        return tok[1:-1]
+
+    def value(self) -> str:
+        _, tok = self.next()
+        return tok[1:-1] if tok.startswith('"') else tok
+
+
+def _parse_number(text: str) -> Union[int, float, bool]:
+    if text == "true":
+        return True
+    if text == "false":
+        return False
+    try:
+        return int(text, 0)
+    except ValueError:
+        return float(text)
+
+
+class _SchemaParser:
+    def __init__(self, load_include: Callable[[str], bytes]) -> None:
+        self._load_include = load_include
+        self._schema = _Schema()
+        self._included: set[str] = set()
+        # Unresolved field types and default values, keyed by
+        # (table name, field name).
+        self._raw_types: Dict[Tuple[str, str], Tuple[str, bool]] = {}
+        self._raw_defaults: Dict[Tuple[str, str], str] = {}
+        # Fields with an explicit (id: N) attribute.
+        self._explicit_ids: Dict[Tuple[str, str], int] = {}
+
+    def parse(self, name: str, data: bytes, is_root: bool) -> None:
+        tokens = _Tokens(data.decode("utf-8"), source=name)
+        while tokens.peek() is not None:
+            keyword = tokens.ident()
+            if keyword == "include":
+                include = tokens.string()
+                tokens.expect(";")
+                if include not in self._included:
+                    self._included.add(include)
+                    self.parse(include, self._load_include(include), is_root=False)
+            elif keyword in ("enum", "union", "table"):
+                getattr(self, f"_parse_{keyword}")(tokens)
+            elif keyword in ("namespace", "attribute", "file_extension"):
+                tokens.next()
+                tokens.expect(";")
+            elif keyword in ("file_identifier", "root_type"):
+                value = _short_name(tokens.value())
+                tokens.expect(";")
+                # Only the root file's declarations apply.
+                if is_root:
+                    setattr(self._schema, keyword, value)
+            else:
+                raise ValueError(f"{name}: unsupported schema declaration {keyword!r}")
+
+    def _parse_metadata(self, tokens: _Tokens) -> Dict[str, Optional[str]]:
+        metadata: Dict[str, Optional[str]] = {}
+        if not tokens.accept("("):
+            return metadata
+        while not tokens.accept(")"):
+            key = tokens.ident()
+            metadata[key] = tokens.value() if tokens.accept(":") else None
+            tokens.accept(",")
+        return metadata
+
+    def _parse_enum(self, tokens: _Tokens) -> None:
+        name = tokens.ident()
+        tokens.expect(":")
+        scalar = tokens.ident()
+        scalar = _SCALAR_ALIASES.get(scalar, scalar)
+        if scalar not in _SCALAR_TYPES or scalar in ("bool", "float", "double"):
+            raise ValueError(f"Enum {name} has bad underlying type {scalar}")
+        self._parse_metadata(tokens)
+        enum_def = _EnumDef(name=name, scalar=scalar)
+        next_value = 0
+        tokens.expect("{")
+        while not tokens.accept("}"):
+            value_name = tokens.ident()
+            if tokens.accept("="):
+                next_value = int(tokens.value(), 0)
+            enum_def.values[value_name] = next_value
+            next_value += 1
+            tokens.accept(",")
+        self._schema.enums[name] = enum_def
+
+    def _parse_union(self, tokens: _Tokens) -> None:
+        name = tokens.ident()
+        self._parse_metadata(tokens)
+        union_def = _UnionDef(name=name)
+        next_index = 1
+        tokens.expect("{")
+        while not tokens.accept("}"):
+            member = _short_name(tokens.ident())
+            table = member
+            if tokens.accept(":"):
+                table = _short_name(tokens.ident())
+            if tokens.accept("="):
+                next_index = int(tokens.value(), 0)
+            union_def.members[member] = (table, next_index)
+            next_index += 1
+            tokens.accept(",")
+        self._schema.unions[name] = union_def
+
+    def _parse_table(self, tokens: _Tokens) -> None:
+        name = tokens.ident()
+        self._parse_metadata(tokens)
+        table = _TableDef(name=name)
+        tokens.expect("{")
+        while not tokens.accept("}"):
+            field_name = tokens.ident()
+            tokens.expect(":")
+            is_vector = tokens.accept("[")
+            type_name = tokens.ident()
+            if is_vector:
+                if tokens.peek() == ":":
+                    raise ValueError(f"Fixed-size arrays are not supported: {name}")
+                tokens.expect("]")
+            if tokens.accept("="):
+                self._raw_defaults[(name, field_name)] = tokens.value()
+            metadata = self._parse_metadata(tokens)
+            tokens.expect(";")
+
+            force_align = metadata.get("force_align")
+            field_def = _FieldDef(
+                name=field_name,
+                # Resolved after all files have been parsed.
+                type=_FieldType(kind="unresolved"),
+                force_align=int(force_align) if force_align is not None else None,
+                deprecated="deprecated" in metadata,
+            )
+            if metadata.get("id") is not None:
+                self._explicit_ids[(name, field_name)] = int(metadata["id"] or 0)
+            self._raw_types[(name, field_name)] = (_short_name(type_name), is_vector)
+            table.fields.append(field_def)
+        self._schema.tables[name] = table
+
+    def _resolve_type(self, type_name: str) -> _FieldType:
+        type_name = _SCALAR_ALIASES.get(type_name, type_name)
+        if type_name in _SCALAR_TYPES:
+            return _FieldType(kind="scalar", scalar=type_name)
+        if type_name == "string":
+            return _FieldType(kind="string")
+        if type_name in self._schema.enums:
+            return _FieldType(
+                kind="enum",
+                scalar=self._schema.enums[type_name].scalar,
+                ref=type_name,
+            )
+        if type_name in self._schema.unions:
+            return _FieldType(kind="union", ref=type_name)
+        if type_name in self._schema.tables:
+            return _FieldType(kind="table", ref=type_name)
+        raise ValueError(f"Unknown type {type_name!r}")
+
+    def _resolve_default(
+        self, field_type: _FieldType, text: Optional[str]
+    ) -> Union[int, float, bool]:
+        if text is None:
+            return False if field_type.scalar == "bool" else 0
+        if field_type.kind == "enum":
+            assert field_type.ref is not None
+            values = self._schema.enums[field_type.ref].values
+            if text in values:
+                return values[text]
+        value = _parse_number(text)
+        if field_type.scalar == "bool":
+            return bool(value)
+        if field_type.scalar in ("float", "double"):
+            return float(value)
+        return value
+
+    def finish(self) -> _Schema:
+        for table in self._schema.tables.values():
+            next_id = 0
+            for field_def in table.fields:
+                type_name, is_vector = self._raw_types[(table.name, field_def.name)]
+                field_type = self._resolve_type(type_name)
+                if is_vector:
+                    if field_type.kind == "union":
+                        raise ValueError(
+                            f"Vectors of unions are not supported: {table.name}"
+                        )
+                    field_type = _FieldType(kind="vector", element=field_type)
+                field_def.type = field_type
+                field_def.default = self._resolve_default(
+                    field_type, self._raw_defaults.get((table.name, field_def.name))
+                )
+
+                # Unions occupy two slots: the type discriminator followed by
+                # the value.
+                slots = 2 if field_type.kind == "union" else 1
+                explicit_id = self._explicit_ids.get((table.name, field_def.name))
+                if explicit_id is not None:
+                    field_def.id = explicit_id
+                else:
+                    field_def.id = next_id + slots - 1
+                next_id = field_def.id + 1
+        return self._schema
+
+
+def _parse_schema(
+    root_name: str,
+    load_file: Callable[[str], bytes],
+) -> _Schema:
+    """Parses a flatbuffer schema and all of the files it includes.
+
+    Args:
+        root_name: The name of the root schema file.
+        load_file: Returns the contents of a schema file given its name. Used
+            for the root file and for any `include`d files.
+
+    Returns:
+        The parsed schema. Type names are stored without namespace qualifiers.
+    """
+    parser = _SchemaParser(load_file)
+    parser.parse(root_name, load_file(root_name), is_root=True)
+    return parser.finish()
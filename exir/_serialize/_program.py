@@ -7,11 +7,13 @@
 # pyre-strict
 
 import copy
+import io
 import json
+import mmap
 import re
 
 from dataclasses import dataclass
-from typing import ClassVar, List, Literal, Optional, Tuple
+from typing import Any, ClassVar, List, Literal, Optional, Tuple
 
 from executorch.exir._serialize._cord import Cord
 from executorch.exir._serialize._dataclass import _DataclassEncoder, _json_to_dataclass
@@ -19,7 +21,11 @@ from executorch.exir._serialize._flatbuffer import (
     _FlatbufferResult,
     _program_flatbuffer_to_json,
     _program_json_to_flatbuffer,
+    _program_to_flatbuffer,
+    _read_program_flatbuffer,
+    _use_flatc,
 )
+from executorch.exir._serialize._flatbuffer_reader import _FlatbufferTable
 
 from executorch.exir.schema import (
     BackendDelegateDataReference,
@@ -64,8 +70,8 @@ def _aligned_size(input_size: int, alignment: int) -> int:
 
 
 def _insert_flatbuffer_header(
-    flatbuffer_data: bytes, magic_regex: str, header_data: bytes
-) -> bytes:
+    flatbuffer_data: Cord, magic_regex: str, header_data: bytes
+) -> Cord:
     """Inserts a header just after the magic string of the provided flatbuffer data.
 
     Args:
@@ -77,7 +83,8 @@ def _insert_flatbuffer_header(
             guaranteed that its length is a power of 2 >= the largest
             force_align value in the schema.
     Returns:
-        The modified flatbuffer_data with header_data inserted.
+        The modified flatbuffer_data with header_data inserted. Shares the
+        underlying buffers of flatbuffer_data where possible.
     Raises:
         ValueError: If flatbuffer_data is too short to be valid.
         ValueError: If the magic bytes of flatbuffer_data does not match
@@ -88,9 +95,10 @@ def _insert_flatbuffer_header(
     # - file_identifier string from the schema (4 bytes, string order)
     if len(flatbuffer_data) < 8:
         raise ValueError(f"Flatbuffer data length {len(flatbuffer_data)} < 8")
+    prefix: bytes = bytes(flatbuffer_data[0:8])
 
     # Ensure that the magic matches.
-    actual_magic: str = flatbuffer_data[4:8].decode(errors="replace")
+    actual_magic: str = prefix[4:8].decode(errors="replace")
     if not re.match(magic_regex, actual_magic):
         raise ValueError(
             f"Flatbuffer data magic bytes {repr(actual_magic)} "
@@ -102,19 +110,20 @@ def _insert_flatbuffer_header(
         return flatbuffer_data
 
     # We will need to adjust the root object offset after inserting the header.
-    root_offset = int.from_bytes(flatbuffer_data[0:4], byteorder=_HEADER_BYTEORDER)
+    root_offset = int.from_bytes(prefix[0:4], byteorder=_HEADER_BYTEORDER)
 
-    return (
+    result = Cord(
         # New root offset.
         (root_offset + len(header_data)).to_bytes(4, byteorder=_HEADER_BYTEORDER)
         # Existing magic bytes.
-        + flatbuffer_data[4:8]
+        + prefix[4:8]
         # Provided header + padding.
         + header_data
-        # Remainder of the file. Note that this can be O(10MB to 100MB), so it
-        # can trigger a large allocation + copy.
-        + flatbuffer_data[8:]
     )
+    # Remainder of the file. Note that this can be O(10MB to 100MB); slicing
+    # the Cord avoids copying it unless it is stored as a single buffer.
+    result.append(flatbuffer_data[8:])
+    return result
 
 
 @dataclass
@@ -338,6 +347,26 @@ def _extract_constant_segment(
     return constant_segment_data, constant_segment_offsets
 
 
+def _copy_for_serialization(program: Program) -> Program:
+    """Returns a copy of the Program that serialization can modify without
+    affecting the original.
+
+    Only the containers and entries that serialization modifies are copied;
+    everything else, including all constant and delegate data blobs, is shared
+    with the original Program.
+    """
+    program = copy.copy(program)
+    program.constant_buffer = list(program.constant_buffer)
+    program.backend_delegate_data = list(program.backend_delegate_data)
+    program.segments = list(program.segments)
+    program.execution_plan = [copy.copy(plan) for plan in program.execution_plan]
+    for plan in program.execution_plan:
+        plan.delegates = [copy.copy(delegate) for delegate in plan.delegates]
+        for delegate in plan.delegates:
+            delegate.processed = copy.copy(delegate.processed)
+    return program
+
+
 def serialize_pte_binary(
     program: Program,
     *,
@@ -375,9 +404,7 @@ def serialize_pte_binary(
         constant_tensor_alignment = ALIGNMENT
 
     # Don't modify the original program.
-    # TODO(T144120904): Could avoid yet more huge copies with a more shallow
-    # copy, reusing the actual data blobs.
-    program = copy.deepcopy(program)
+    program = _copy_for_serialization(program)
 
     # Store extracted segment data; this may be constant data or delegate data.
     segments: List[Cord] = []
@@ -421,15 +448,23 @@ def serialize_pte_binary(
         segments_data.append(data)
 
     # Convert to a standard flatbuffer binary.
-    result: _FlatbufferResult = _program_json_to_flatbuffer(
-        _program_to_json(program),
-        constant_tensor_alignment=constant_tensor_alignment,
-        delegate_alignment=delegate_alignment,
-    )
+    result: _FlatbufferResult
+    if _use_flatc():
+        result = _program_json_to_flatbuffer(
+            _program_to_json(program),
+            constant_tensor_alignment=constant_tensor_alignment,
+            delegate_alignment=delegate_alignment,
+        )
+    else:
+        result = _program_to_flatbuffer(
+            program,
+            constant_tensor_alignment=constant_tensor_alignment,
+            delegate_alignment=delegate_alignment,
+        )
 
     # If there are no segments present, do not insert the extended header.
     if len(segments_data) == 0:
-        return Cord(result.data)
+        return result.data
 
     # Size of the header to insert. Its size is padded to the largest
     # force_align value present in the schema.
@@ -453,7 +488,7 @@ def serialize_pte_binary(
     header_data = _pad_to(header_data, padded_header_length)
 
     # Insert the header into the flatbuffer data.
-    program_data: bytes = _insert_flatbuffer_header(
+    program_data: Cord = _insert_flatbuffer_header(
         flatbuffer_data=result.data,
         magic_regex=r"ET[0-9a-zA-Z][0-9a-zA-Z]",
         header_data=header_data,
@@ -465,7 +500,9 @@ def serialize_pte_binary(
 
     # Double-check that the extended header is in the right place and has the
     # right contents.
-    eh = _get_extended_header(program_data)
+    eh = _get_extended_header(
+        bytes(program_data[0 : 8 + _ExtendedHeader.EXPECTED_LENGTH])
+    )
     assert eh is not None
     assert eh.program_size == program_size
     assert eh.segment_base_offset == segment_base_offset
@@ -473,7 +510,7 @@ def serialize_pte_binary(
     # Construct the final pte file containing:
     # - program data; written to offset 0.
     # - segments data (optional); aligned to segment_alignment.
-    pte_data = Cord(program_data)
+    pte_data = program_data
     if len(segments_data) > 0:
         padding_length = _padding_required(len(pte_data), segment_alignment)
         pte_data.append(b"\x00" * padding_length)
@@ -485,7 +522,46 @@ def serialize_pte_binary(
     return pte_data
 
 
-def _restore_segments(program: Program, segment_data: bytes) -> Program:
+def write_pte_binary(
+    program: Program,
+    outfile: io.BufferedIOBase,
+    *,
+    extract_delegate_segments: bool = False,
+    extract_constant_segment: bool = False,
+    segment_alignment: int = 4096,
+    constant_tensor_alignment: Optional[int] = None,
+    delegate_alignment: Optional[int] = None,
+) -> int:
+    """Writes the runtime binary representation of the given Program to a file.
+
+    Produces the same data as serialize_pte_binary(). The segment offsets are
+    computed up front, and the output is assembled as a Cord that references the
+    constant and delegate blobs held by the Program, so writing it copies none of
+    them: memory use beyond the Program itself is bounded by the size of the
+    flatbuffer tables, not by the size of the data. The Program still holds its
+    own copy of the constant data, made when the program was emitted.
+
+    Args:
+        program: The Program to serialize. Not modified.
+        outfile: The file to write to, positioned where the data should begin.
+        Other arguments: See serialize_pte_binary().
+
+    Returns:
+        The number of bytes written.
+    """
+    pte_data: Cord = serialize_pte_binary(
+        program,
+        extract_delegate_segments=extract_delegate_segments,
+        extract_constant_segment=extract_constant_segment,
+        segment_alignment=segment_alignment,
+        constant_tensor_alignment=constant_tensor_alignment,
+        delegate_alignment=delegate_alignment,
+    )
+    pte_data.write_to_file(outfile)
+    return len(pte_data)
+
+
+def _restore_segments(program: Program, segment_data: Any) -> Program:
     """Moves segments from `segment_data` into `program`.
 
     This should recreate the original Program that the segments were extracted
@@ -508,7 +584,9 @@ def _restore_segments(program: Program, segment_data: bytes) -> Program:
             raise ValueError(
                 f"Segment {i} {segment} overflows data length {len(segment_data)}"
             )
-        segments.append(segment_data[segment.offset : segment.offset + segment.size])
+        segments.append(
+            bytes(segment_data[segment.offset : segment.offset + segment.size])
+        )
 
     # Find and replace the Program's references to these segments, inlining the
     # data.
@@ -537,8 +615,99 @@ def _restore_segments(program: Program, segment_data: bytes) -> Program:
     return program
 
 
+class LazyProgram:
+    """A read-only view of serialized runtime binary data.
+
+    Fields of the Program are decoded only when they are accessed, directly
+    from the underlying data; for example, `lazy.program.execution_plan[0]
+    .operators`. Byte vectors and segment data are returned as memoryview
+    slices of that data, so nothing large is copied. Backed by an mmap when
+    created with load_pte_file().
+    """
+
+    def __init__(self, program_data: Any) -> None:
+        """Wraps the given data, which must support the buffer protocol."""
+        self._data: memoryview = memoryview(program_data).cast("B")
+        program_size = len(self._data)
+        self._segment_base_offset: int = 0
+
+        # Look for an extended header to see if segments follow the flatbuffer
+        # data.
+        eh: Optional[_ExtendedHeader] = _get_extended_header(
+            bytes(self._data[0 : 8 + _ExtendedHeader.EXPECTED_LENGTH])
+        )
+        if eh and eh.is_valid():
+            program_size = eh.program_size
+            self._segment_base_offset = eh.segment_base_offset
+
+        self._program_data: memoryview = self._data[:program_size]
+        # The root Program table.
+        self.program: _FlatbufferTable = _read_program_flatbuffer(self._program_data)
+
+    def segment_data(self, index: int) -> memoryview:
+        """Returns the data of the segment at the given index."""
+        segments = self.program.segments
+        if index >= len(segments):
+            raise IndexError(f"Segment index {index} >= num segments {len(segments)}")
+        segment = segments[index]
+        start = self._segment_base_offset + segment.offset
+        if self._segment_base_offset == 0 or start + segment.size > len(self._data):
+            raise ValueError(
+                f"Segment {index} [{segment.offset}, +{segment.size}) overflows "
+                + f"data length {len(self._data)}"
+            )
+        return self._data[start : start + segment.size]
+
+    def constant_data(self, index: int) -> memoryview:
+        """Returns the data of the constant buffer with the given index.
+
+        Constants stored in the constant segment are returned along with any
+        alignment padding that follows them, since the segment does not record
+        the tensor sizes.
+        """
+        constant_segment = self.program.constant_segment
+        offsets = constant_segment.offsets if constant_segment else None
+        if not offsets:
+            return self.program.constant_buffer[index].storage
+        segment = self.segment_data(constant_segment.segment_index)
+        end = offsets[index + 1] if index + 1 < len(offsets) else len(segment)
+        return segment[offsets[index] : end]
+
+    def delegate_data(self, plan_index: int, delegate_index: int) -> memoryview:
+        """Returns the processed data of a delegate in an execution plan."""
+        delegate = self.program.execution_plan[plan_index].delegates[delegate_index]
+        processed = delegate.processed
+        if processed.location == DataLocation.SEGMENT:
+            return self.segment_data(processed.index)
+        return self.program.backend_delegate_data[processed.index].data
+
+    def to_program(self) -> Program:
+        """Decodes the entire Program, moving any segment data back inline."""
+        program: Program = self.program.to_dataclass(Program)
+        if self._segment_base_offset != 0:
+            # Move segment data back into the Program.
+            program = _restore_segments(
+                program=program,
+                segment_data=self._data[self._segment_base_offset :],
+            )
+        return program
+
+
+def load_pte_file(path: str) -> LazyProgram:
+    """Returns a lazy view of a .pte file, backed by a read-only mmap.
+
+    Only the pages holding the fields that are accessed are read from disk.
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return LazyProgram(data)
+
+
 def deserialize_pte_binary(program_data: bytes) -> Program:
     """Returns a Program deserialized from the given runtime binary data."""
+    if not _use_flatc():
+        return LazyProgram(program_data).to_program()
+
     program_size = len(program_data)
     segment_base_offset = 0
 
@@ -5,10 +5,15 @@
 # LICENSE file in the root directory of this source tree.
 
 
+import gc
 import io
+import os
+import tempfile
 import unittest
 
-from executorch.exir._serialize._cord import Cord
+import torch
+
+from executorch.exir._serialize._cord import Cord, FileRange
 
 
 class TestCord(unittest.TestCase):
@@ -53,6 +58,24 @@ class TestCord(unittest.TestCase):
         self.assertEqual(id(cord2._buffers[1]), id(cord._buffers[0]))
         self.assertEqual(id(cord2._buffers[2]), id(cord._buffers[1]))
 
+    def test_cord_slice(self) -> None:
+        cord = Cord()
+        cord.append(b"Hello")
+        cord.append(b"World")
+        cord.append(b"!")
+
+        self.assertEqual(b"HelloWorld!", bytes(cord[:]))
+        self.assertEqual(b"loWor", bytes(cord[3:8]))
+        self.assertEqual(b"World!", bytes(cord[5:]))
+        self.assertEqual(b"", bytes(cord[20:]))
+        self.assertEqual(3, len(cord[-3:]))
+
+        # Buffers entirely within the slice should not be copied.
+        self.assertEqual(id(cord[5:]._buffers[0]), id(cord._buffers[1]))
+
+        with self.assertRaises(ValueError):
+            cord[::2]
+
     def test_cord_write_to_file(self) -> None:
         cord = Cord()
         cord.append(b"Hello")
@@ -61,3 +84,69 @@ class TestCord(unittest.TestCase):
         outfile = io.BytesIO()
         cord.write_to_file(outfile)
         self.assertEqual(b"HelloWorld", outfile.getvalue())
+
+    def test_cord_buffers_are_not_copied(self) -> None:
+        data = bytearray(b"Hello")
+        cord = Cord(data)
+        cord.append(memoryview(b"World"))
+        self.assertEqual(10, len(cord))
+
+        # The Cord references the bytearray, so it sees later changes.
+        data[0:1] = b"J"
+        self.assertEqual(b"JelloWorld", bytes(cord))
+
+        # Slices of a buffer are views of it.
+        self.assertEqual(b"ell", bytes(cord[1:4]))
+        self.assertIs(data, cord[1:4]._buffers[0].obj)
+
+        with self.assertRaises(TypeError):
+            cord.append("not bytes")
+
+    def test_cord_torch_storage(self) -> None:
+        tensor = torch.arange(8, dtype=torch.uint8)
+        cord = Cord(tensor.untyped_storage())
+        self.assertEqual(8, len(cord))
+
+        # The Cord keeps the storage alive and shares its memory.
+        del tensor
+        gc.collect()
+        self.assertEqual(bytes(range(8)), bytes(cord))
+
+    def test_cord_file_range(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "data.bin")
+            with open(path, "wb") as f:
+                f.write(b"0123456789")
+
+            cord = Cord(b"<")
+            cord.append(FileRange(path, 2, 5))
+            cord.append(b">")
+            self.assertEqual(7, len(cord))
+            self.assertEqual(b"<23456>", bytes(cord))
+            self.assertEqual(b"345", bytes(cord[2:5]))
+            self.assertEqual(FileRange(path, 3, 3), cord[2:5]._buffers[0])
+
+            outfile = io.BytesIO()
+            cord.write_to_file(outfile)
+            self.assertEqual(b"<23456>", outfile.getvalue())
+
+    def test_cord_write_to_real_file(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "source.bin")
+            with open(source, "wb") as f:
+                f.write(b"0123456789")
+
+            cord = Cord(b"Hello")
+            cord.append(bytearray(b"World"))
+            cord.append(FileRange(source, 5, 5))
+            cord.append(torch.ones(2, dtype=torch.uint8).untyped_storage())
+
+            path = os.path.join(temp_dir, "out.bin")
+            with open(path, "wb") as f:
+                # Buffered data must stay ahead of the Cord's data.
+                f.write(b"[")
+                cord.write_to_file(f)
+                self.assertEqual(f.tell(), 18)
+                f.write(b"]")
+            with open(path, "rb") as f:
+                self.assertEqual(b"[HelloWorld56789\x01\x01]", f.read())
@@ -7,11 +7,16 @@
 
 import copy
 import difflib
+import io
 import json
+import os
+import tempfile
 import unittest
 
 from typing import List, Sequence
+from unittest.mock import patch
 
+from executorch.exir._serialize import _flatbuffer
 from executorch.exir._serialize._flatbuffer import _program_flatbuffer_to_json
 from executorch.exir._serialize._program import (
     _ExtendedHeader,
@@ -19,7 +24,10 @@ from executorch.exir._serialize._program import (
     _json_to_program,
     _program_to_json,
     deserialize_pte_binary,
+    LazyProgram,
+    load_pte_file,
     serialize_pte_binary,
+    write_pte_binary,
 )
 
 from executorch.exir.schema import (
@@ -454,6 +462,176 @@ class TestProgram(unittest.TestCase):
         # Programs should be the same.
         self.assert_programs_equal(program, program2)
 
+    def test_builder_matches_flatc(self) -> None:
+        """Tests that the in-process flatbuffer builder produces data that
+        decodes to the same contents as data produced by flatc.
+        """
+        program = get_test_program()
+        add_constant_data(program, [b"", b"\x01\x02\x03", b"\x04" * 2048])
+        add_delegate_data(program, program.execution_plan[0], [b"delegate data"])
+        program.execution_plan[0].non_const_buffer_sizes = [0, 2**48]
+
+        for kwargs in (
+            {},
+            {"extract_constant_segment": True, "extract_delegate_segments": True},
+            {"constant_tensor_alignment": 32, "delegate_alignment": 8},
+        ):
+            with self.subTest(**kwargs):
+                with patch.dict(os.environ, {_flatbuffer._USE_FLATC_ENV: ""}):
+                    builder_data = bytes(serialize_pte_binary(program, **kwargs))
+                with patch.dict(os.environ, {_flatbuffer._USE_FLATC_ENV: "1"}):
+                    flatc_data = bytes(serialize_pte_binary(program, **kwargs))
+
+                self.assertEqual(
+                    json.loads(_program_flatbuffer_to_json(builder_data)),
+                    json.loads(_program_flatbuffer_to_json(flatc_data)),
+                )
+                self.assert_programs_equal(
+                    deserialize_pte_binary(builder_data),
+                    deserialize_pte_binary(flatc_data),
+                )
+
+    def test_builder_aligns_inline_data(self) -> None:
+        """Tests that the in-process builder honors the patched force_align
+        values for inline constant and delegate data.
+        """
+        program = get_test_program()
+        constant_blob = self.gen_blob_data(100, b"\x10\x11\x12")
+        delegate_blob = self.gen_blob_data(100, b"\x20\x22\x23")
+        add_constant_data(program, [constant_blob])
+        add_delegate_data(program, program.execution_plan[0], [delegate_blob])
+
+        pte_data = bytes(
+            serialize_pte_binary(
+                program, constant_tensor_alignment=256, delegate_alignment=512
+            )
+        )
+        constant_offset = pte_data.find(constant_blob)
+        delegate_offset = pte_data.find(delegate_blob)
+        self.assertGreater(constant_offset, 0)
+        self.assertGreater(delegate_offset, 0)
+        self.assertEqual(constant_offset % 256, 0)
+        self.assertEqual(delegate_offset % 512, 0)
+
+    def test_reader_matches_flatc(self) -> None:
+        """Tests that the in-process reader decodes the same Program as flatc."""
+        program = get_test_program()
+        add_constant_data(program, [b"", b"\x01\x02\x03"])
+        add_delegate_data(program, program.execution_plan[0], [b"delegate data"])
+        program.execution_plan[0].non_const_buffer_sizes = [0, 2**48]
+
+        pte_data = bytes(serialize_pte_binary(program, extract_delegate_segments=True))
+        with patch.dict(os.environ, {_flatbuffer._USE_FLATC_ENV: "1"}):
+            flatc_program = deserialize_pte_binary(pte_data)
+        with patch.dict(os.environ, {_flatbuffer._USE_FLATC_ENV: ""}):
+            reader_program = deserialize_pte_binary(pte_data)
+
+        self.assertEqual(flatc_program, reader_program)
+        self.assert_programs_equal(program, reader_program)
+
+    def test_lazy_program(self) -> None:
+        """Tests that a LazyProgram exposes fields and segment data in place."""
+        program = get_test_program()
+        constant_blobs = (b"\x00", b"\x10\x11\x12", b"\x20" * 100)
+        add_constant_data(program, constant_blobs)
+        add_delegate_data(program, program.execution_plan[0], [b"delegate data"])
+
+        pte_data = bytes(
+            serialize_pte_binary(
+                program,
+                extract_constant_segment=True,
+                extract_delegate_segments=True,
+                constant_tensor_alignment=CONSTANT_TENSOR_ALIGNMENT,
+            )
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "program.pte")
+            with open(path, "wb") as f:
+                f.write(pte_data)
+            for lazy in (LazyProgram(pte_data), load_pte_file(path)):
+                plan = lazy.program.execution_plan[0]
+                self.assertEqual(plan.name, program.execution_plan[0].name)
+                self.assertEqual(
+                    [(op.name, op.overload) for op in plan.operators],
+                    [
+                        (op.name, op.overload)
+                        for op in program.execution_plan[0].operators
+                    ],
+                )
+
+                # Constant data comes from the segment, followed by any
+                # alignment padding.
+                for i, blob in enumerate(constant_blobs):
+                    data = lazy.constant_data(i)
+                    self.assertIsInstance(data, memoryview)
+                    self.assertEqual(bytes(data[: len(blob)]), blob)
+
+                delegate_data = lazy.delegate_data(0, 0)
+                self.assertIsInstance(delegate_data, memoryview)
+                self.assertEqual(bytes(delegate_data), b"delegate data")
+
+                self.assert_programs_equal(
+                    deserialize_pte_binary(pte_data), lazy.to_program()
+                )
+                del plan, data, delegate_data, lazy
+
+    def test_serialize_does_not_modify_program(self) -> None:
+        """Tests that serialization leaves the input Program untouched and
+        shares its data blobs instead of copying them.
+        """
+        program = get_test_program()
+        add_constant_data(program, [b"\x00" * 32])
+        add_delegate_data(program, program.execution_plan[0], [b"delegate data"])
+        expected = copy.deepcopy(program)
+        delegate = program.execution_plan[0].delegates[0]
+
+        serialize_pte_binary(
+            program,
+            extract_delegate_segments=True,
+            extract_constant_segment=True,
+        )
+
+        self.assertEqual(program, expected)
+        self.assertIs(program.execution_plan[0].delegates[0], delegate)
+        self.assertEqual(delegate.processed.location, DataLocation.INLINE)
+
+    def test_write_pte_binary(self) -> None:
+        """Tests that write_pte_binary produces the same data as
+        serialize_pte_binary.
+        """
+        program = get_test_program()
+        add_constant_data(program, [b"\x10" * 100, b"\x20" * 3])
+        add_delegate_data(program, program.execution_plan[0], [b"\x30" * 2000])
+
+        for extract in (False, True):
+            with self.subTest(extract=extract):
+                kwargs = {
+                    "extract_delegate_segments": extract,
+                    "extract_constant_segment": extract,
+                    "constant_tensor_alignment": CONSTANT_TENSOR_ALIGNMENT,
+                }
+                expected = bytes(serialize_pte_binary(program, **kwargs))
+                with tempfile.TemporaryFile() as f:
+                    size = write_pte_binary(program, f, **kwargs)
+                    f.seek(0)
+                    self.assertEqual(f.read(), expected)
+                self.assertEqual(size, len(expected))
+
+                if extract:
+                    # The blobs are written from the Program, not from copies.
+                    buffers = serialize_pte_binary(program, **kwargs)._buffers
+                    for blob in (
+                        program.constant_buffer[-1].storage,
+                        program.backend_delegate_data[0].data,
+                    ):
+                        self.assertTrue(any(b is blob for b in buffers))
+
+                # Files without a descriptor are written piece by piece.
+                f = io.BytesIO()
+                self.assertEqual(write_pte_binary(program, f, **kwargs), size)
+                self.assertEqual(f.getvalue(), expected)
+
     @staticmethod
     def gen_blob_data(size: int, pattern: bytes) -> bytes:
         """Generates a buffer with special first and last bytes,
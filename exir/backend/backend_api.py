@@ -4,11 +4,15 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import collections
 import copy
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
 from functools import singledispatch
-from typing import Generator, List
+from typing import cast, Dict, Generator, Iterable, List, Optional, Tuple
 
 import torch
 
@@ -16,6 +20,7 @@ from executorch.exir.backend.backend_details import BackendDetails, PreprocessRe
 from executorch.exir.backend.compile_spec_schema import CompileSpec
 
 from executorch.exir.backend.partitioner import Partitioner, PartitionResult
+from executorch.exir.backend.preprocess_cache import PreprocessCache
 from executorch.exir.backend.utils import is_identical_graph
 
 from executorch.exir.delegate import executorch_call_delegate, get_lowered_module_name
@@ -34,6 +39,7 @@ from executorch.exir.program._fake_program import (
 )
 from torch._export.utils import is_buffer, is_lifted_tensor_constant, is_param
 from torch.export import ExportedProgram
+from torch.fx.passes.tools_common import legalize_graph
 
 
 @singledispatch
@@ -104,27 +110,50 @@ def _(
     """
     assert isinstance(edge_program, ExportedProgram)
 
+    (preprocess_result,) = _preprocess_partitions(
+        [(backend_id, edge_program, compile_specs)]
+    )
+    return _create_lowered_module(
+        backend_id, edge_program, compile_specs, preprocess_result
+    )
+
+
+def _preprocess(
+    backend_id: str,
+    edge_program: ExportedProgram,
+    compile_specs: List[CompileSpec],
+) -> PreprocessResult:
+    """
+    Runs the preprocess method of the backend identified by backend_id on a copy of
+    edge_program.
+    """
     # All backend implementation are final, so we don't need to consider nested subclasses.
     for cls in BackendDetails.__subclasses__():
         if backend_id == cls.__name__:
             copied_edge_program = copy.deepcopy(edge_program)
-            preprocess_result: PreprocessResult = cls.preprocess(
+            return cls.preprocess(
                 copied_edge_program,
                 compile_specs,
             )
-            lowered_module = LoweredBackendModule(
-                edge_program=edge_program,
-                backend_id=backend_id,
-                processed_bytes=preprocess_result.processed_bytes,
-                compile_specs=compile_specs,
-            )
-            lowered_module.meta = {
-                "debug_handle_map": preprocess_result.debug_handle_map
-            }
-            return lowered_module
     raise NotImplementedError(f"Backend {backend_id} was not found.")
 
 
+def _create_lowered_module(
+    backend_id: str,
+    edge_program: ExportedProgram,
+    compile_specs: List[CompileSpec],
+    preprocess_result: PreprocessResult,
+) -> LoweredBackendModule:
+    lowered_module = LoweredBackendModule(
+        edge_program=edge_program,
+        backend_id=backend_id,
+        processed_bytes=preprocess_result.processed_bytes,
+        compile_specs=compile_specs,
+    )
+    lowered_module.meta = {"debug_handle_map": preprocess_result.debug_handle_map}
+    return lowered_module
+
+
 _ENABLE_VALIDATION: bool = True
 
 
@@ -151,38 +180,340 @@ def validation_disabled() -> Generator[None, None, None]:
         _ENABLE_VALIDATION = existing_setting
 
 
-def _get_node_list_with_same_tag(
+# The number of processes that run the preprocess method of the partitions of a graph.
+# 1 runs them serially, in the calling process.
+_PREPROCESS_MAX_WORKERS: int = 1
+
+
+@contextmanager
+def parallel_preprocess(
+    max_workers: Optional[int] = None,
+) -> Generator[None, None, None]:
+    """
+    Runs the preprocess methods of the partitions found by a partitioner in a pool of
+    worker processes, instead of one after the other.
+
+    All partitions are carved out of the graph first, in the same order as without this
+    context manager, and the lowered modules are put back in that order, so the result
+    is identical to lowering the partitions serially. Backends must not depend on state
+    that their preprocess method changes in the calling process.
+
+    Worker processes are forked, so this has no effect on platforms without the "fork"
+    start method.
+
+    Args:
+        max_workers: The maximum number of worker processes. Defaults to the number of
+            CPUs.
+    """
+    global _PREPROCESS_MAX_WORKERS
+    existing_setting = _PREPROCESS_MAX_WORKERS
+    _PREPROCESS_MAX_WORKERS = max_workers or os.cpu_count() or 1
+    try:
+        yield
+    finally:
+        _PREPROCESS_MAX_WORKERS = existing_setting
+
+
+_PREPROCESS_CACHE: Optional[PreprocessCache] = None
+
+
+@contextmanager
+def cached_preprocess(cache: PreprocessCache) -> Generator[None, None, None]:
+    """
+    Reuses the results of the preprocess methods of backends stored in cache, and
+    stores the new results there.
+
+    Applies to every partition lowered by to_backend. Results are keyed by the
+    contents of the partition, the backend id and the compile specs, so repeated
+    exports of a model, or models sharing partitions, skip the backends. Hits and
+    misses are counted in cache.stats.
+    """
+    global _PREPROCESS_CACHE
+    existing_setting = _PREPROCESS_CACHE
+    _PREPROCESS_CACHE = cache
+    try:
+        yield
+    finally:
+        _PREPROCESS_CACHE = existing_setting
+
+
+# The partitions that forked worker processes preprocess, as
+# (backend_id, edge_program, compile_specs).
+_pending_partitions: List[Tuple[str, ExportedProgram, List[CompileSpec]]] = []
+
+
+def _preprocess_pending_partition(index: int) -> PreprocessResult:
+    global _PREPROCESS_MAX_WORKERS
+    # Partitions nested in this one are lowered serially, within this worker.
+    _PREPROCESS_MAX_WORKERS = 1
+    return _preprocess(*_pending_partitions[index])
+
+
+def _run_preprocess(
+    partitions: List[Tuple[str, ExportedProgram, List[CompileSpec]]]
+) -> List[PreprocessResult]:
+    max_workers = min(_PREPROCESS_MAX_WORKERS, len(partitions))
+    if max_workers < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return [_preprocess(*partition) for partition in partitions]
+
+    global _pending_partitions
+    _pending_partitions = partitions
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            return list(
+                executor.map(_preprocess_pending_partition, range(len(partitions)))
+            )
+    finally:
+        _pending_partitions = []
+
+
+def _preprocess_partitions(
+    partitions: List[Tuple[str, ExportedProgram, List[CompileSpec]]]
+) -> List[PreprocessResult]:
+    """
+    Preprocesses the given partitions and returns the results in the same order.
+
+    Results are looked up in, and added to, the cache set by cached_preprocess(), and
+    the partitions that are not cached are preprocessed in parallel if enabled by
+    parallel_preprocess().
+    """
+    cache = _PREPROCESS_CACHE
+    if cache is None:
+        return _run_preprocess(partitions)
+
+    results: List[Optional[PreprocessResult]] = [None] * len(partitions)
+    # Key -> indices of the partitions to preprocess with that key.
+    misses: Dict[str, List[int]] = {}
+    for i, partition in enumerate(partitions):
+        key = cache.key(*partition)
+        if key in misses:
+            # Same as a partition that will be preprocessed below.
+            cache.stats.hits += 1
+            misses[key].append(i)
+        else:
+            results[i] = cache.get(key)
+            if results[i] is None:
+                misses[key] = [i]
+
+    keys = list(misses)
+    new_results = _run_preprocess([partitions[misses[key][0]] for key in keys])
+    for key, result in zip(keys, new_results):
+        cache.put(key, result)
+        for i in misses[key]:
+            results[i] = result
+    return cast(List[PreprocessResult], results)
+
+
+def _get_node_lists_by_tag(
     tagged_graph_module: torch.fx.GraphModule,
-    tag: str,
+    tags: Iterable[str],
     owning_program: ExportedProgram,
-) -> List[torch.fx.Node]:
+) -> Dict[str, List[torch.fx.Node]]:
     """
-    Return a list of nodes with the same tag.
+    Return the lists of nodes with each of the given tags, in graph order, found in
+    one pass over the graph.
     """
-    node_list = []
+    node_lists: Dict[str, List[torch.fx.Node]] = {tag: [] for tag in tags}
     for node in tagged_graph_module.graph.nodes:
-        if node.meta.get("delegation_tag", "") == tag:
-            if node.op == "output":
-                raise RuntimeError(f"output node {node} should not be tagged")
-            if node.op == "placeholder":
-                if (
-                    not is_param(owning_program, node)
-                    and not is_buffer(owning_program, node)
-                    and not is_lifted_tensor_constant(owning_program, node)
-                ):
-                    raise RuntimeError(
-                        f"placeholder node for non-params, non-buffer, and non-tensor constants should not be tagged: {node} "
-                    )
-                else:
-                    # check that the users all belong to the same tag
-                    for user in node.users:
-                        users_tag = user.meta.get("delegation_tag", None)
-                        if users_tag != tag:
-                            raise RuntimeError(
-                                f"constant data node ({node}) is tagged with ({tag}) but has user ({user}) which has tag ({users_tag})"
-                            )
-            node_list.append(node)
-    return node_list
+        tag = node.meta.get("delegation_tag", "")
+        if tag not in node_lists:
+            continue
+        if node.op == "output":
+            raise RuntimeError(f"output node {node} should not be tagged")
+        if node.op == "placeholder":
+            if (
+                not is_param(owning_program, node)
+                and not is_buffer(owning_program, node)
+                and not is_lifted_tensor_constant(owning_program, node)
+            ):
+                raise RuntimeError(
+                    f"placeholder node for non-params, non-buffer, and non-tensor constants should not be tagged: {node} "
+                )
+            else:
+                # check that the users all belong to the same tag
+                for user in node.users:
+                    users_tag = user.meta.get("delegation_tag", None)
+                    if users_tag != tag:
+                        raise RuntimeError(
+                            f"constant data node ({node}) is tagged with ({tag}) but has user ({user}) which has tag ({users_tag})"
+                        )
+        node_lists[tag].append(node)
+    return node_lists
+
+
+def _legalized_positions(graph: torch.fx.Graph) -> Dict[torch.fx.Node, int]:
+    """
+    Returns the position of each node of graph in the order that legalize_graph sorts
+    the graph in, without modifying the graph.
+    """
+    indegrees = {node: len(node.all_input_nodes) for node in graph.nodes}
+    queue = collections.deque(
+        node for node, indegree in indegrees.items() if not indegree
+    )
+    positions: Dict[torch.fx.Node, int] = {}
+    while queue:
+        node = queue.popleft()
+        positions[node] = len(positions)
+        for user in node.users:
+            indegrees[user] -= 1
+            if indegrees[user] == 0:
+                queue.append(user)
+    if len(positions) < len(indegrees):
+        raise RuntimeError(
+            f"Input graph has cycles, unable to add {[node for node in indegrees if indegrees[node] != 0]}"
+        )
+    return positions
+
+
+def _topo_sort_partition(
+    node_list: List[torch.fx.Node], positions: Dict[torch.fx.Node, int]
+) -> List[torch.fx.Node]:
+    """
+    Topologically sorts the nodes of a partition like topo_sort does, but visits the
+    nodes, and the users of each node, in the order of positions instead of the order
+    of the graph and of node.users, which change as partitions are carved out.
+    """
+    indegrees = dict.fromkeys(sorted(node_list, key=positions.__getitem__), 0)
+    for node in indegrees:
+        for input_node in node.all_input_nodes:
+            if input_node in indegrees:
+                indegrees[node] += 1
+    queue = collections.deque(
+        node for node, indegree in indegrees.items() if not indegree
+    )
+    sorted_nodes = []
+    while queue:
+        node = queue.popleft()
+        sorted_nodes.append(node)
+        users = [user for user in node.users if user in indegrees]
+        for user in sorted(users, key=positions.__getitem__):
+            indegrees[user] -= 1
+            if indegrees[user] == 0:
+                queue.append(user)
+    assert len(sorted_nodes) == len(
+        node_list
+    ), f"The nodes {node_list} have a dependency cycle"
+    return sorted_nodes
+
+
+def _create_partition_program(
+    tagged_graph_module: torch.fx.GraphModule,
+    tag: str,
+    node_list: List[torch.fx.Node],
+    owning_program: ExportedProgram,
+    output_node: torch.fx.Node,
+    positions: Dict[torch.fx.Node, int],
+) -> Tuple[ExportedProgram, torch.fx.Node]:
+    """
+    Moves the given nodes with the given tag into a submodule, and returns the exported
+    program of the submodule and the node calling it.
+
+    The nodes are sorted by their positions, which determine the order of the inputs
+    and outputs of the submodule. The graph is not topologically sorted afterwards,
+    see _partition_and_lower_one_graph_module.
+    """
+    logging.debug(f"For tag {tag}, found nodes {node_list}")
+    # Tag the nodes that are params as buffers, so we can order the submodule as (Parms + Buffers) (User Inputs)
+    submodule, call_module_node = create_submodule_from_nodes(
+        tagged_graph_module,
+        _topo_sort_partition(node_list, positions),
+        tag,
+        skip_legalize_graph=True,
+        skip_topo_sort=True,
+    )
+    submodule_output_node = [
+        node for node in submodule.graph.nodes if node.op == "output"
+    ]
+    # Copy the output node meta from the original output node, because create_submodule_from_nodes doesn't cover the meta field
+    submodule_output_node[0].meta = output_node.meta
+
+    submodule_program = create_exported_program_from_submodule(
+        submodule, owning_program, tag
+    )
+    return submodule_program, call_module_node
+
+
+def _replace_with_lowered_module(
+    tagged_graph_module: torch.fx.GraphModule,
+    owning_program: ExportedProgram,
+    submodule_program: ExportedProgram,
+    call_module_node: torch.fx.Node,
+    lowered_submodule: torch.nn.Module,
+    consumed_placeholders: Dict[torch.fx.Node, None],
+) -> str:
+    """
+    Replaces the call to a partition's submodule with a call to lowered_submodule, and
+    returns the name of the lowered_submodule attribute.
+
+    The placeholders of the parameters and buffers that are no longer used are added to
+    consumed_placeholders, to be deleted by _delete_consumed_placeholders.
+    """
+    # call delegate args should only use user_inputs
+    call_delegate_args = []
+    # Preserve input order as user_inputs
+    for inp_name in submodule_program.graph_signature.user_inputs:
+        for inp_node in call_module_node.all_input_nodes:
+            if inp_node.name == inp_name:
+                call_delegate_args.append(inp_node)
+                break
+
+    # Replace the partitioned submodule with a lowered submodule
+    # Add call_method node with function "forward"
+    input_nodes = call_module_node.all_input_nodes
+    with tagged_graph_module.graph.inserting_before(call_module_node):
+        lowered_name = get_lowered_module_name(tagged_graph_module, lowered_submodule)
+        lowered_node = tagged_graph_module.graph.get_attr(lowered_name)
+        call_delegate_node = tagged_graph_module.graph.call_function(
+            executorch_call_delegate,
+            (lowered_node,) + tuple(call_delegate_args),
+            call_module_node.kwargs,
+        )
+        # Count the nodes as if the consumed placeholders were already deleted.
+        call_delegate_node.meta["debug_handle"] = len(
+            tagged_graph_module.graph.nodes
+        ) - len(consumed_placeholders)
+        call_module_node.replace_all_uses_with(call_delegate_node)
+        tagged_graph_module.graph.erase_node(call_module_node)
+
+    # Only the inputs of the erased node can have lost their last user
+    toplevel_signature = owning_program.graph_signature
+    for node in input_nodes:
+        if node.op == "placeholder" and len(node.users) == 0:
+            if (
+                node.name in toplevel_signature.inputs_to_buffers
+                or node.name in toplevel_signature.inputs_to_parameters
+            ):
+                consumed_placeholders[node] = None
+
+    return lowered_name
+
+
+def _delete_consumed_placeholders(
+    tagged_graph_module: torch.fx.GraphModule,
+    owning_program: ExportedProgram,
+    consumed_placeholders: Iterable[torch.fx.Node],
+) -> None:
+    """
+    Deletes the given placeholders, and the parameters and buffers they stand for.
+    """
+    toplevel_signature = owning_program.graph_signature
+    for node in consumed_placeholders:
+        if node.name in toplevel_signature.inputs_to_buffers:
+            # Delete the consumed buffers
+            buffer_name = toplevel_signature.inputs_to_buffers.pop(node.name)
+            toplevel_signature.buffers.remove(buffer_name)
+            if buffer_name in owning_program.state_dict:
+                owning_program.state_dict.pop(buffer_name)
+            else:
+                owning_program.constants.pop(buffer_name)
+        else:
+            # Delete the consumed parameters
+            param_name = toplevel_signature.inputs_to_parameters.pop(node.name)
+            toplevel_signature.parameters.remove(param_name)
+            owning_program.state_dict.pop(param_name)
+        tagged_graph_module.graph.erase_node(node)
 
 
 def _partition_and_lower_one_graph_module(
@@ -192,94 +523,108 @@ def _partition_and_lower_one_graph_module(
 ) -> torch.fx.GraphModule:
     """
     Partitioned and lowered the graph module based on the partition tag, this is to handle one graph module.
+
+    The nodes of all tags are found in one pass over the graph. The graph is only
+    topologically sorted, cleaned up and recompiled once, after all partitions are
+    lowered, so the time taken grows linearly with the number of partitions.
+
+    The first partition is carved out in the order of the graph. The graph used to be
+    sorted by legalize_graph after each partition, so the later partitions are carved
+    out in the order legalize_graph sorts the graph in, which is computed once up
+    front. This lays out the inputs and outputs of the submodules as before, unless
+    carving out a partition changes how legalize_graph orders the nodes of a later one.
+
+    If parallel_preprocess() is enabled, the partitions are preprocessed all at once:
+    each partition is replaced by a call to an empty placeholder module, which is
+    swapped for the lowered module once all partitions are preprocessed. The graph is
+    transformed exactly as it is when lowering each partition in turn.
     """
-    for tag, delegation_spec in partition_result.partition_tags.items():
-        # Create partition with nodes containing this tag. There should only be
-        # one contained submodule per tag
-        node_list = _get_node_list_with_same_tag(
-            tagged_graph_module, tag, owning_program
+    parallel = _PREPROCESS_MAX_WORKERS > 1
+    node_lists = _get_node_lists_by_tag(
+        tagged_graph_module, partition_result.partition_tags, owning_program
+    )
+    # Nodes created while lowering come after the output node until the graph is
+    # sorted, so find it now.
+    output_node = next(iter(reversed(tagged_graph_module.graph.nodes)))
+    assert output_node.op == "output"
+    graph_positions = {
+        node: position for position, node in enumerate(tagged_graph_module.graph.nodes)
+    }
+    legalized_positions = _legalized_positions(tagged_graph_module.graph)
+    # Placeholders of parameters and buffers that were unused from the start. They are
+    # deleted along with those consumed by the first lowered partition.
+    toplevel_signature = owning_program.graph_signature
+    unused_placeholders = [
+        node
+        for node in tagged_graph_module.graph.nodes
+        if node.op == "placeholder"
+        and len(node.users) == 0
+        and node.meta.get("delegation_tag", "") not in node_lists
+        and (
+            node.name in toplevel_signature.inputs_to_buffers
+            or node.name in toplevel_signature.inputs_to_parameters
         )
+    ]
 
-        if len(node_list) == 0:
+    consumed_placeholders: Dict[torch.fx.Node, None] = {}
+    partitions = []
+    lowered_names = []
+    for tag, delegation_spec in partition_result.partition_tags.items():
+        if len(node_lists[tag]) == 0:
             logging.debug(f"Did not find any nodes for tag {tag}")
             continue
 
-        logging.debug(f"For tag {tag}, found nodes {node_list}")
-        # Tag the nodes that are params as buffers, so we can order the submodule as (Parms + Buffers) (User Inputs)
-        submodule, call_module_node = create_submodule_from_nodes(
-            tagged_graph_module, node_list, tag
-        )
-        tagged_graph_module_output_node = [
-            node for node in tagged_graph_module.graph.nodes if node.op == "output"
-        ]
-        submodule_output_node = [
-            node for node in submodule.graph.nodes if node.op == "output"
-        ]
-        # Copy the output node meta from the original output node, because create_submodule_from_nodes doesn't cover the meta field
-        submodule_output_node[0].meta = tagged_graph_module_output_node[0].meta
-        logging.debug(f"Partitioned graph module: {tagged_graph_module}")
-
-        submodule_program = create_exported_program_from_submodule(
-            submodule, owning_program, tag
+        submodule_program, call_module_node = _create_partition_program(
+            tagged_graph_module,
+            tag,
+            node_lists[tag],
+            owning_program,
+            output_node,
+            legalized_positions if lowered_names else graph_positions,
         )
-
-        lowered_submodule = to_backend(
+        partition = (
             delegation_spec.backend_id,
             submodule_program,
             delegation_spec.compile_specs,
         )
-
-        # call delegate args should only use user_inputs
-        call_delegate_args = []
-        # Preserve input order as user_inputs
-        for inp_name in submodule_program.graph_signature.user_inputs:
-            for inp_node in call_module_node.all_input_nodes:
-                if inp_node.name == inp_name:
-                    call_delegate_args.append(inp_node)
-                    break
-
-        # Replace the partitioned submodule with a lowered submodule
-        # Add call_method node with function "forward"
-        with tagged_graph_module.graph.inserting_before(call_module_node):
-            lowered_name = get_lowered_module_name(
-                tagged_graph_module, lowered_submodule
-            )
-            lowered_node = tagged_graph_module.graph.get_attr(lowered_name)
-            call_delegate_node = tagged_graph_module.graph.call_function(
-                executorch_call_delegate,
-                (lowered_node,) + tuple(call_delegate_args),
-                call_module_node.kwargs,
+        if parallel:
+            lowered_submodule = torch.nn.Module()
+            partitions.append(partition)
+        else:
+            lowered_submodule = to_backend(*partition)
+
+        lowered_names.append(
+            _replace_with_lowered_module(
+                tagged_graph_module,
+                owning_program,
+                submodule_program,
+                call_module_node,
+                lowered_submodule,
+                consumed_placeholders,
             )
-            call_delegate_node.meta["debug_handle"] = len(
-                tagged_graph_module.graph.nodes
+        )
+        if len(lowered_names) == 1:
+            consumed_placeholders.update(dict.fromkeys(unused_placeholders))
+
+    if len(lowered_names) == 0:
+        return tagged_graph_module
+
+    if parallel:
+        preprocess_results = _preprocess_partitions(partitions)
+        for lowered_name, partition, preprocess_result in zip(
+            lowered_names, partitions, preprocess_results
+        ):
+            tagged_graph_module.add_module(
+                lowered_name, _create_lowered_module(*partition, preprocess_result)
             )
-            call_module_node.replace_all_uses_with(call_delegate_node)
-            tagged_graph_module.graph.erase_node(call_module_node)
-
-        # Delete all parameters/buffers consumed by the created exported program
-        toplevel_signature = owning_program.graph_signature
-        for node in tagged_graph_module.graph.nodes:
-            # Find placeholders consumed by the delegate
-            if node.op != "placeholder" or len(node.users) != 0:
-                continue
-
-            if node.name in toplevel_signature.inputs_to_buffers:
-                # Delete the consumed buffers
-                buffer_name = toplevel_signature.inputs_to_buffers.pop(node.name)
-                toplevel_signature.buffers.remove(buffer_name)
-                if buffer_name in owning_program.state_dict:
-                    owning_program.state_dict.pop(buffer_name)
-                else:
-                    owning_program.constants.pop(buffer_name)
-                tagged_graph_module.graph.erase_node(node)
-            elif node.name in toplevel_signature.inputs_to_parameters:
-                # Delete the consumed parameters
-                param_name = toplevel_signature.inputs_to_parameters.pop(node.name)
-                toplevel_signature.parameters.remove(param_name)
-                owning_program.state_dict.pop(param_name)
-                tagged_graph_module.graph.erase_node(node)
-
-        tagged_graph_module.recompile()
+
+    # Delete all parameters/buffers consumed by the created exported programs
+    _delete_consumed_placeholders(
+        tagged_graph_module, owning_program, consumed_placeholders
+    )
+    # Topologically sort the graph with the calls to the lowered modules, which
+    # also recompiles it.
+    legalize_graph(tagged_graph_module)
     return tagged_graph_module
 
 
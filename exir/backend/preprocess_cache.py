@@ -0,0 +1,338 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+A persistent cache of the results of BackendDetails.preprocess.
+
+Results are stored on disk, keyed by a hash of everything preprocess can see: the
+partition's graph with the metadata of its nodes, its constants, the backend id and
+the compile specs. Metadata that only records where a node came from, like its
+stack trace, is left out. Exporting the same model again, or a model whose
+partitions were lowered before, reuses the stored results instead of running the
+backends again.
+"""
+
+import enum
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import torch
+from executorch.exir.backend.backend_details import PreprocessResult
+from executorch.exir.backend.compile_spec_schema import CompileSpec
+from torch._subclasses.fake_tensor import is_fake
+from torch.export import ExportedProgram
+from torch.utils import _pytree as pytree
+
+# Bumped when the format of keys or entries changes, to ignore old entries.
+_CACHE_VERSION: int = 2
+
+_ENTRY_SUFFIX: str = ".preprocess"
+
+# Node metadata that records where a node came from, which preprocess has no use
+# for. Including it would keep identical partitions from sharing a result.
+_IGNORED_META_KEYS: FrozenSet[str] = frozenset(
+    [
+        "debug_handle",  # Part of the key unless ignore_debug_handles is set.
+        "delegation_tag",
+        "from_node",
+        "nn_module_stack",
+        "original_aten",
+        "seq_nr",
+        "source_fn_stack",
+        "stack_trace",
+        "torch_fn",
+    ]
+)
+
+# Types of metadata values whose repr is stable across processes.
+_STABLE_TYPES: Tuple[type, ...] = (
+    type(None),
+    bool,
+    int,
+    float,
+    str,
+    bytes,
+    enum.Enum,
+    torch.Size,
+    torch.dtype,
+    torch.device,
+    torch.layout,
+    torch.memory_format,
+)
+
+
+@dataclass
+class PreprocessCacheStats:
+    """Counters for the lookups of a PreprocessCache."""
+
+    hits: int = 0
+    misses: int = 0
+    # Entries removed to keep the cache under its size limit.
+    evictions: int = 0
+
+
+def _target_name(target: Any) -> str:
+    """Returns a name for a call_function target that is stable across processes."""
+    name = getattr(target, "name", None)
+    if callable(name):
+        # OpOverloads, EdgeOpOverloads and HigherOrderOperators.
+        return f"{type(target).__qualname__}:{name()}"
+    return (
+        f"{getattr(target, '__module__', '')}.{getattr(target, '__qualname__', target)}"
+    )
+
+
+class _Hasher:
+    """Feeds a description of a program into a hash, with node names left out."""
+
+    def __init__(self, ignore_debug_handles: bool) -> None:
+        self._hash = hashlib.sha256()
+        self._ignore_debug_handles = ignore_debug_handles
+
+    def update(self, *items: Any) -> None:
+        for item in items:
+            self._hash.update(repr(item).encode())
+            self._hash.update(b"\0")
+
+    def update_tensor(self, tensor: torch.Tensor) -> None:
+        if is_fake(tensor):
+            # There is no data to hash; make sure the key never matches.
+            self.update(id(tensor), os.getpid())
+            return
+        tensor = tensor.detach().cpu().contiguous()
+        self.update("tensor", tensor.dtype, tuple(tensor.shape))
+        try:
+            data = tensor.view(-1).view(torch.uint8).numpy()
+        except (RuntimeError, TypeError):
+            # Tensors that cannot be viewed as bytes, like quantized tensors.
+            buffer = io.BytesIO()
+            torch.save(tensor, buffer)
+            data = buffer.getvalue()
+        self._hash.update(data)
+
+    def _value(self, value: Any) -> Any:
+        """Returns a hashable description of a node's value or argument."""
+        if isinstance(value, torch.Tensor):
+            return (
+                "tensor",
+                value.dtype,
+                tuple(str(s) for s in value.shape),
+                tuple(str(s) for s in value.stride()),
+            )
+        if isinstance(value, (torch.SymInt, torch.SymFloat, torch.SymBool)):
+            return ("sym", str(value))
+        return value
+
+    def _meta_value(self, value: Any, node_ids: Dict[torch.fx.Node, int]) -> Any:
+        """Returns a hashable description of a value in a node's metadata."""
+        if isinstance(value, torch.fx.Node) and value in node_ids:
+            return ("node", node_ids[value])
+        if isinstance(
+            value, (torch.Tensor, torch.SymInt, torch.SymFloat, torch.SymBool)
+        ):
+            return self._value(value)
+        if isinstance(value, _STABLE_TYPES):
+            return value
+        if callable(getattr(value, "name", None)):
+            # Ops, like the encodings of quantization parameters.
+            return _target_name(value)
+        # There is no stable description; make sure the key never matches.
+        return (type(value).__qualname__, id(value), os.getpid())
+
+    def update_graph_module(self, graph_module: torch.fx.GraphModule) -> None:
+        # Nodes are identified by their position in the graph.
+        node_ids = {node: i for i, node in enumerate(graph_module.graph.nodes)}
+
+        def describe(arg: Any) -> Any:
+            if isinstance(arg, torch.fx.Node):
+                return ("node", node_ids[arg])
+            return self._value(arg)
+
+        for node in graph_module.graph.nodes:
+            args, kwargs = pytree.tree_map(describe, (node.args, node.kwargs))
+            target = None
+            if node.op == "get_attr":
+                self.update_attribute(graph_module, node.target)
+            elif node.op == "call_function":
+                target = _target_name(node.target)
+            elif node.op in ("call_method", "call_module"):
+                target = node.target
+            self.update(node.op, target, args, sorted(kwargs.items()))
+            # Backends may read any metadata, like quantization parameters.
+            for key in sorted(node.meta):
+                if key not in _IGNORED_META_KEYS:
+                    value = pytree.tree_map(
+                        lambda v: self._meta_value(v, node_ids), node.meta[key]
+                    )
+                    self.update(key, value)
+            if not self._ignore_debug_handles:
+                self.update(node.meta.get("debug_handle"))
+
+    def update_attribute(self, graph_module: torch.fx.GraphModule, name: str) -> None:
+        value = getattr(graph_module, name)
+        if isinstance(value, torch.Tensor):
+            self.update_tensor(value)
+        elif isinstance(value, torch.fx.GraphModule):
+            # Control flow branches.
+            self.update("graph_module")
+            self.update_graph_module(value)
+        elif hasattr(value, "processed_bytes") and hasattr(value, "backend_id"):
+            # A nested LoweredBackendModule.
+            self.update("lowered_module", value.backend_id, value.processed_bytes)
+            for spec in value.compile_specs:
+                self.update(spec.key, spec.value)
+        else:
+            # Some other object, for which there is no stable description; make
+            # sure the key never matches.
+            self.update(type(value).__qualname__, id(value), os.getpid())
+
+    def update_program(self, edge_program: ExportedProgram) -> None:
+        self.update_graph_module(edge_program.graph_module)
+        signature = edge_program.graph_signature
+        for spec in signature.input_specs:
+            self.update("input", spec.kind, getattr(spec, "persistent", None))
+            if spec.target is None:
+                continue
+            if spec.target in edge_program.state_dict:
+                self.update_tensor(edge_program.state_dict[spec.target])
+            elif spec.target in edge_program.constants:
+                constant = edge_program.constants[spec.target]
+                if isinstance(constant, torch.Tensor):
+                    self.update_tensor(constant)
+                else:
+                    # A custom class instance, for which there is no stable
+                    # description; make sure the key never matches.
+                    self.update(id(constant), os.getpid())
+        for spec in signature.output_specs:
+            self.update("output", spec.kind)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class PreprocessCache:
+    """
+    An on-disk cache of PreprocessResults, shared by all users of the directory.
+
+    Entries are evicted least recently used first once the cache grows past
+    max_size_bytes. Entries are pickles: only use a directory that nobody else can
+    write to. Entries are not invalidated when a backend's implementation changes;
+    call clear() after updating a backend.
+
+    Args:
+        cache_dir: The directory holding the entries. Created if it does not exist.
+        max_size_bytes: The largest total size of the entries.
+        ignore_debug_handles: If True, the debug handles of the nodes are not part of
+            the keys, so that partitions that only differ by their debug handles (like
+            the repeated layers of a model) share a result. Backends that store debug
+            handles in their results will then report those of the first partition
+            lowered for all of them.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size_bytes: int = 1 << 30,
+        ignore_debug_handles: bool = False,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.ignore_debug_handles = ignore_debug_handles
+        self.stats = PreprocessCacheStats()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(
+        self,
+        backend_id: str,
+        edge_program: ExportedProgram,
+        compile_specs: List[CompileSpec],
+    ) -> str:
+        """Returns the key of the result of preprocessing edge_program."""
+        hasher = _Hasher(self.ignore_debug_handles)
+        hasher.update(_CACHE_VERSION, torch.__version__, backend_id)
+        for spec in compile_specs:
+            hasher.update(spec.key, spec.value)
+        hasher.update_program(edge_program)
+        return hasher.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[PreprocessResult]:
+        """Returns the cached result for key, or None if there is none."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+            # Mark the entry as recently used.
+            os.utime(path)
+        except Exception:
+            # Loading a truncated entry, or one that references classes that have
+            # changed since it was stored, can raise about anything.
+            result = None
+        if not isinstance(result, PreprocessResult):
+            # Drop a bad entry, so that the result is stored again.
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return result
+
+    def put(self, key: str, result: PreprocessResult) -> None:
+        """Stores result under key, evicting old entries if needed."""
+        # Write to a temporary file first, so that readers never see partial
+        # entries.
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._evict()
+
+    def _entries(self) -> List[os.DirEntry]:
+        with os.scandir(self.cache_dir) as it:
+            return [e for e in it if e.name.endswith(_ENTRY_SUFFIX)]
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Removed by another process.
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.unlink(path)
+                self.stats.evictions += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        for entry in self._entries():
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
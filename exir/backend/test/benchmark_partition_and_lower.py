@@ -0,0 +1,127 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Benchmarks partitioning and lowering a deep model with one partition per layer.
+
+Each layer is a matmul and an add, which AddMulPartitionerDemo delegates, followed
+by a sin, which it does not, so every layer becomes a separate partition.
+
+The time taken to partition and lower the graph, which excludes the time the
+partitioner takes to tag it, should grow linearly with the number of layers. The
+benchmark fails if the time per layer of the deepest model is more than
+--max_slowdown times that of the shallowest one.
+
+    python -m executorch.exir.backend.test.benchmark_partition_and_lower --num_layers 64 256
+"""
+
+import argparse
+import time
+from typing import Dict, Tuple
+
+import torch
+from executorch.exir import EdgeProgramManager, to_edge
+from executorch.exir.backend.partitioner import Partitioner, PartitionResult
+from executorch.exir.backend.test.op_partitioner_demo import AddMulPartitionerDemo
+from executorch.exir.lowered_backend_module import get_lowered_submodules
+from torch.export import export, ExportedProgram
+
+
+class LayeredModel(torch.nn.Module):
+    def __init__(self, num_layers: int, dim: int) -> None:
+        super().__init__()
+        self.weights = torch.nn.ParameterList(
+            [torch.nn.Parameter(torch.randn(dim, dim)) for _ in range(num_layers)]
+        )
+
+    def forward(self, x: torch.Tensor, bias: torch.Tensor) -> torch.Tensor:
+        for weight in self.weights:
+            x = (torch.mm(x, weight) + bias).sin()
+        return x
+
+
+def make_edge_program(num_layers: int, dim: int) -> EdgeProgramManager:
+    inputs = (torch.randn(dim, dim), torch.randn(dim, dim))
+    return to_edge(export(LayeredModel(num_layers, dim), inputs))
+
+
+class _TimedPartitioner(Partitioner):
+    """Records the time taken by another partitioner."""
+
+    def __init__(self, partitioner: Partitioner) -> None:
+        super().__init__()
+        self.partitioner = partitioner
+        self.elapsed = 0.0
+
+    def partition(self, exported_program: ExportedProgram) -> PartitionResult:
+        start = time.perf_counter()
+        result = self.partitioner(exported_program)
+        self.elapsed += time.perf_counter() - start
+        return result
+
+
+def lower(num_layers: int, dim: int) -> Tuple[int, float]:
+    """Returns the number of nodes of the model and the time taken by to_backend,
+    without the time taken by the partitioner.
+    """
+    edge_program = make_edge_program(num_layers, dim)
+    num_nodes = len(edge_program.exported_program().graph.nodes)
+
+    partitioner = _TimedPartitioner(AddMulPartitionerDemo())
+    start = time.perf_counter()
+    lowered = edge_program.to_backend(partitioner)
+    elapsed = time.perf_counter() - start - partitioner.elapsed
+
+    num_partitions = len(
+        get_lowered_submodules(lowered.exported_program().graph_module)
+    )
+    if num_partitions != num_layers:
+        raise AssertionError(
+            f"Expected {num_layers} partitions, but {num_partitions} were lowered"
+        )
+    return num_nodes, elapsed
+
+
+def check_linear(times: Dict[int, float], max_slowdown: float) -> None:
+    """Raises if the time per layer grows by more than max_slowdown between the
+    shallowest and the deepest model.
+    """
+    shallowest, deepest = min(times), max(times)
+    slowdown = (times[deepest] / deepest) / (times[shallowest] / shallowest)
+    if slowdown > max_slowdown:
+        raise AssertionError(
+            f"Lowering {deepest} layers took {slowdown:.2f}x as long per layer as "
+            + f"lowering {shallowest} layers, more than {max_slowdown}x: the time "
+            + "does not grow linearly with the number of partitions"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_layers", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--dim", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max_slowdown", type=float, default=1.5)
+    args = parser.parse_args()
+
+    print(f"{'layers':>8} {'nodes':>8} {'to_backend (s)':>15} {'per layer (ms)':>15}")
+    times = {}
+    for num_layers in args.num_layers:
+        elapsed = []
+        for _ in range(args.repeat):
+            num_nodes, seconds = lower(num_layers, args.dim)
+            elapsed.append(seconds)
+        times[num_layers] = min(elapsed)
+        print(
+            f"{num_layers:>8} {num_nodes:>8} {times[num_layers]:>15.3f} "
+            + f"{1000 * times[num_layers] / num_layers:>15.2f}"
+        )
+    check_linear(times, args.max_slowdown)
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
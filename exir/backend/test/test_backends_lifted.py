@@ -10,7 +10,11 @@ from typing import Dict, List
 import executorch.exir as exir
 import torch
 from executorch.exir import to_edge
-from executorch.exir.backend.backend_api import LoweredBackendModule, to_backend
+from executorch.exir.backend.backend_api import (
+    LoweredBackendModule,
+    parallel_preprocess,
+    to_backend,
+)
 from executorch.exir.backend.compile_spec_schema import CompileSpec
 from executorch.exir.backend.partitioner import (
     DelegationSpec,
@@ -925,6 +929,112 @@ class TestBackends(unittest.TestCase):
         new_res = executorch_prog.exported_program().graph_module(*inputs)
         self.assertTrue(torch.allclose(orig_res, new_res[0]))
 
+    def test_parallel_preprocess(self):
+        class Model(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                for i in range(4):
+                    self.register_buffer(f"one_{i}", torch.ones(2, 2))
+
+            def forward(self, a, x, b):
+                for i in range(4):
+                    a = torch.mm(a, x) + b
+                    a = (a + getattr(self, f"one_{i}")).sin()
+                return a
+
+        inputs = (torch.randn(2, 2), torch.randn(2, 2), torch.randn(2, 2))
+        ep = export(Model(), inputs)
+
+        for partitioner in (AddMulPartitionerDemo, AddAttributePartitionerDemo):
+            with self.subTest(partitioner=partitioner.__name__):
+                serial_prog = to_edge(ep).to_backend(partitioner())
+                with parallel_preprocess(max_workers=2):
+                    parallel_prog = to_edge(ep).to_backend(partitioner())
+
+                self.assertEqual(
+                    len(
+                        get_lowered_backend_modules(
+                            parallel_prog.exported_program().graph_module
+                        )
+                    ),
+                    4,
+                )
+                # The lowered program is identical to the one lowered serially.
+                self.assertEqual(
+                    serial_prog.to_executorch().buffer,
+                    parallel_prog.to_executorch().buffer,
+                )
+
+    def test_partition_io_layout(self):
+        class Model(torch.nn.Module):
+            def forward(self, a, x, b):
+                c = b
+                for _ in range(4):
+                    q = torch.mm(c, x) + b
+                    p = torch.mm(a, x) + c.sin()
+                    a, c = (p * q).sin(), q.cos()
+                return a, c
+
+        inputs = (torch.randn(2, 2), torch.randn(2, 2), torch.randn(2, 2))
+        lowered = to_edge(export(Model(), inputs)).to_backend(AddMulPartitionerDemo())
+
+        # The inputs and outputs of the delegates are laid out as when each partition
+        # was carved out of a topologically sorted graph.
+        layouts = []
+        for _, lowered_module, call_delegate_node in get_lowered_submodules(
+            lowered.exported_program().graph_module
+        ):
+            output_node = next(
+                node
+                for node in lowered_module.original_module.graph.nodes
+                if node.op == "output"
+            )
+            layouts.append(
+                (
+                    [node.name for node in call_delegate_node.args[1:]],
+                    [node.name for node in output_node.args[0]],
+                )
+            )
+        self.assertEqual(
+            layouts,
+            [
+                (
+                    ["arg0_1", "arg1_1", "arg2_1", "aten_sin_default"],
+                    ["aten_add_tensor_1", "aten_add_tensor"],
+                ),
+                (
+                    [
+                        "aten_cos_default",
+                        "arg1_1",
+                        "aten_sin_default_2",
+                        "arg2_1",
+                        "aten_sin_default_1",
+                    ],
+                    ["aten_add_tensor_2", "aten_add_tensor_3"],
+                ),
+                (
+                    [
+                        "aten_cos_default_1",
+                        "arg1_1",
+                        "aten_sin_default_4",
+                        "arg2_1",
+                        "aten_sin_default_3",
+                    ],
+                    ["aten_add_tensor_4", "aten_add_tensor_5"],
+                ),
+                (
+                    [
+                        "aten_cos_default_2",
+                        "arg1_1",
+                        "aten_sin_default_6",
+                        "arg2_1",
+                        "aten_sin_default_5",
+                    ],
+                    ["aten_add_tensor_6", "aten_add_tensor_7"],
+                ),
+            ],
+        )
+
     def test_bad_partitioner(self):
         """
         Checks that we throw an error if user provided partitioner modifies the
@@ -0,0 +1,173 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import torch
+from executorch.exir import to_edge
+from executorch.exir.backend.backend_api import cached_preprocess
+from executorch.exir.backend.backend_details import PreprocessResult
+from executorch.exir.backend.compile_spec_schema import CompileSpec
+from executorch.exir.backend.preprocess_cache import PreprocessCache
+from executorch.exir.backend.test.backend_with_compiler_demo import (
+    BackendWithCompilerDemo,
+)
+from executorch.exir.backend.test.op_partitioner_demo import AddMulPartitionerDemo
+from executorch.exir.dialects._ops import ops as exir_ops
+from torch.export import export
+
+
+class RepeatedBlocks(torch.nn.Module):
+    def forward(self, a, x, b):
+        for _ in range(4):
+            a = torch.mm(a, x) + b
+            a = a.sin()
+        return a
+
+
+class TestPreprocessCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        inputs = (torch.randn(2, 2), torch.randn(2, 2), torch.randn(2, 2))
+        self.exported_program = export(RepeatedBlocks(), inputs)
+
+    def lower(self, cache: PreprocessCache):
+        """Lowers the model with the cache, and returns the program and the
+        number of times the backend ran.
+        """
+        with patch.object(
+            BackendWithCompilerDemo,
+            "preprocess",
+            side_effect=BackendWithCompilerDemo.preprocess,
+        ) as preprocess, cached_preprocess(cache):
+            program = to_edge(self.exported_program).to_backend(AddMulPartitionerDemo())
+        return program.to_executorch().buffer, preprocess.call_count
+
+    def test_repeated_export(self) -> None:
+        cache = PreprocessCache(self.temp_dir.name)
+        buffer, num_preprocessed = self.lower(cache)
+        self.assertEqual(num_preprocessed, 4)
+        self.assertEqual(cache.stats.misses, 4)
+        self.assertEqual(cache.stats.hits, 0)
+
+        # A new cache in the same directory finds all results.
+        cache = PreprocessCache(self.temp_dir.name)
+        cached_buffer, num_preprocessed = self.lower(cache)
+        self.assertEqual(num_preprocessed, 0)
+        self.assertEqual(cache.stats.hits, 4)
+        self.assertEqual(cached_buffer, buffer)
+
+    def test_ignore_debug_handles(self) -> None:
+        # The blocks only differ by the debug handles of their nodes.
+        cache = PreprocessCache(self.temp_dir.name, ignore_debug_handles=True)
+        _, num_preprocessed = self.lower(cache)
+        self.assertEqual(num_preprocessed, 1)
+        self.assertEqual(cache.stats.misses, 1)
+        self.assertEqual(cache.stats.hits, 3)
+
+    def test_key(self) -> None:
+        cache = PreprocessCache(self.temp_dir.name)
+        program = to_edge(self.exported_program).exported_program()
+        key = cache.key("BackendWithCompilerDemo", program, [])
+        self.assertEqual(key, cache.key("BackendWithCompilerDemo", program, []))
+        self.assertNotEqual(key, cache.key("QnnBackend", program, []))
+        self.assertNotEqual(
+            key,
+            cache.key("BackendWithCompilerDemo", program, [CompileSpec("k", b"v")]),
+        )
+
+        # Constants are part of the key.
+        linear = torch.nn.Linear(2, 2)
+        keys = []
+        for _ in range(2):
+            with torch.no_grad():
+                linear.weight.add_(1)
+            program = to_edge(export(linear, (torch.randn(2, 2),))).exported_program()
+            keys.append(cache.key("BackendWithCompilerDemo", program, []))
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_key_node_meta(self) -> None:
+        cache = PreprocessCache(self.temp_dir.name)
+        program = to_edge(self.exported_program).exported_program()
+        key = cache.key("QnnBackend", program, [])
+        node = next(
+            n for n in program.graph.nodes if n.target == exir_ops.edge.aten.mm.default
+        )
+
+        # Metadata that backends read, like quantization parameters, is part of
+        # the key.
+        keys = []
+        for scale in (0.1, 0.2):
+            node.meta["quant_attrs"] = {
+                "encoding": exir_ops.edge.quantized_decomposed.quantize_per_tensor.default,
+                "scale": scale,
+                "zero_point": 0,
+                "dtype": torch.int8,
+            }
+            keys.append(cache.key("QnnBackend", program, []))
+            self.assertEqual(keys[-1], cache.key("QnnBackend", program, []))
+        self.assertEqual(len({key, *keys}), 3)
+        del node.meta["quant_attrs"]
+
+        # Metadata that records where nodes came from is not.
+        node.meta["stack_trace"] = "elsewhere"
+        node.meta["nn_module_stack"] = {}
+        self.assertEqual(key, cache.key("QnnBackend", program, []))
+
+        # Metadata without a stable description never matches another process.
+        node.meta["custom"] = object()
+        self.assertNotEqual(key, cache.key("QnnBackend", program, []))
+
+    def test_key_unknown_attribute(self) -> None:
+        cache = PreprocessCache(self.temp_dir.name)
+        program = to_edge(self.exported_program).exported_program()
+        graph_module = program.graph_module
+        graph_module.custom = object()
+        with graph_module.graph.inserting_before(next(iter(graph_module.graph.nodes))):
+            graph_module.graph.get_attr("custom")
+        key = cache.key("QnnBackend", program, [])
+
+        # Attributes without a stable description never match another object.
+        graph_module.custom = object()
+        self.assertNotEqual(key, cache.key("QnnBackend", program, []))
+
+    def test_corrupt_entry(self) -> None:
+        cache = PreprocessCache(self.temp_dir.name)
+        path = os.path.join(self.temp_dir.name, "a.preprocess")
+        for data in (b"", b"\x80\x04garbage", b"cos\nsystem_missing_attr\n."):
+            with open(path, "wb") as f:
+                f.write(data)
+            self.assertIsNone(cache.get("a"))
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(cache.stats.misses, 3)
+        self.assertEqual(cache.stats.hits, 0)
+
+    def test_lru_eviction(self) -> None:
+        cache = PreprocessCache(self.temp_dir.name)
+        result = PreprocessResult(processed_bytes=b"\x00" * 1000)
+        cache.put("a", result)
+        entry_size = os.path.getsize(os.path.join(self.temp_dir.name, "a.preprocess"))
+        cache.max_size_bytes = 2 * entry_size
+        cache.put("b", result)
+        # Make "a" older than "b", then use it.
+        os.utime(os.path.join(self.temp_dir.name, "a.preprocess"), ns=(0, 0))
+        os.utime(os.path.join(self.temp_dir.name, "b.preprocess"), ns=(1, 1))
+        self.assertEqual(cache.get("a"), result)
+
+        cache.put("c", result)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), result)
+        self.assertEqual(cache.get("c"), result)
+        self.assertEqual(cache.stats.hits, 3)
+        self.assertEqual(cache.stats.misses, 1)
+
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
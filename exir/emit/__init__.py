@@ -6,6 +6,10 @@
 
 # pyre-strict
 
-from executorch.exir.emit._emit_program import emit_program, EmitterOutput
+from executorch.exir.emit._emit_program import (
+    ConstantDedupStats,
+    emit_program,
+    EmitterOutput,
+)
 
-__all__ = ["emit_program", "EmitterOutput"]
+__all__ = ["ConstantDedupStats", "emit_program", "EmitterOutput"]
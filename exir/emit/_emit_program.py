@@ -5,7 +5,7 @@
 # LICENSE file in the root directory of this source tree.
 
 # pyre-strict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Union
 
 import executorch.extension.pytree as ex_pytree
@@ -16,6 +16,7 @@ from executorch.exir.emit._emitter import (
     _EmitterState,
     _ProgramState,
     _TopLevelEmitter,
+    ConstantDedupStats,
 )
 from executorch.exir.error import ExportError, ExportErrorType
 from executorch.exir.schema import (
@@ -122,6 +123,9 @@ class EmitterOutput:
         str, Dict[int, Dict[str, Union[str, _DelegateDebugIdentifierMap]]]
     ]
 
+    # How many constant tensors shared their data with another constant.
+    constant_dedup_stats: ConstantDedupStats = field(default_factory=ConstantDedupStats)
+
 
 def _remove_non_user_outputs(exported_program: ExportedProgram) -> torch.fx.GraphModule:
     gm = exported_program.graph_module
@@ -222,9 +226,12 @@ def emit_program(
     if prim_getters is not None:
         plans.extend(_emit_prim_getters(prim_getters))
 
+    program_state.constants.finalize(program_state)
+
     return EmitterOutput(
         debug_handle_map=debug_handle_map,
         method_to_delegate_debug_id_map=method_to_delegate_debug_id_map,
+        constant_dedup_stats=program_state.constants.stats,
         program=Program(
             version=EXECUTORCH_SCHEMA_VERSION,
             execution_plan=plans,
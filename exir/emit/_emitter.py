@@ -31,8 +31,10 @@ their instructions.
 import ctypes
 import hashlib
 import operator
+import os
 import typing
 import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Any, Callable, cast, Dict, List, Mapping, Optional, Tuple, Union
 
@@ -94,6 +96,130 @@ from torch.utils import _pytree as pytree
 from typing_extensions import TypeAlias
 
 
+# Constant buffers at least this large are hashed on a worker thread. hashlib releases the GIL
+# while hashing large inputs, so several big weights can be hashed at once.
+_PARALLEL_HASH_MIN_BYTES: int = 1 << 20
+
+
+@dataclass
+class ConstantDedupStats:
+    """Statistics about the deduplication of constant tensor data during emission."""
+
+    # Number of constant tensors emitted.
+    num_constants: int = 0
+    # Number of distinct buffers added to Program.constant_buffer.
+    num_unique: int = 0
+    # Constants whose storage had already been emitted, found without hashing their data.
+    identity_hits: int = 0
+    # Constants whose data matched the hash of a previously emitted buffer.
+    hash_hits: int = 0
+    # Bytes of constant data that were hashed.
+    bytes_hashed: int = 0
+    # Bytes of constant data that were not added to the program because they were duplicates.
+    bytes_deduplicated: int = 0
+
+
+@dataclass
+class _PendingConstant:
+    """A distinct constant storage, waiting for its hash to decide its buffer index."""
+
+    # Keeps the storage alive, so that its address cannot be reused by another storage.
+    storage: torch.UntypedStorage
+    data: memoryview
+    digest: Union[str, "Future[str]"]
+    spec: TensorSpec
+
+
+def _sha256(data: memoryview) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class _ConstantDeduplicator:
+    """Assigns constant_buffer indices to constant tensors, sharing buffers with equal data.
+
+    Storages are read in place instead of being copied to bytes, and storages that were already
+    seen are recognized by their address without being hashed again. Large buffers are hashed on a
+    thread pool while emission continues, so the indices are only assigned in finalize(), in
+    emission order; they are the same indices that hashing every constant in turn would produce.
+    """
+
+    def __init__(self) -> None:
+        self.stats = ConstantDedupStats()
+        # (data_ptr, nbytes) of each distinct storage -> index in _pending.
+        self._by_storage: Dict[Tuple[int, int], int] = {}
+        self._pending: List[_PendingConstant] = []
+        # Each emitted constant tensor and the index in _pending of its data.
+        self._tensors: List[Tuple[Tensor, int]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _hash(self, data: memoryview) -> Union[str, "Future[str]"]:
+        self.stats.bytes_hashed += len(data)
+        if len(data) < _PARALLEL_HASH_MIN_BYTES or (os.cpu_count() or 1) < 2:
+            return _sha256(data)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor()
+        return self._executor.submit(_sha256, data)
+
+    def add(
+        self, tensor: Tensor, spec: TensorSpec, storage: torch.UntypedStorage
+    ) -> None:
+        """Records a constant tensor whose data is the whole of `storage`.
+
+        tensor.constant_buffer_idx is set by finalize().
+        """
+        self.stats.num_constants += 1
+        nbytes = storage.nbytes() if spec.allocated_memory != 0 else 0
+        key = (storage.data_ptr(), nbytes) if nbytes else (0, 0)
+        index = self._by_storage.get(key)
+        if index is None:
+            if nbytes:
+                array = (ctypes.c_char * nbytes).from_address(storage.data_ptr())
+                data = memoryview(array).cast("B")
+            else:
+                data = memoryview(b"")
+            index = len(self._pending)
+            self._pending.append(
+                _PendingConstant(storage, data, self._hash(data), spec)
+            )
+            self._by_storage[key] = index
+        else:
+            self.stats.identity_hits += 1
+            self.stats.bytes_deduplicated += nbytes
+        self._tensors.append((tensor, index))
+
+    def finalize(self, program_state: "_ProgramState") -> None:
+        """Adds the distinct buffers to program_state and sets the tensors' buffer indices."""
+        buffer_indices: Dict[int, int] = {}
+        try:
+            for tensor, index in self._tensors:
+                if index not in buffer_indices:
+                    pending = self._pending[index]
+                    digest = pending.digest
+                    hashed = digest if isinstance(digest, str) else digest.result()
+                    buffer_idx = program_state.cached_spec_hash_values.get(hashed, -1)
+                    # Haven't seen this constant before
+                    if buffer_idx == -1:
+                        buffer_idx = len(program_state.constant_buffer)
+                        program_state.allocated_specs.append(pending.spec)
+                        program_state.cached_spec_hash_values[hashed] = buffer_idx
+                        program_state.constant_buffer.append(
+                            Buffer(storage=bytes(pending.data))
+                        )
+                        self.stats.num_unique += 1
+                    else:
+                        self.stats.hash_hits += 1
+                        self.stats.bytes_deduplicated += len(pending.data)
+                    buffer_indices[index] = buffer_idx
+                tensor.constant_buffer_idx = buffer_indices[index]
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        self._by_storage.clear()
+        self._pending.clear()
+        self._tensors.clear()
+
+
 @dataclass
 class _ProgramState:
     """State shared between all methods of a program and the graph module it represents.
@@ -114,6 +240,9 @@ class _ProgramState:
     # Delegate data stored directly in the flatbuffer. Pointed to by BackendDelegateDataReference,
     # and should be copied to Program.backend_delegate_data.
     backend_delegate_data: List[BackendDelegateInlineData] = field(default_factory=list)
+    # Deduplicates constant tensor data. Call constants.finalize() once all methods are emitted
+    # to fill in constant_buffer.
+    constants: _ConstantDeduplicator = field(default_factory=_ConstantDeduplicator)
 
 
 @dataclass
@@ -349,45 +478,21 @@ class _Emitter(torch.fx.Interpreter):
             return EValue(make_tensor_value(0, allocation_info, spec))
 
         # Constant tensor. Reserve a buffer for the constant tensor.
-        spec_array_type = (
-            ctypes.c_char * typing.cast(torch.UntypedStorage, spec.storage).nbytes()
-        )
-
-        buffer_data = (
-            bytes(
-                ctypes.cast(
-                    typing.cast(torch.UntypedStorage, spec.storage).data_ptr(),
-                    ctypes.POINTER(spec_array_type),
-                ).contents
-            )
-            if spec.allocated_memory != 0
-            else b""
-        )
-
-        hashed = hashlib.sha256(buffer_data).hexdigest()
-
-        buffer_idx = self.program_state.cached_spec_hash_values.get(hashed, -1)
-
-        # Haven't seen this constant before
-        if buffer_idx == -1:
-            # Update buffer_idx to point to the end of the list where we are adding the new buffer.
-            buffer = Buffer(storage=buffer_data)
-            buffer_idx = len(self.program_state.constant_buffer)
-            self.program_state.allocated_specs.append(spec)
-            # +1 because the first buffer location is reserved
-            self.program_state.cached_spec_hash_values[hashed] = buffer_idx
-            self.program_state.constant_buffer.append(buffer)
-
-        if spec.const and spec.nbytes() != len(buffer_data):
+        storage = typing.cast(torch.UntypedStorage, spec.storage)
+        nbytes = storage.nbytes() if spec.allocated_memory != 0 else 0
+        if spec.nbytes() != nbytes:
             raise InternalError(
                 self._emit_node_specific_error(
                     self.node,
-                    f"Tensor spec has buffer of size {len(buffer_data)}, but expected nbytes of {spec.nbytes()}",
+                    f"Tensor spec has buffer of size {nbytes}, but expected nbytes of {spec.nbytes()}",
                 )
             )
 
-        # For constant tensors, allocation_info = None.
-        return EValue(make_tensor_value(buffer_idx, None, spec))
+        # For constant tensors, allocation_info = None. The buffer index is filled in once all
+        # constants have been deduplicated.
+        tensor = make_tensor_value(0, None, spec)
+        self.program_state.constants.add(tensor, spec, storage)
+        return EValue(tensor)
 
     def _get_list_tuple_jit_type(
         self, val: Union[Tuple[_Argument], List[_Argument]]
@@ -1407,6 +1407,43 @@ class TestEmit(unittest.TestCase):
         self.assertEqual(len(program.constant_buffer), 2)
         self.assertEqual(len(program.constant_buffer[1].storage), 24)
 
+    def test_constant_dedup(self) -> None:
+        class SharedWeights(nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.a = nn.Linear(4, 4, bias=False)
+                self.b = nn.Linear(4, 4, bias=False)
+                # Same storage as a.weight.
+                self.b.weight = self.a.weight
+                self.c = nn.Linear(4, 4, bias=False)
+                # Different storage, same data as a.weight.
+                self.c.weight.data.copy_(self.a.weight.data)
+
+            def forward(self, x):
+                return self.a(x) + self.b(x) + self.c(x)
+
+        program = to_edge(export(SharedWeights(), (torch.ones(2, 4),))).to_executorch()
+
+        emitter_output = program._emitter_output
+        # All three weights share a single buffer.
+        self.assertEqual(len(emitter_output.program.constant_buffer), 2)
+        constant_indices = {
+            value.val.constant_buffer_idx
+            for value in emitter_output.program.execution_plan[0].values
+            if isinstance(value.val, schema.Tensor)
+            and value.val.constant_buffer_idx != 0
+        }
+        self.assertEqual(constant_indices, {1})
+
+        stats = emitter_output.constant_dedup_stats
+        self.assertEqual(stats.num_constants, 3)
+        self.assertEqual(stats.num_unique, 1)
+        self.assertEqual(stats.identity_hits, 1)
+        self.assertEqual(stats.hash_hits, 1)
+        # The tied weight is not hashed twice.
+        self.assertEqual(stats.bytes_hashed, 2 * 4 * 4 * 4)
+        self.assertEqual(stats.bytes_deduplicated, 2 * 4 * 4 * 4)
+
     def test_mutable_buffers(self) -> None:
         def count_copies(gm: torch.fx.GraphModule) -> int:
             return sum(
@@ -378,6 +378,9 @@ def arrange_graph_placeholders(
     node_map = {}  # mapping of nodes from old graph to new graph
 
     graph_sign = owning_program.graph_signature
+    # The signature builds these mappings on every access.
+    inputs_to_parameters = graph_sign.inputs_to_parameters
+    inputs_to_buffers = graph_sign.inputs_to_buffers
 
     # Add all placeholders into the graph first:
     param_nodes = []
@@ -387,9 +390,9 @@ def arrange_graph_placeholders(
         if node.op != "placeholder":
             continue
 
-        if node.name in graph_sign.inputs_to_parameters:
+        if node.name in inputs_to_parameters:
             param_nodes.append(node)
-        elif node.name in graph_sign.inputs_to_buffers:
+        elif node.name in inputs_to_buffers:
             buffer_nodes.append(node)
         else:
             input_nodes.append(node)
@@ -442,12 +445,16 @@ def _get_new_signature(
     new_constants = {}
 
     non_persistent_buffers = set(old_signature.non_persistent_buffers)
+    # The signature builds these mappings on every access.
+    inputs_to_parameters = old_signature.inputs_to_parameters
+    inputs_to_buffers = old_signature.inputs_to_buffers
+    inputs_to_lifted_tensor_constants = old_signature.inputs_to_lifted_tensor_constants
 
     for node in gm.graph.nodes:
         is_tagged = node.meta.get("delegation_tag", None) == tag
         if node.op == "placeholder":
-            if node.name in old_signature.inputs_to_parameters and is_tagged:
-                parameter_name = old_signature.inputs_to_parameters[node.name]
+            if node.name in inputs_to_parameters and is_tagged:
+                parameter_name = inputs_to_parameters[node.name]
                 # add param to graph signature
                 input_specs.append(
                     InputSpec(
@@ -461,8 +468,8 @@ def _get_new_signature(
                 new_state_dict[parameter_name] = original_program.state_dict[
                     parameter_name
                 ]
-            elif node.name in old_signature.inputs_to_buffers and is_tagged:
-                buffer_name = old_signature.inputs_to_buffers[node.name]
+            elif node.name in inputs_to_buffers and is_tagged:
+                buffer_name = inputs_to_buffers[node.name]
                 persistent = buffer_name not in non_persistent_buffers
                 # add buffer to graph signature
                 input_specs.append(
@@ -481,13 +488,8 @@ def _get_new_signature(
                     ]
                 else:
                     new_constants[buffer_name] = original_program.constants[buffer_name]
-            elif (
-                node.name in old_signature.inputs_to_lifted_tensor_constants
-                and is_tagged
-            ):
-                constant_name = old_signature.inputs_to_lifted_tensor_constants[
-                    node.name
-                ]
+            elif node.name in inputs_to_lifted_tensor_constants and is_tagged:
+                constant_name = inputs_to_lifted_tensor_constants[node.name]
                 # add constant to graph signature
                 input_specs.append(
                     InputSpec(
@@ -575,6 +577,7 @@ def create_submodule_from_nodes(
     node_list: NodeList,
     tag: str,
     skip_legalize_graph: bool = False,
+    skip_topo_sort: bool = False,
 ) -> Tuple[torch.fx.GraphModule, torch.fx.Node]:
     """
     Modifies the given graph module in-place to separate out the given nodes
@@ -584,12 +587,16 @@ def create_submodule_from_nodes(
     Args:
         gm: The graph module that we want to partition
         node_list: A list of nodes that belong in the partition
+        skip_legalize_graph: If True, the graph is not topologically sorted
+            afterwards, and the call_module node is left at the end of it.
+        skip_topo_sort: If True, node_list is already topologically sorted, in
+            the order the nodes should be moved into the submodule.
 
     Returns:
         The submodule that has been partitioned, the call_module node in the
         toplevel graph module calling the submodule
     """
-    sorted_nodes = topo_sort(node_list)
+    sorted_nodes = node_list if skip_topo_sort else topo_sort(node_list)
 
     submodule_name = "fused_" + tag
     sub_gm, orig_inputs, orig_outputs = fuse_as_graphmodule(
@@ -600,16 +607,24 @@ def create_submodule_from_nodes(
 
     gm = insert_subgm(gm, sub_gm, orig_inputs, orig_outputs)
     submodule_node = None
-    for node in gm.graph.nodes:
-        if node.op == "call_module":
-            if node.target == submodule_name:
+    if skip_legalize_graph:
+        # insert_subgm adds the call_module node, followed by the getitem nodes of
+        # its outputs, at the end of the graph.
+        for node in reversed(gm.graph.nodes):
+            if node.op == "call_module" and node.target == submodule_name:
                 submodule_node = node
-            else:
-                raise RuntimeError(
-                    f"The submodule created with nodes {node_list} did not form \
-                    one fully contained subgraph. Check that these nodes form a \
-                    fully contained graph. Partitioned graph: {gm.graph}."
-                )
+                break
+    else:
+        for node in gm.graph.nodes:
+            if node.op == "call_module":
+                if node.target == submodule_name:
+                    submodule_node = node
+                else:
+                    raise RuntimeError(
+                        f"The submodule created with nodes {node_list} did not form \
+                        one fully contained subgraph. Check that these nodes form a \
+                        fully contained graph. Partitioned graph: {gm.graph}."
+                    )
 
     if len(orig_outputs) == 1 and isinstance(orig_outputs[0].meta["val"], FakeTensor):
         # If the original output is a single tensor, it has been
@@ -639,17 +654,17 @@ def create_submodule_from_nodes(
     if not skip_legalize_graph:
         legalize_graph(gm)
 
-    # Get the call_module node
-    submodule_node = None
-    for node in gm.graph.nodes:
-        if node.op == "call_module" and node.target == submodule_name:
-            submodule_node = node
-        elif node.op == "call_module":
-            raise RuntimeError(
-                f"The submodule created with nodes {node_list} did not form \
-                one fully contained subgraph. Check that these nodes form a \
-                fully contained graph. Partitioned graph: {gm.graph}."
-            )
+        # Get the call_module node, which legalize_graph replaced with a copy
+        submodule_node = None
+        for node in gm.graph.nodes:
+            if node.op == "call_module" and node.target == submodule_name:
+                submodule_node = node
+            elif node.op == "call_module":
+                raise RuntimeError(
+                    f"The submodule created with nodes {node_list} did not form \
+                    one fully contained subgraph. Check that these nodes form a \
+                    fully contained graph. Partitioned graph: {gm.graph}."
+                )
 
     assert (
         submodule_node is not None
@@ -6,9 +6,15 @@
 
 # pyre-strict
 
+import bisect
+import concurrent.futures
+import functools
 import itertools
 import logging
+import math
+import multiprocessing
 import operator
+import os
 import typing
 from collections import defaultdict
 from dataclasses import dataclass
@@ -148,18 +154,27 @@ class Verifier:
             )
         )
 
-        for lhs_spec_idx, lhs_spec in enumerate(all_specs):
-            for rhs_spec in all_specs[lhs_spec_idx + 1 :]:
-                # Check that both specs are consistent about whether mem_obj_id is defined
-                if (lhs_spec.mem_obj_id is None) != (rhs_spec.mem_obj_id is None):
-                    raise InternalError(
-                        "Specs do not agree on whether mem_obj_id is defined."
-                    )
+        # Check that all specs are consistent about whether mem_obj_id is defined
+        if len({spec.mem_obj_id is None for spec in all_specs}) > 1:
+            raise InternalError("Specs do not agree on whether mem_obj_id is defined.")
 
-                has_storage_overlap = Verifier.storage_overlap(lhs_spec, rhs_spec)
-                if not has_storage_overlap:
-                    continue
+        specs_by_mem_id: Dict[Optional[int], List[TensorSpec]] = defaultdict(list)
+        for spec in all_specs:
+            specs_by_mem_id[spec.mem_id].append(spec)
 
+        for specs in specs_by_mem_id.values():
+            if len(specs) < 2:
+                continue
+            for spec in specs:
+                internal_assert(
+                    spec.allocated_memory >= 0,
+                    f"{spec} should have non-zero allocated memory",
+                )
+                internal_assert(
+                    isinstance(spec.mem_offset, int) and spec.mem_offset >= 0,
+                    f"{spec} should have specified memory offset",
+                )
+            for lhs_spec, rhs_spec in self._storage_overlapping_pairs(specs):
                 if not allow_lifetime_and_storage_overlap and self.lifetime_overlap(
                     lhs_spec, rhs_spec
                 ):
@@ -178,6 +193,28 @@ class Verifier:
 
         return num_reuse_pairs
 
+    @classmethod
+    def _storage_overlapping_pairs(
+        cls, specs: List[TensorSpec]
+    ) -> Iterable[Tuple[TensorSpec, TensorSpec]]:
+        r"""
+        Yield every pair of the given specs, all in the same memory buffer,
+        whose storage overlaps. Sweeps over the specs in order of offset, so
+        that only pairs that do overlap are ever compared.
+        """
+        intervals = sorted(
+            (spec.mem_offset, spec.mem_offset + spec.allocated_memory, i)
+            for i, spec in enumerate(specs)
+            if spec.allocated_memory > 0
+        )
+        # Specs whose storage contains the current offset: (end, index).
+        active: List[Tuple[int, int]] = []
+        for start, end, i in intervals:
+            active = [(e, j) for e, j in active if e > start]
+            for _, j in active:
+                yield specs[j], specs[i]
+            active.append((end, i))
+
     def verify_graph_input_output(self) -> None:
         r"""
         alloc_graph_input / alloc_graph_output indicas if memory for graph
@@ -506,8 +543,10 @@ def pick_shared_obj(
     r"""
     Pick the available shared object with closest size to the tensor.
     If there are no available shared object left, create a new one.
+
+    This scans all of the shared objects; SharedObjectPool.pick() makes the
+    same choices, and the same updates to the shared objects, without doing so.
     """
-    # TODO: do better than linear scan
     picked = None
     for sobj in shared_objects:
         if spec.lifetime[0] > sobj.last_used_index:
@@ -526,6 +565,146 @@ def pick_shared_obj(
     return picked
 
 
+class SharedObjectPool:
+    r"""
+    The shared objects of one memory buffer, indexed so that picking a shared
+    object for a tensor does not need to scan all of them.
+
+    The shared objects are the leaves of a segment tree, in creation order.
+    Each node of the tree records the smallest last_used_index and the range
+    of sizes of the objects below it, so that searching for the first
+    available object in a range of sizes can skip every subtree that cannot
+    contain one.
+    """
+
+    def __init__(self) -> None:
+        self.objects: List[SharedObject] = []
+        # Number of leaves in the tree. Always a power of two.
+        self._capacity: int = 2
+        self._min_last_used: List[float] = [math.inf] * 4
+        self._min_size: List[float] = [math.inf] * 4
+        self._max_size: List[float] = [-math.inf] * 4
+
+    def _update(self, indices: List[int]) -> None:
+        r"""
+        Refresh the tree after the shared objects at the given indices were
+        added or modified.
+        """
+        if max(indices) >= self._capacity:
+            self._rebuild(2 * self._capacity)
+            return
+        min_last_used, min_size, max_size = (
+            self._min_last_used,
+            self._min_size,
+            self._max_size,
+        )
+        nodes = set()
+        for idx in indices:
+            sobj = self.objects[idx]
+            node = self._capacity + idx
+            min_last_used[node] = sobj.last_used_index
+            min_size[node] = sobj.size
+            max_size[node] = sobj.size
+            nodes.add(node // 2)
+        # Update the tree level by level, stopping along each path once a node
+        # is unchanged.
+        while nodes:
+            parents = set()
+            for node in nodes:
+                left, right = 2 * node, 2 * node + 1
+                a, b = min_last_used[left], min_last_used[right]
+                last_used = a if a < b else b
+                a, b = min_size[left], min_size[right]
+                lo = a if a < b else b
+                a, b = max_size[left], max_size[right]
+                hi = a if a > b else b
+                if (
+                    last_used == min_last_used[node]
+                    and lo == min_size[node]
+                    and hi == max_size[node]
+                ):
+                    continue
+                min_last_used[node], min_size[node], max_size[node] = (
+                    last_used,
+                    lo,
+                    hi,
+                )
+                if node > 1:
+                    parents.add(node // 2)
+            nodes = parents
+
+    def _rebuild(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._min_last_used = [math.inf] * (2 * capacity)
+        self._min_size = [math.inf] * (2 * capacity)
+        self._max_size = [-math.inf] * (2 * capacity)
+        for idx, sobj in enumerate(self.objects):
+            self._min_last_used[capacity + idx] = sobj.last_used_index
+            self._min_size[capacity + idx] = sobj.size
+            self._max_size[capacity + idx] = sobj.size
+        for node in range(capacity - 1, 0, -1):
+            left, right = 2 * node, 2 * node + 1
+            self._min_last_used[node] = min(
+                self._min_last_used[left], self._min_last_used[right]
+            )
+            self._min_size[node] = min(self._min_size[left], self._min_size[right])
+            self._max_size[node] = max(self._max_size[left], self._max_size[right])
+
+    def pick(self, spec: TensorSpec) -> SharedObject:
+        r"""
+        Pick the available shared object with closest size to the tensor, or
+        create a new one, exactly like pick_shared_obj().
+
+        pick_shared_obj() claims every object that is the closest in size seen
+        so far during its scan, not only the one it returns. Those are found by
+        a single left-to-right walk of the tree: each claimed object narrows
+        the range of sizes that the next one must be strictly inside of, taking
+        into account that the claimed object has already grown to fit the
+        tensor, and subtrees without an available object in that range are
+        skipped.
+        """
+        size = spec.allocated_memory
+        start, end = spec.lifetime
+        capacity = self._capacity
+        min_last_used, node_min_size, node_max_size = (
+            self._min_last_used,
+            self._min_size,
+            self._max_size,
+        )
+        lo, hi = -math.inf, math.inf
+        claimed = []
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            # Descend to the leftmost leaf of this subtree that may match,
+            # deferring the right subtrees.
+            while (
+                min_last_used[node] < start
+                and node_max_size[node] > lo
+                and node_min_size[node] < hi
+            ):
+                if node < capacity:
+                    stack.append(2 * node + 1)
+                    node *= 2
+                    continue
+                picked = self.objects[node - capacity]
+                picked.last_used_index = end
+                picked.size = max(picked.size, size)
+                claimed.append(picked.idx)
+                dif = picked.size - size
+                if dif == 0:
+                    stack.clear()
+                lo, hi = size - dif, size + dif
+                break
+
+        if not claimed:
+            picked = SharedObject(len(self.objects), -1, size, end)
+            self.objects.append(picked)
+            claimed.append(picked.idx)
+        self._update(claimed)
+        return self.objects[claimed[-1]]
+
+
 def get_node_tensor_specs(
     node: torch.fx.Node,
 ) -> Union[List[TensorSpec], Tuple[TensorSpec]]:
@@ -556,7 +735,7 @@ def greedy(
     alloc_graph_output: bool = True,
 ) -> List[int]:
     spec2obj = {}
-    shared_objects = defaultdict(list)
+    shared_objects = defaultdict(SharedObjectPool)
     # Don't do assertion in collect_specs_from_nodes if we have already encountered
     # and ignored some to_out_variant errors.
     do_assertion = not getattr(graph_module, "encounter_to_out_var_failure", False)
@@ -573,7 +752,7 @@ def greedy(
         if spec.mem_id is None:
             spec.mem_id = 1
         spec.realign(alignment)
-        spec2obj[spec] = pick_shared_obj(shared_objects[spec.mem_id], spec)
+        spec2obj[spec] = shared_objects[spec.mem_id].pick(spec)
 
     if len(shared_objects) == 0:
         # Cannot find any tensor in the graph that needs to be allocated.
@@ -587,7 +766,7 @@ def greedy(
                 if len(bufsizes) > mem_id:
                     input_total_size = bufsizes[mem_id]
             total_sizes[mem_id] = materialize_buffer(
-                shared_objects[mem_id], input_total_size
+                shared_objects[mem_id].objects, input_total_size
             )
 
         # Since we now know the number of shared objects we need and the size of
@@ -642,6 +821,434 @@ def naive(
     return bufsizes
 
 
+class _LifetimeIndex:
+    r"""
+    Tensors that have been placed in a memory buffer, indexed so that the ones
+    whose lifetimes overlap a given lifetime can be found without scanning all
+    of them.
+
+    Tensors are grouped by the order of magnitude of their lifetime length,
+    and each group is sorted by lifetime start. A tensor whose lifetime is
+    shorter than 2^k nodes can only overlap [start, end] if it starts in
+    (start - 2^k, end], so each group only needs a binary search and a scan
+    of that range.
+    """
+
+    def __init__(self) -> None:
+        # Group -> (sorted lifetime starts, specs in the same order).
+        self._groups: Dict[int, Tuple[List[int], List[TensorSpec]]] = {}
+
+    def add(self, spec: TensorSpec) -> None:
+        start, end = spec.lifetime
+        starts, specs = self._groups.setdefault(
+            (end - start + 1).bit_length(), ([], [])
+        )
+        pos = bisect.bisect_right(starts, start)
+        starts.insert(pos, start)
+        specs.insert(pos, spec)
+
+    def overlapping(self, lifetime: List[int]) -> Iterable[TensorSpec]:
+        start, end = lifetime
+        for group, (starts, specs) in self._groups.items():
+            lo = bisect.bisect_left(starts, start - (1 << group))
+            hi = bisect.bisect_right(starts, end)
+            for spec in specs[lo:hi]:
+                if spec.lifetime[1] >= start:
+                    yield spec
+
+
+def _best_fit_offset(index: _LifetimeIndex, spec: TensorSpec, base_offset: int) -> int:
+    r"""
+    Return the lowest offset of the smallest gap, at or above base_offset, that
+    can hold the tensor without overlapping the storage of any placed tensor
+    whose lifetime overlaps the tensor's. If there is no such gap, return the
+    end of the highest of those tensors.
+    """
+    size = spec.allocated_memory
+    best_offset = None
+    best_gap = math.inf
+    prev_end = base_offset
+    for offset, end in sorted(
+        (other.mem_offset, other.mem_offset + other.allocated_memory)
+        for other in index.overlapping(spec.lifetime)
+    ):
+        gap = offset - prev_end
+        if size <= gap < best_gap:
+            best_offset, best_gap = prev_end, gap
+        prev_end = max(prev_end, end)
+    return prev_end if best_offset is None else best_offset
+
+
+# Orders in which best_fit can place tensors. Ties are broken by lifetime
+# start, then graph order.
+BEST_FIT_ORDERS: Dict[str, Callable[[TensorSpec], Tuple[int, ...]]] = {
+    # Largest tensors first.
+    "size": lambda spec: (-spec.allocated_memory, spec.lifetime[0]),
+    # Longest lived tensors first.
+    "lifetime": lambda spec: (
+        spec.lifetime[0] - spec.lifetime[1],
+        -spec.allocated_memory,
+        spec.lifetime[0],
+    ),
+    # Tensors with the largest size * lifetime first.
+    "area": lambda spec: (
+        -spec.allocated_memory * (spec.lifetime[1] - spec.lifetime[0] + 1),
+        spec.lifetime[0],
+    ),
+}
+
+
+@register_algo
+def best_fit(
+    graph_module: torch.fx.GraphModule,
+    alignment: int,
+    graph_signature: Optional[ExportGraphSignature] = None,
+    alloc_graph_input: bool = True,
+    alloc_graph_output: bool = True,
+    order: str = "size",
+) -> List[int]:
+    r"""
+    Place each tensor at its own offset, largest tensors first, in the
+    smallest gap left between the tensors already placed whose lifetimes
+    overlap its own. `order` selects a different placement order from
+    BEST_FIT_ORDERS.
+
+    Unlike greedy, tensors are not grouped into shared objects, so a tensor
+    can reuse any range of a buffer that is free for its whole lifetime, even
+    if it spans the storage of several earlier tensors. Since storage is not
+    shared as whole objects, mem_obj_id is left unset, as with naive.
+    """
+    if order not in BEST_FIT_ORDERS:
+        raise ExportError(
+            ExportErrorType.NOT_SUPPORTED,
+            f"Unknown best_fit order '{order}', expected one of {list(BEST_FIT_ORDERS)}",
+        )
+    do_assertion = not getattr(graph_module, "encounter_to_out_var_failure", False)
+    specs_by_mem_id: Dict[int, List[TensorSpec]] = defaultdict(list)
+    for spec in collect_specs_from_nodes(
+        graph_module.graph.nodes,
+        graph_signature,
+        do_assertion=do_assertion,
+        ignore_graph_input=not alloc_graph_input,
+        ignore_graph_output=not alloc_graph_output,
+    ):
+        if spec.mem_id is None:
+            spec.mem_id = 1
+        spec.realign(alignment)
+        specs_by_mem_id[spec.mem_id].append(spec)
+
+    bufsizes = list(getattr(graph_module, "input_mem_buffer_sizes", None) or [0, 0])
+    for mem_id, specs in specs_by_mem_id.items():
+        if mem_id >= len(bufsizes):
+            bufsizes.extend([0] * (mem_id - len(bufsizes) + 1))
+        base_offset = bufsizes[mem_id]
+        index = _LifetimeIndex()
+        # sorted() is stable, so the result only depends on the graph.
+        for spec in sorted(specs, key=BEST_FIT_ORDERS[order]):
+            spec.mem_offset = _best_fit_offset(index, spec, base_offset)
+            bufsizes[mem_id] = max(
+                bufsizes[mem_id], spec.mem_offset + spec.allocated_memory
+            )
+            if spec.allocated_memory > 0:
+                index.add(spec)
+
+    logging.debug(f"best_fit algorithm returns bufsizes: {bufsizes}")
+    return bufsizes
+
+
+# The graph that an AutoWorkerPool was created for, and its graph signature,
+# in the worker processes of the pool. Set once by the pool initializer.
+_auto_worker_state: Optional[
+    Tuple[torch.fx.GraphModule, Optional[ExportGraphSignature]]
+] = None
+
+
+def _auto_candidates() -> List[Tuple[str, Callable[..., List[int]]]]:
+    r"""
+    The plans that auto() compares: every registered algorithm, and every
+    order of best_fit.
+    """
+    candidates = []
+    for name, algo in REGISTERED_ALGOS.items():
+        if algo is auto:
+            continue
+        if algo is best_fit:
+            for order in BEST_FIT_ORDERS:
+                candidates.append(
+                    (f"best_fit[order={order}]", functools.partial(algo, order=order))
+                )
+        else:
+            candidates.append((name, algo))
+    return candidates
+
+
+def _plan_specs(graph_module: torch.fx.GraphModule) -> List[TensorSpec]:
+    r"""
+    The tensor specs of graph_module, in the order of its nodes.
+    """
+    specs = {}
+    for node in graph_module.graph.nodes:
+        for spec in get_node_tensor_specs(node):
+            if isinstance(spec, TensorSpec):
+                specs.setdefault(id(spec), spec)
+    return list(specs.values())
+
+
+def _plan_state(specs: List[TensorSpec]) -> List[Tuple[Any, ...]]:
+    r"""
+    Snapshot the fields of specs that memory planning reads or sets.
+    """
+    return [
+        (
+            spec.mem_id,
+            spec.mem_offset,
+            spec.mem_obj_id,
+            spec.alignment,
+            list(spec.lifetime),
+        )
+        for spec in specs
+    ]
+
+
+def _restore_plan_state(specs: List[TensorSpec], state: List[Tuple[Any, ...]]) -> None:
+    for spec, (mem_id, mem_offset, mem_obj_id, alignment, lifetime) in zip(
+        specs, state
+    ):
+        spec.mem_id = mem_id
+        spec.mem_offset = mem_offset
+        spec.mem_obj_id = mem_obj_id
+        spec.alignment = alignment
+        spec.lifetime = list(lifetime)
+
+
+def _evaluate_candidate(
+    name: str,
+    algo: Callable[..., List[int]],
+    graph_module: torch.fx.GraphModule,
+    alignment: int,
+    graph_signature: Optional[ExportGraphSignature],
+    alloc_graph_input: bool,
+    alloc_graph_output: bool,
+) -> Optional[List[int]]:
+    r"""
+    Run candidate algo of auto() on graph_module, and return its buffer
+    sizes, or None if the Verifier rejects the plan. Modifies the specs of
+    the graph.
+    """
+    try:
+        bufsizes = algo(
+            graph_module,
+            alignment,
+            graph_signature,
+            alloc_graph_input,
+            alloc_graph_output,
+        )
+        Verifier(
+            graph_module, alloc_graph_input, alloc_graph_output, graph_signature
+        ).verify_storage_reuse()
+    except (ExportError, InternalError) as e:
+        logging.warning(f"auto memory planning: rejecting {name}: {e}")
+        return None
+    return bufsizes
+
+
+def _init_auto_worker(
+    graph_module: torch.fx.GraphModule,
+    graph_signature: Optional[ExportGraphSignature],
+) -> None:
+    global _auto_worker_state
+    _auto_worker_state = (graph_module, graph_signature)
+
+
+def _evaluate_candidate_in_worker(
+    path: str,
+    index: int,
+    alignment: int,
+    alloc_graph_input: bool,
+    alloc_graph_output: bool,
+    input_mem_buffer_sizes: Optional[List[int]],
+    state: List[Tuple[Any, ...]],
+) -> Optional[List[int]]:
+    r"""
+    Run candidate `index` of auto() on the submodule at `path` of the graph
+    of the pool, after restoring the state its specs have in the parent.
+    """
+    assert _auto_worker_state is not None
+    root, graph_signature = _auto_worker_state
+    graph_module = root.get_submodule(path)
+    _restore_plan_state(_plan_specs(graph_module), state)
+    graph_module.input_mem_buffer_sizes = input_mem_buffer_sizes
+    name, algo = _auto_candidates()[index]
+    return _evaluate_candidate(
+        name,
+        algo,
+        graph_module,
+        alignment,
+        graph_signature,
+        alloc_graph_input,
+        alloc_graph_output,
+    )
+
+
+class AutoWorkerPool:
+    r"""
+    The processes that auto() evaluates its candidates in, for graph_module
+    and the submodules of its control flow. MemoryPlanningPass creates one
+    pool per run, so the workers are forked once rather than for every
+    submodule that apply_algo() plans.
+
+    Workers are forked from graph_module, and each candidate carries the
+    path of the (sub)graph it plans and the lifetimes and planning state of
+    its specs, since the parent updates these after the fork. Where fork is
+    not available, or with a single CPU, candidates run one after the other
+    in this process.
+    """
+
+    def __init__(
+        self,
+        graph_module: torch.fx.GraphModule,
+        graph_signature: Optional[ExportGraphSignature] = None,
+    ) -> None:
+        self.graph_module = graph_module
+        self.candidates: List[Tuple[str, Callable[..., List[int]]]] = _auto_candidates()
+        self.executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        num_workers = min(len(self.candidates), os.cpu_count() or 1)
+        if num_workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                num_workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_auto_worker,
+                initargs=(graph_module, graph_signature),
+            )
+
+    def __enter__(self) -> "AutoWorkerPool":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def evaluate(
+        self,
+        graph_module: torch.fx.GraphModule,
+        alignment: int,
+        graph_signature: Optional[ExportGraphSignature] = None,
+        alloc_graph_input: bool = True,
+        alloc_graph_output: bool = True,
+    ) -> List[Optional[List[int]]]:
+        r"""
+        Run every candidate on graph_module, which is the graph of the pool
+        or one of its submodules, and return their buffer sizes, or None for
+        the candidates that the Verifier rejects. Leaves the specs of the
+        graph as they were.
+        """
+        specs = _plan_specs(graph_module)
+        state = _plan_state(specs)
+        input_mem_buffer_sizes = getattr(graph_module, "input_mem_buffer_sizes", None)
+        if self.executor is None:
+            results = []
+            for name, algo in self.candidates:
+                if input_mem_buffer_sizes is not None:
+                    # naive extends the buffer sizes of the outer graph in place.
+                    graph_module.input_mem_buffer_sizes = list(input_mem_buffer_sizes)
+                results.append(
+                    _evaluate_candidate(
+                        name,
+                        algo,
+                        graph_module,
+                        alignment,
+                        graph_signature,
+                        alloc_graph_input,
+                        alloc_graph_output,
+                    )
+                )
+                _restore_plan_state(specs, state)
+            if input_mem_buffer_sizes is not None:
+                graph_module.input_mem_buffer_sizes = input_mem_buffer_sizes
+            return results
+
+        paths = {id(module): path for path, module in self.graph_module.named_modules()}
+        internal_assert(
+            id(graph_module) in paths,
+            "auto memory planning: the graph is not a submodule of the graph of the pool",
+        )
+        futures = [
+            self.executor.submit(
+                _evaluate_candidate_in_worker,
+                paths[id(graph_module)],
+                index,
+                alignment,
+                alloc_graph_input,
+                alloc_graph_output,
+                input_mem_buffer_sizes,
+                state,
+            )
+            for index in range(len(self.candidates))
+        ]
+        return [future.result() for future in futures]
+
+
+@register_algo
+def auto(
+    graph_module: torch.fx.GraphModule,
+    alignment: int,
+    graph_signature: Optional[ExportGraphSignature] = None,
+    alloc_graph_input: bool = True,
+    alloc_graph_output: bool = True,
+    pool: Optional[AutoWorkerPool] = None,
+) -> List[int]:
+    r"""
+    Try every other registered algorithm, and every order of best_fit, and
+    keep the plan with the smallest total buffer size that passes
+    Verifier.verify_storage_reuse. Ties go to the candidate listed first.
+
+    Candidates run in the worker processes of pool, which MemoryPlanningPass
+    shares between the graph and its submodules. Without a pool, one is
+    created for this graph. The name of the winner and the buffer sizes of
+    every candidate are recorded in graph_module.meta, under
+    "memory_planning_algo" and "memory_planning_candidates".
+
+    alloc_graph_input and alloc_graph_output are not varied: they decide
+    whether the caller provides the memory of the graph inputs and outputs
+    at runtime, so they are part of the contract of the program rather than
+    a planning choice.
+    """
+    if pool is None:
+        with AutoWorkerPool(graph_module, graph_signature) as pool:
+            return auto(
+                graph_module,
+                alignment,
+                graph_signature,
+                alloc_graph_input,
+                alloc_graph_output,
+                pool,
+            )
+
+    candidates = pool.candidates
+    results = pool.evaluate(
+        graph_module, alignment, graph_signature, alloc_graph_input, alloc_graph_output
+    )
+    valid = [(sum(r), i) for i, r in enumerate(results) if r is not None]
+    if not valid:
+        raise InternalError("auto memory planning: no candidate produced a valid plan")
+    _, winner = min(valid)
+    name, algo = candidates[winner]
+    graph_module.meta["memory_planning_algo"] = name
+    graph_module.meta["memory_planning_candidates"] = {
+        candidates[i][0]: r for i, r in enumerate(results)
+    }
+    logging.info(f"auto memory planning picked {name}, with bufsizes {results[winner]}")
+    # Candidates ran on copies of the graph, or had their results undone, so
+    # plan the graph for real with the winner.
+    return algo(
+        graph_module, alignment, graph_signature, alloc_graph_input, alloc_graph_output
+    )
+
+
 def get_algo(algo_name: str) -> Callable[..., List[int]]:
     if algo_name not in REGISTERED_ALGOS:
         raise ExportError(
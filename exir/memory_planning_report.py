@@ -0,0 +1,351 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+Summarizes the outcome of memory planning: how many bytes are live at each
+instruction of each method, how far the planned buffers are from the smallest
+possible size, and which tensors are responsible for the peak.
+"""
+
+import csv
+import itertools
+import json
+import operator
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, TextIO, Tuple
+
+import torch
+from executorch.exir import memory
+from executorch.exir.memory_planning import (
+    collect_specs_from_nodes,
+    filter_nodes,
+    get_node_tensor_specs,
+)
+from executorch.exir.tensor import TensorSpec
+from torch.utils._pytree import tree_flatten
+
+
+@dataclass
+class TensorAllocation:
+    """A planned tensor."""
+
+    # Name of the node that produces the tensor, with the output index
+    # appended for nodes with several outputs.
+    name: str
+    mem_id: int
+    mem_offset: int
+    # Allocated bytes, including alignment padding.
+    size: int
+    # First and last instruction index that the tensor is alive at, inclusive.
+    lifetime: Tuple[int, int]
+
+
+@dataclass
+class MemoryPoolReport:
+    """Memory usage of one memory buffer (mem_id) of one method."""
+
+    mem_id: int
+    # Size of the planned buffer in bytes.
+    buffer_size: int
+    # Bytes of planned tensors that are alive at each instruction index.
+    live_bytes: List[int]
+    # Tensors planned in this buffer, in graph order.
+    allocations: List[TensorAllocation]
+    # The largest tensors alive at peak_index, largest first.
+    top_contributors: List[TensorAllocation]
+
+    @property
+    def peak_live_bytes(self) -> int:
+        """The most bytes alive at once. No plan can use a smaller buffer."""
+        return max(self.live_bytes, default=0)
+
+    @property
+    def peak_index(self) -> int:
+        """The first instruction index at which peak_live_bytes are alive."""
+        return self.live_bytes.index(self.peak_live_bytes) if self.live_bytes else 0
+
+    @property
+    def fragmentation(self) -> float:
+        """The fraction of the buffer that is never needed, even at the peak."""
+        if self.buffer_size == 0:
+            return 0.0
+        return 1 - self.peak_live_bytes / self.buffer_size
+
+
+@dataclass
+class MethodMemoryReport:
+    """Memory usage of one method, by mem_id."""
+
+    name: str
+    pools: Dict[int, MemoryPoolReport] = field(default_factory=dict)
+
+
+@dataclass
+class MemoryPlanningReport:
+    """Memory usage of every method of a program, after memory planning."""
+
+    methods: Dict[str, MethodMemoryReport] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        lines = []
+        for method in self.methods.values():
+            for pool in method.pools.values():
+                lines.append(
+                    f"{method.name} mem_id={pool.mem_id}: "
+                    + f"buffer {pool.buffer_size} bytes, "
+                    + f"peak {pool.peak_live_bytes} bytes live at instruction "
+                    + f"{pool.peak_index}, "
+                    + f"fragmentation {pool.fragmentation:.1%}"
+                )
+                for alloc in pool.top_contributors:
+                    lines.append(
+                        f"    {alloc.name}: {alloc.size} bytes at offset "
+                        + f"{alloc.mem_offset}, live {alloc.lifetime}"
+                    )
+        return "\n".join(lines)
+
+    def write_csv(self, out: TextIO) -> None:
+        """Writes the live bytes of every buffer at every instruction as CSV."""
+        writer = csv.writer(out)
+        writer.writerow(["method", "mem_id", "instruction_index", "live_bytes"])
+        for method in self.methods.values():
+            for pool in method.pools.values():
+                for index, live in enumerate(pool.live_bytes):
+                    writer.writerow([method.name, pool.mem_id, index, live])
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Returns the report in the Chrome trace event format.
+
+        Each method is a process and each buffer a thread of it. Instruction
+        indices are used as timestamps: every tensor is a slice spanning its lifetime,
+        and a counter tracks the live bytes of each buffer. Load the result in
+        chrome://tracing or Perfetto.
+        """
+        events: List[Dict[str, Any]] = []
+        for pid, method in enumerate(self.methods.values()):
+            events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": method.name},
+                }
+            )
+            for pool in method.pools.values():
+                for alloc in pool.allocations:
+                    start, end = alloc.lifetime
+                    events.append(
+                        {
+                            "name": alloc.name,
+                            "ph": "X",
+                            "pid": pid,
+                            "tid": pool.mem_id,
+                            "ts": start,
+                            "dur": end - start + 1,
+                            "args": {"offset": alloc.mem_offset, "size": alloc.size},
+                        }
+                    )
+                for index, live in enumerate(pool.live_bytes):
+                    events.append(
+                        {
+                            "name": f"mem_id {pool.mem_id} live bytes",
+                            "ph": "C",
+                            "pid": pid,
+                            "ts": index,
+                            "args": {"bytes": live},
+                        }
+                    )
+        return {"traceEvents": events}
+
+    def write_chrome_trace(self, out: TextIO) -> None:
+        json.dump(self.to_chrome_trace(), out)
+
+
+def _num_outputs(graph_module: torch.fx.GraphModule) -> int:
+    output = next(iter(reversed(graph_module.graph.nodes)))
+    return len(tree_flatten(output.args[0])[0])
+
+
+def _num_instructions(graph_module: torch.fx.GraphModule) -> int:
+    return sum(_instruction_counts(graph_module))
+
+
+def _instruction_counts(graph_module: torch.fx.GraphModule) -> List[int]:
+    """
+    The number of instructions that the emitter adds to the chain of the
+    method for each node of graph_module, in graph order.
+
+    Placeholders, getitem and memory.alloc nodes only emit values. cond emits
+    a jump before each branch, and each branch moves its outputs to those of
+    cond. map emits a loop of 7 instructions around its body.
+    """
+    counts = []
+    for node in graph_module.graph.nodes:
+        if node.op != "call_function" or node.target in (
+            operator.getitem,
+            memory.alloc,
+        ):
+            counts.append(0)
+        elif node.target is torch.ops.higher_order.cond:
+            count = 2
+            for branch in node.args[1:3]:
+                submodule = getattr(graph_module, branch.target)
+                count += _num_instructions(submodule) + _num_outputs(submodule)
+            counts.append(count)
+        elif node.target is torch.ops.higher_order.map_impl:
+            submodule = getattr(graph_module, node.args[0].target)
+            counts.append(7 + _num_instructions(submodule))
+        else:
+            counts.append(1)
+    return counts
+
+
+def _node_lifetimes(
+    graph_module: torch.fx.GraphModule,
+) -> Dict[int, Tuple[int, int]]:
+    """
+    The first and last node index that use each tensor, by the id of its spec.
+
+    This recomputes the lifetimes that memory planning used, since planning
+    inserts memory.free nodes after it sets them.
+    """
+    lifetimes: Dict[int, Tuple[int, int]] = {}
+    for node_idx, node in enumerate(graph_module.graph.nodes):
+        for spec in collect_specs_from_nodes(
+            filter_nodes(itertools.chain([node], node.args, node.kwargs.values())),
+            ignore_graph_input=False,
+            ignore_const=False,
+            ignore_out_var_node=False,
+            dedup=False,
+            do_assertion=False,
+            ignore_dynamic_unbound_tensor=False,
+        ):
+            start, _ = lifetimes.get(id(spec), (node_idx, node_idx))
+            lifetimes[id(spec)] = (start, node_idx)
+    return lifetimes
+
+
+def _planned_allocations(
+    graph_module: torch.fx.GraphModule,
+) -> Tuple[List[TensorAllocation], int]:
+    """
+    The tensors planned in graph_module, with their lifetimes in instruction
+    indices, and the number of instructions of the method.
+    """
+    counts = _instruction_counts(graph_module)
+    # The index of the first instruction of each node, or of the next
+    # instruction for the nodes that emit none.
+    starts = [0, *itertools.accumulate(counts)]
+    num_instructions = starts[-1]
+    lifetimes = _node_lifetimes(graph_module)
+
+    seen = set()
+    allocations = []
+    for node in graph_module.graph.nodes:
+        specs = get_node_tensor_specs(node)
+        for i, spec in enumerate(specs):
+            if (
+                not isinstance(spec, TensorSpec)
+                or id(spec) in seen
+                or spec.const
+                or spec.mem_id is None
+                or spec.mem_offset is None
+                or id(spec) not in lifetimes
+            ):
+                continue
+            seen.add(id(spec))
+            first_node, last_node = lifetimes[id(spec)]
+            # A tensor that no instruction runs between its first and last use,
+            # like an input that is returned as is, is counted at the next one.
+            start = min(starts[first_node], max(num_instructions - 1, 0))
+            end = max(starts[last_node + 1] - 1, start)
+            allocations.append(
+                TensorAllocation(
+                    name=node.name if len(specs) == 1 else f"{node.name}[{i}]",
+                    mem_id=spec.mem_id,
+                    mem_offset=spec.mem_offset,
+                    size=spec.allocated_memory,
+                    lifetime=(start, end),
+                )
+            )
+    return allocations, num_instructions
+
+
+def _pool_report(
+    mem_id: int,
+    allocations: List[TensorAllocation],
+    num_instructions: int,
+    buffer_size: Optional[int],
+    top_k: int,
+) -> MemoryPoolReport:
+    # Accumulate the changes in live bytes at each instruction index.
+    # A method without instructions still counts its tensors at index 0.
+    deltas = [0] * (max(num_instructions, 1) + 1)
+    for alloc in allocations:
+        start, end = alloc.lifetime
+        deltas[start] += alloc.size
+        deltas[end + 1] -= alloc.size
+    live_bytes = []
+    live = 0
+    for delta in deltas[:num_instructions]:
+        live += delta
+        live_bytes.append(live)
+
+    if buffer_size is None:
+        buffer_size = max((a.mem_offset + a.size for a in allocations), default=0)
+    report = MemoryPoolReport(
+        mem_id=mem_id,
+        buffer_size=buffer_size,
+        live_bytes=live_bytes,
+        allocations=allocations,
+        top_contributors=[],
+    )
+    peak = report.peak_index
+    report.top_contributors = sorted(
+        (a for a in allocations if a.lifetime[0] <= peak <= a.lifetime[1]),
+        key=lambda a: -a.size,
+    )[:top_k]
+    return report
+
+
+def get_memory_planning_report(
+    graph_modules: Mapping[str, torch.fx.GraphModule], top_k: int = 10
+) -> MemoryPlanningReport:
+    """Builds a report of the memory planned for each method.
+
+    Args:
+        graph_modules: The graph module of each method, after memory planning.
+            For an ExecutorchProgramManager `prog`, use
+            `{m: prog.exported_program(m).graph_module for m in prog.methods}`.
+        top_k: The number of tensors to list as the largest contributors at
+            the peak of each buffer.
+
+    Returns:
+        The report, indexed by the instructions that the method will run, in
+        the order the emitter adds them to its chain. Only tensors planned in
+        the top-level graph of each method are counted; tensors of control flow
+        submodules are not, though the instructions of the submodules are.
+    """
+    report = MemoryPlanningReport()
+    for name, graph_module in graph_modules.items():
+        allocations, num_instructions = _planned_allocations(graph_module)
+        by_mem_id: Dict[int, List[TensorAllocation]] = {}
+        for alloc in allocations:
+            by_mem_id.setdefault(alloc.mem_id, []).append(alloc)
+        bufsizes = graph_module.meta.get("non_const_buffer_sizes")
+        method = MethodMemoryReport(name)
+        for mem_id in sorted(by_mem_id):
+            method.pools[mem_id] = _pool_report(
+                mem_id,
+                by_mem_id[mem_id],
+                num_instructions,
+                bufsizes[mem_id] if bufsizes and mem_id < len(bufsizes) else None,
+                top_k,
+            )
+        report.methods[name] = method
+    return report
@@ -4,7 +4,10 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import contextlib
+import functools
 import logging
+import os
 import warnings
 from typing import Optional
 
@@ -14,10 +17,16 @@ from executorch.exir.memory import alloc
 from executorch.exir.memory_planning import (
     _is_out_var_node,
     apply_algo,
+    auto,
+    AutoWorkerPool,
     get_algo,
     get_node_tensor_specs,
     Verifier,
 )
+from executorch.exir.memory_planning_report import (
+    get_memory_planning_report,
+    MemoryPlanningReport,
+)
 from executorch.exir.operator.convert import get_out_args_from_opoverload
 from executorch.exir.pass_base import PassBase, PassResult
 from executorch.exir.tensor import ALIGNMENT
@@ -32,18 +41,27 @@ class MemoryPlanningPass(PassBase):
         alloc_graph_input: bool = True,
         alloc_graph_output: bool = True,
         alignment: int = ALIGNMENT,
+        report_path: Optional[str] = None,
     ) -> None:
         r"""
         alloc_graph_input/alloc_graph_output will have 4 different combinations
         to control if the memory planning algorithm need allocate memory for
         the graph input/output. The default behavior is the algorithm will allocate
         memory for both graph input and output.
+
+        If report_path is given, a MemoryPlanningReport of every graph planned
+        by this pass is written to it after each run: as a Chrome trace if it
+        ends with .json, as CSV if it ends with .csv, and as text otherwise.
+        The pass does not know the names of the methods it plans, so they are
+        reported as method_0, method_1, ... in the order they were planned.
         """
         self.memory_planning_algo = memory_planning_algo
         self.allow_lifetime_and_storage_overlap = allow_lifetime_and_storage_overlap
         self.alloc_graph_input = alloc_graph_input
         self.alloc_graph_output = alloc_graph_output
         self.alignment = alignment
+        self.report_path = report_path
+        self.report = MemoryPlanningReport()
 
     def _set_alloc_node_spec(self, graph_module: torch.fx.GraphModule) -> None:
         """
@@ -102,14 +120,22 @@ class MemoryPlanningPass(PassBase):
         # customized fields. Using the graph_module object to convey information across
         # passes/stages is quite natural and avoid yet another 'context' data structure
         # to do the job.
-        _ = apply_algo(
-            algo,
-            graph_module,
-            self.alignment,
-            graph_signature,
-            self.alloc_graph_input,
-            self.alloc_graph_output,
-        )
+        with contextlib.ExitStack() as stack:
+            if algo is auto:
+                # Fork the workers of auto once for the graph and all of its
+                # submodules.
+                pool = stack.enter_context(
+                    AutoWorkerPool(graph_module, graph_signature)
+                )
+                algo = functools.partial(auto, pool=pool)
+            _ = apply_algo(
+                algo,
+                graph_module,
+                self.alignment,
+                graph_signature,
+                self.alloc_graph_input,
+                self.alloc_graph_output,
+            )
 
         # TODO: make the verifier do the work recursively to handle
         # control flow
@@ -128,4 +154,22 @@ class MemoryPlanningPass(PassBase):
                 f"The {self.memory_planning_algo} algorithm reuses storage for {num_reuse_pairs} pair of tensors"
             )
         verifier.verify_graph_input_output()
+        if self.report_path is not None:
+            self._write_report(graph_module, self.report_path)
         return PassResult(graph_module, True)
+
+    def _write_report(
+        self, graph_module: torch.fx.GraphModule, report_path: str
+    ) -> None:
+        name = f"method_{len(self.report.methods)}"
+        self.report.methods.update(
+            get_memory_planning_report({name: graph_module}).methods
+        )
+        extension = os.path.splitext(report_path)[1]
+        with open(report_path, "w") as f:
+            if extension == ".json":
+                self.report.write_chrome_trace(f)
+            elif extension == ".csv":
+                self.report.write_csv(f)
+            else:
+                f.write(str(self.report))
@@ -0,0 +1,119 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""Benchmarks shared object selection in greedy memory planning.
+
+Generates synthetic tensor lifetimes resembling those of large sequential
+graphs, then times SharedObjectPool.pick() against the linear scan of
+pick_shared_obj(), checking that both make exactly the same assignments.
+
+    python -m executorch.exir.tests.benchmark_memory_planning --num_tensors 1000 10000 100000
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List, Tuple
+
+import torch
+from executorch.exir.memory_planning import (
+    pick_shared_obj,
+    SharedObject,
+    SharedObjectPool,
+)
+from executorch.exir.tensor import TensorSpec
+
+
+def make_specs(num_tensors: int, seed: int = 0) -> List[TensorSpec]:
+    """Returns specs with lifetimes and sizes like those of a long graph.
+
+    Most tensors are consumed by the next few nodes, while a few (residuals,
+    caches) stay alive for a large part of the graph. Sizes come from a small
+    set of shapes, plus some one-off sizes.
+    """
+    rng = random.Random(seed)
+    common_sizes = [rng.randrange(1, 1 << 16) for _ in range(32)]
+    specs = []
+    for i in range(num_tensors):
+        numel = (
+            rng.choice(common_sizes)
+            if rng.random() < 0.9
+            else rng.randrange(1, 1 << 20)
+        )
+        if rng.random() < 0.02:
+            length = rng.randrange(num_tensors // 10 + 1)
+        else:
+            length = int(rng.expovariate(1 / 3))
+        spec = TensorSpec(torch.float32, torch.Size([numel]))
+        spec.lifetime = [i, i + length]
+        spec.realign(16)
+        specs.append(spec)
+    return specs
+
+
+# The shared object picked for each tensor, and the final (size,
+# last_used_index) of each shared object.
+_Result = Tuple[List[int], List[Tuple[int, int]]]
+
+
+def run_linear_scan(specs: List[TensorSpec]) -> _Result:
+    shared_objects: List[SharedObject] = []
+    picks = [pick_shared_obj(shared_objects, spec).idx for spec in specs]
+    return _result(shared_objects, picks)
+
+
+def run_pool(specs: List[TensorSpec]) -> _Result:
+    pool = SharedObjectPool()
+    picks = [pool.pick(spec).idx for spec in specs]
+    return _result(pool.objects, picks)
+
+
+def _result(shared_objects: List[SharedObject], picks: List[int]) -> _Result:
+    return (picks, [(s.size, s.last_used_index) for s in shared_objects])
+
+
+def _time(
+    fn: Callable[[List[TensorSpec]], _Result], specs: List[TensorSpec]
+) -> Tuple[float, _Result]:
+    start = time.perf_counter()
+    result = fn(specs)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_tensors", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument(
+        "--max_linear_scan",
+        type=int,
+        default=100000,
+        help="Skip the (quadratic) linear scan for larger graphs",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'tensors':>10} {'objects':>8} {'linear (s)':>11} {'pool (s)':>9}")
+    for num_tensors in args.num_tensors:
+        specs = make_specs(num_tensors, args.seed)
+        pool_time, pool_result = _time(run_pool, specs)
+        linear = "skipped"
+        if num_tensors <= args.max_linear_scan:
+            linear_time, linear_result = _time(run_linear_scan, specs)
+            if linear_result != pool_result:
+                raise AssertionError(
+                    f"SharedObjectPool disagrees with pick_shared_obj for {num_tensors} tensors"
+                )
+            linear = f"{linear_time:.3f}"
+        num_objects = len(pool_result[1])
+        print(f"{num_tensors:>10} {num_objects:>8} {linear:>11} {pool_time:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
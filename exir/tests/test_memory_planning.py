@@ -6,9 +6,12 @@
 
 # pyre-strict
 
+import concurrent.futures
 import itertools
+import random
 import unittest
 from typing import Any, Callable, List, Optional, Tuple, Type
+from unittest.mock import patch
 
 import executorch.exir as exir
 import executorch.exir.schema as schema
@@ -23,6 +26,9 @@ from executorch.exir.backend.backend_api import to_backend, validation_disabled
 from executorch.exir.memory_planning import (
     filter_nodes,
     get_node_tensor_specs,
+    pick_shared_obj,
+    SharedObject,
+    SharedObjectPool,
     Verifier,
 )
 from executorch.exir.pass_base import PassResult
@@ -37,7 +43,9 @@ from executorch.exir.passes import (  # noqa
 )
 from executorch.exir.passes.sym_shape_eval_pass import ConstraintBasedSymShapeEvalPass
 from executorch.exir.print_program import print_program
+from executorch.exir.tensor import TensorSpec
 from executorch.exir.tests.asr_joiner import ASRJoiner
+from executorch.exir.tests.control_flow_models import FTCondBasic
 from parameterized import parameterized
 
 from torch import nn
@@ -228,6 +236,8 @@ def maketest(
                 ("naive", False),
                 # greedy algorithm should reuse tensor storages in the testing model
                 ("greedy", True),
+                ("best_fit", True),
+                ("auto", True),
             ]
 
         for algo, expect_reuse in criteria:
@@ -359,6 +369,7 @@ class TestMemoryPlanning(unittest.TestCase):
         criteria=[
             ("naive", False),
             ("greedy", True),
+            ("best_fit", True),
         ],
     )
 
@@ -369,6 +380,7 @@ class TestMemoryPlanning(unittest.TestCase):
         criteria=[
             ("naive", False),
             ("greedy", True),
+            ("best_fit", True),
         ],
         extra_check=ModuleListArg.extra_check,
     )
@@ -402,6 +414,23 @@ class TestVerifier(unittest.TestCase):
         self.assertFalse(Verifier.has_overlap([5, 6], [1, 2]))
 
 
+class TestSharedObjectPool(unittest.TestCase):
+    def test_matches_pick_shared_obj(self) -> None:
+        rng = random.Random(0)
+        specs = []
+        for i in range(2000):
+            spec = TensorSpec(torch.float32, torch.Size([rng.randrange(1, 512)]))
+            spec.lifetime = [i, i + int(rng.expovariate(1 / 8))]
+            specs.append(spec)
+
+        shared_objects: List[SharedObject] = []
+        pool = SharedObjectPool()
+        for spec in specs:
+            expected = pick_shared_obj(shared_objects, spec)
+            self.assertEqual(expected.idx, pool.pick(spec).idx)
+        self.assertEqual(shared_objects, pool.objects)
+
+
 class TestMisc(unittest.TestCase):
     def test_filter_nodes(self) -> None:
         g = Graph()
@@ -527,6 +556,11 @@ class TestMisc(unittest.TestCase):
                 [(1, 0), (3, 0), (1, 4), (3, 4), (1, 0)],
                 [0, 8, 0, 8],
             ),
+            (
+                "best_fit",
+                [(1, 0), (3, 0), (1, 4), (3, 4), (1, 0)],
+                [0, 8, 0, 8],
+            ),
         ]
     )
     def test_multiple_pools(
@@ -570,6 +604,76 @@ class TestMisc(unittest.TestCase):
                 idx += 1
         self.assertEqual(graph_module.meta["non_const_buffer_sizes"], expected_bufsizes)
 
+    def test_auto(self) -> None:
+        model = ModelWithDifferentTensorSizes()
+        program = (
+            exir.capture(model, model.get_random_inputs())
+            .to_edge(exir.EdgeCompileConfig(_check_ir_validity=False))
+            .to_executorch(
+                exir.ExecutorchBackendConfig(
+                    memory_planning_pass=MemoryPlanningPass("auto")
+                )
+            )
+        )
+        graph_module = program.dump_graph_module()
+        candidates = graph_module.meta["memory_planning_candidates"]
+        self.assertIn("greedy", candidates)
+        self.assertIn("best_fit[order=size]", candidates)
+        self.assertNotIn("auto", candidates)
+
+        # The winner is the smallest plan, and is the one applied to the graph.
+        winner = graph_module.meta["memory_planning_algo"]
+        self.assertEqual(
+            sum(candidates[winner]),
+            min(sum(sizes) for sizes in candidates.values() if sizes is not None),
+        )
+        self.assertEqual(
+            graph_module.meta["non_const_buffer_sizes"], candidates[winner]
+        )
+        Verifier(
+            graph_module, alloc_graph_input=True, alloc_graph_output=True
+        ).verify_storage_reuse()
+
+    def test_auto_control_flow(self) -> None:
+        def plan(num_cpus: int) -> Tuple[GraphModule, int]:
+            model = FTCondBasic()
+            with patch("os.cpu_count", return_value=num_cpus), patch.object(
+                concurrent.futures,
+                "ProcessPoolExecutor",
+                wraps=concurrent.futures.ProcessPoolExecutor,
+            ) as pool:
+                program = (
+                    exir.capture(model, model.get_random_inputs())
+                    .to_edge(exir.EdgeCompileConfig(_check_ir_validity=False))
+                    .to_executorch(
+                        exir.ExecutorchBackendConfig(
+                            memory_planning_pass=MemoryPlanningPass("auto")
+                        )
+                    )
+                )
+            return program.dump_graph_module(), pool.call_count
+
+        def plans(graph_module: GraphModule) -> List[Any]:
+            result = []
+            for _, submodule in graph_module.named_modules():
+                result.append(submodule.meta["memory_planning_candidates"])
+                for node in submodule.graph.nodes:
+                    spec = node.meta.get("spec")
+                    if isinstance(spec, TensorSpec):
+                        result.append((spec.mem_id, spec.mem_offset))
+            return result
+
+        # The workers are forked once for the graph and both branches of cond.
+        graph_module, num_pools = plan(num_cpus=4)
+        self.assertEqual(num_pools, 1)
+        self.assertEqual(len(list(graph_module.named_modules())), 3)
+
+        # Candidates evaluated in the workers give the same plans as in this
+        # process.
+        sequential_graph_module, num_pools = plan(num_cpus=1)
+        self.assertEqual(num_pools, 0)
+        self.assertEqual(plans(graph_module), plans(sequential_graph_module))
+
     def test_constants_not_memory_planned(self) -> None:
         class Simple(torch.nn.Module):
             def __init__(self) -> None:
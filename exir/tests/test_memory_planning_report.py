@@ -0,0 +1,177 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+import csv
+import io
+import os
+import tempfile
+import unittest
+from typing import Tuple
+
+import torch
+from executorch.exir import EdgeCompileConfig, ExecutorchBackendConfig, to_edge
+from executorch.exir.memory_planning_report import get_memory_planning_report
+from executorch.exir.passes import MemoryPlanningPass
+from executorch.exir.schema import KernelCall
+from functorch.experimental import control_flow
+from torch.export import export
+
+
+class ChainModel(torch.nn.Module):
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        a = x + x
+        b = torch.cat([a, a])
+        c = b * b
+        return c.sum(0) + x
+
+    def get_random_inputs(self) -> Tuple[torch.Tensor]:
+        return (torch.randn(16, 8),)
+
+
+class TestMemoryPlanningReport(unittest.TestCase):
+    def setUp(self) -> None:
+        model = ChainModel()
+        self.program = to_edge(export(model, model.get_random_inputs())).to_executorch(
+            ExecutorchBackendConfig(
+                memory_planning_pass=MemoryPlanningPass("greedy", alignment=1)
+            )
+        )
+        program = self.program
+        self.graph_module: torch.fx.GraphModule = program.exported_program(
+            "forward"
+        ).graph_module
+        self.report = get_memory_planning_report(
+            {"forward": self.graph_module}, top_k=2
+        )
+
+    def test_pool(self) -> None:
+        self.assertEqual(list(self.report.methods), ["forward"])
+        pools = self.report.methods["forward"].pools
+        self.assertEqual(list(pools), [1])
+        pool = pools[1]
+        self.assertEqual(
+            pool.buffer_size, self.graph_module.meta["non_const_buffer_sizes"][1]
+        )
+        plan = self.program.executorch_program.execution_plan[0]
+        self.assertEqual(len(pool.live_bytes), len(plan.chains[0].instructions))
+
+        # Live bytes at each instruction add up the tensors alive at it.
+        for index, live in enumerate(pool.live_bytes):
+            self.assertEqual(
+                live,
+                sum(
+                    a.size
+                    for a in pool.allocations
+                    if a.lifetime[0] <= index <= a.lifetime[1]
+                ),
+            )
+
+        # No plan can be smaller than the peak.
+        self.assertLessEqual(pool.peak_live_bytes, pool.buffer_size)
+        self.assertAlmostEqual(
+            pool.fragmentation, 1 - pool.peak_live_bytes / pool.buffer_size
+        )
+
+        # The largest tensor alive at the peak is the (32, 8) float result of
+        # the multiplication.
+        self.assertEqual(len(pool.top_contributors), 2)
+        self.assertEqual(pool.top_contributors[0].size, 32 * 8 * 4)
+        self.assertGreaterEqual(
+            pool.top_contributors[0].size, pool.top_contributors[1].size
+        )
+
+    def test_exports(self) -> None:
+        out = io.StringIO()
+        self.report.write_csv(out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(
+            rows[0], ["method", "mem_id", "instruction_index", "live_bytes"]
+        )
+        pool = self.report.methods["forward"].pools[1]
+        self.assertEqual(
+            [int(row[3]) for row in rows[1:]],
+            pool.live_bytes,
+        )
+
+        events = self.report.to_chrome_trace()["traceEvents"]
+        slices = [e for e in events if e["ph"] == "X"]
+        self.assertEqual(len(slices), len(pool.allocations))
+        counters = [e for e in events if e["ph"] == "C"]
+        self.assertEqual([e["args"]["bytes"] for e in counters], pool.live_bytes)
+
+        self.assertIn("forward mem_id=1", str(self.report))
+
+    def test_instruction_order(self) -> None:
+        # The (32, 8) results of cat and mul are alive from the instructions that
+        # run them, and both are alive at the peak, when mul runs.
+        plan = self.program.executorch_program.execution_plan[0]
+        names = [
+            plan.operators[instruction.instr_args.op_index].name
+            for instruction in plan.chains[0].instructions
+            if isinstance(instruction.instr_args, KernelCall)
+        ]
+        self.assertEqual(len(names), len(plan.chains[0].instructions))
+        pool = self.report.methods["forward"].pools[1]
+        self.assertEqual(names[pool.peak_index], "aten::mul")
+        self.assertEqual(
+            sorted(names[a.lifetime[0]] for a in pool.top_contributors),
+            ["aten::cat", "aten::mul"],
+        )
+
+    def test_control_flow(self) -> None:
+        class CondModel(torch.nn.Module):
+            def forward(self, pred: torch.Tensor, x: torch.Tensor) -> torch.Tensor:
+                return control_flow.cond(
+                    pred, lambda y: torch.mm(y + y, y), lambda y: y * y, [x]
+                )
+
+        class MapModel(torch.nn.Module):
+            def forward(self, x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
+                return control_flow.map(lambda x, y: x + y, x, y) * 2
+
+        for model, inputs in (
+            (CondModel(), (torch.tensor(True), torch.ones(2, 2))),
+            (MapModel(), (torch.ones(4, 4), torch.ones(4))),
+        ):
+            with self.subTest(model=type(model).__name__):
+                program = to_edge(
+                    export(model, inputs),
+                    compile_config=EdgeCompileConfig(_check_ir_validity=False),
+                ).to_executorch()
+                report = get_memory_planning_report(
+                    {"forward": program.exported_program().graph_module}
+                )
+                instructions = (
+                    program.executorch_program.execution_plan[0].chains[0].instructions
+                )
+                self.assertTrue(report.methods["forward"].pools)
+                for pool in report.methods["forward"].pools.values():
+                    self.assertEqual(len(pool.live_bytes), len(instructions))
+
+    def test_report_path(self) -> None:
+        model = ChainModel()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for extension in (".json", ".csv", ".txt"):
+                report_path = os.path.join(temp_dir, f"report{extension}")
+                to_edge(export(model, model.get_random_inputs())).to_executorch(
+                    ExecutorchBackendConfig(
+                        memory_planning_pass=MemoryPlanningPass(
+                            "greedy", alignment=1, report_path=report_path
+                        )
+                    )
+                )
+                with open(report_path) as f:
+                    content = f.read()
+                self.assertIn("method_0", content)
+                if extension == ".json":
+                    self.assertIn("traceEvents", content)
+                elif extension == ".csv":
+                    self.assertTrue(content.startswith("method,mem_id"))
+
+        # The report is only written when asked for.
+        self.assertIsNone(MemoryPlanningPass().report_path)
@@ -116,6 +116,51 @@ class TestVerification(unittest.TestCase):
             },
         )
 
+    def test_run(self) -> None:
+        class Layers(torch.nn.Module):
+            def __init__(self) -> None:
+                super().__init__()
+                self.linears = torch.nn.ModuleList(
+                    [torch.nn.Linear(4, 4) for _ in range(3)]
+                )
+
+            def forward(self, x: torch.Tensor, y: torch.Tensor) -> torch.Tensor:
+                for linear in self.linears:
+                    x = torch.relu(linear(x)) + y
+                return x
+
+        model = Layers()
+        inputs = (torch.randn(2, 4), torch.randn(2, 4))
+        program = (
+            to_edge(
+                {
+                    "forward": export(model, inputs),
+                    "double": export(WrapperModule(lambda x: x * 2), inputs[:1]),
+                }
+            )
+            .to_executorch()
+            ._emitter_output.program
+        )
+
+        with self.assertRaises(ValueError):
+            Interpreter(program)
+
+        test = Interpreter(program, "forward")
+        # Runs reuse the compiled instructions
+        for _ in range(2):
+            self.assertTrue(torch.allclose(test.run(*inputs), model(*inputs)))
+
+        res, timings = test.run_with_timing(*inputs)
+        self.assertTrue(torch.allclose(res, model(*inputs)))
+        instructions = test.execution_plan.chains[0].instructions
+        self.assertEqual(
+            [t.instruction_index for t in timings], list(range(len(instructions)))
+        )
+        self.assertIn("aten.addmm.out", {t.name for t in timings})
+
+        test = Interpreter(program, "double")
+        self.assertTrue(torch.allclose(test.run(inputs[0]), inputs[0] * 2))
+
     def test_verification(self) -> None:
         class Op2(torch.nn.Module):
             def __init__(self) -> None:
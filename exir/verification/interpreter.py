@@ -7,7 +7,9 @@
 # pyre-strict
 
 import copy
-from typing import List, Optional, Union
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple, Union
 
 # pyre-fixme[21]: Could not find module `executorch.exir.verification.bindings`.
 import executorch.exir.verification.bindings as bindings  # @manual=//executorch/exir/verification:bindings
@@ -20,9 +22,11 @@ from executorch import exir
 from executorch.exir.schema import (
     Bool,
     BoolList,
+    Chain,
     Double,
     DoubleList,
     ExecutionPlan,
+    Instruction,
     Int,
     IntList,
     JumpFalseCall,
@@ -118,6 +122,25 @@ def resolve_op(operator: Operator) -> torch._ops.OpOverload:
     return op
 
 
+@dataclass
+class InstructionTiming:
+    """
+    The time taken by one execution of an instruction. Instructions in loops have one
+    entry per iteration.
+    """
+
+    chain_index: int
+    instruction_index: int
+    # The operator name of kernel calls, otherwise the kind of instruction
+    name: str
+    seconds: float
+
+
+# An instruction bound to the value list of an Interpreter. It executes the instruction
+# and returns the index of the next instruction in its chain.
+CompiledInstruction = Callable[[], int]
+
+
 def make_operators_list(
     execution_plan: ExecutionPlan,
 ) -> List[torch._ops.OpOverload]:
@@ -126,14 +149,38 @@ def make_operators_list(
 
 
 class Interpreter:
-    def __init__(self, program: Program) -> None:
-        # Currently there is only 1 execution plan in the list -- this assert will help
-        # catch any changes in the future
-        assert len(program.execution_plan) == 1
-        self.execution_plan: exir.schema.ExecutionPlan = program.execution_plan[0]
-        self.container_metatype: exir.schema.ContainerMetadata = program.execution_plan[
-            0
-        ].container_meta_type
+    """
+    Runs a Program in Python, with the ATen out variants of its operators.
+
+    Args:
+    `program` : the program to run
+
+    `method_name` : the name of the execution plan to run. May only be omitted if the
+                    program has a single execution plan.
+    """
+
+    def __init__(self, program: Program, method_name: Optional[str] = None) -> None:
+        if method_name is None:
+            if len(program.execution_plan) != 1:
+                raise ValueError(
+                    f"The program has {len(program.execution_plan)} execution plans, "
+                    f"specify one of {[plan.name for plan in program.execution_plan]}"
+                )
+            execution_plan = program.execution_plan[0]
+        else:
+            plans = [
+                plan for plan in program.execution_plan if plan.name == method_name
+            ]
+            if len(plans) != 1:
+                raise ValueError(
+                    f"No execution plan named {method_name}, the program has "
+                    f"{[plan.name for plan in program.execution_plan]}"
+                )
+            execution_plan = plans[0]
+        self.execution_plan: exir.schema.ExecutionPlan = execution_plan
+        self.container_metatype: exir.schema.ContainerMetadata = (
+            execution_plan.container_meta_type
+        )
 
         # create buffer in memory and get reference to it
         # pyre-ignore
@@ -150,6 +197,9 @@ class Interpreter:
         self._operators_list: List[torch._ops.OpOverload] = make_operators_list(
             self.execution_plan
         )
+        # The instructions of each chain bound to the value list, created by compile()
+        self._compiled_chains: Optional[List[List[CompiledInstruction]]] = None
+        self._instruction_names: List[List[str]] = []
 
     def get_value_list(self) -> List[ValueType]:
         # TODO(meghajain) may need to change deepcopy to clone
@@ -357,17 +407,139 @@ class Interpreter:
         else:
             self.set_value(output_idxs[0], res)
 
-    def run(self, *raw_args: torch.Tensor) -> PyTree:
+    def _compile_kernel(self, kernel: KernelCall, next_ip: int) -> CompiledInstruction:
         """
-        Loops through instructions given some inputs
+        Returns a function that calls the operator of kernel, with the argument indices
+        and keyword names resolved from the operator schema once.
+        """
+        operator = self._operators_list[kernel.op_index]
+        num_args = len(
+            [arg for arg in operator._schema.arguments if not arg.kwarg_only]
+        )
+        kwarg_list = [kwarg for kwarg in operator._schema.arguments if kwarg.kwarg_only]
+        num_kwargs = len(kwarg_list)
 
-        Args:
-        `args` : list of inputs required for interpretation
+        arg_idxs = kernel.args[:num_args]
+        kwarg_idxs = [
+            (kwarg.name, idx) for kwarg, idx in zip(kwarg_list, kernel.args[num_args:])
+        ]
+        output_idxs = kernel.args[num_args + num_kwargs :]
+        assert (
+            len(output_idxs) == 1
+        ), "emitter is expected to pack multiple outputs into a TensorList"
+        output_idx = output_idxs[0]
+
+        input_idxs = arg_idxs + [idx for _, idx in kwarg_idxs]
+        # Tensor lists are rebuilt from their items on every call, see load_value()
+        tensor_lists = []
+        for idx in input_idxs:
+            val = self.execution_plan.values[idx].val
+            if isinstance(val, (TensorList, OptionalTensorList)):
+                tensor_lists.append((idx, val.items))
+
+        value_list = self._value_list
+        loaded = False
+
+        def call_kernel() -> int:
+            nonlocal loaded
+            if not loaded:
+                # Values stay loaded once they are, so this only happens once
+                for i in input_idxs:
+                    self.load_value(i)
+                loaded = True
+            else:
+                for i, items in tensor_lists:
+                    value_list[i] = [None if j == -1 else value_list[j] for j in items]
 
-        Returns:
-        Outputs after completing all computations
+            res = operator(
+                *[value_list[i] for i in arg_idxs],
+                **{keyword: value_list[i] for keyword, i in kwarg_idxs},
+            )
+            self.set_value(output_idx, list(res) if isinstance(res, tuple) else res)
+            return next_ip
+
+        return call_kernel
+
+    def _compile_instruction(
+        self, instruction: Instruction, ip: int
+    ) -> Tuple[CompiledInstruction, str]:
         """
+        Returns a function executing the instruction at index ip of its chain, and the
+        name of the instruction.
+        """
+        instr_args = instruction.instr_args
+        value_list = self._value_list
+        if isinstance(instr_args, KernelCall):
+            operator = self._operators_list[instr_args.op_index]
+            return self._compile_kernel(instr_args, ip + 1), str(operator)
+        elif isinstance(instr_args, JumpFalseCall):
+            cond_idx = instr_args.cond_value_index
+            destination = instr_args.destination_instruction
+
+            def jump_false() -> int:
+                self.load_value(cond_idx)
+                return ip + 1 if value_list[cond_idx] else destination
+
+            return jump_false, "jump_false"
+        elif isinstance(instr_args, MoveCall):
+            move_to = instr_args.move_to
+            move_from = instr_args.move_from
+
+            def move() -> int:
+                self.load_value(move_from)
+                self.load_value(move_to)
+                value_list[move_to] = value_list[move_from]
+                return ip + 1
+
+            return move, "move"
+        raise RuntimeError(f"Received unknown instruction from program: {instruction}.")
 
+    def compile(self) -> None:
+        """
+        Binds the instructions of every chain to the value list, so that run() does
+        not look at the schema of the program. Called by the first run().
+        """
+        if self._compiled_chains is not None:
+            return
+        chains: List[Chain] = self.execution_plan.chains
+        compiled_chains = []
+        self._instruction_names = []
+        for chain in chains:
+            compiled = [
+                self._compile_instruction(instruction, ip)
+                for ip, instruction in enumerate(chain.instructions)
+            ]
+            compiled_chains.append([instr for instr, _ in compiled])
+            self._instruction_names.append([name for _, name in compiled])
+        self._compiled_chains = compiled_chains
+
+    def _run_chains(self, timings: Optional[List[InstructionTiming]]) -> None:
+        chains = self._compiled_chains
+        assert chains is not None
+        for chain_index, instructions in enumerate(chains):
+            num_instructions = len(instructions)
+            # instruction pointer
+            ip = 0
+            if timings is None:
+                while ip < num_instructions:
+                    ip = instructions[ip]()
+                continue
+            names = self._instruction_names[chain_index]
+            while ip < num_instructions:
+                start = time.perf_counter()
+                next_ip = instructions[ip]()
+                timings.append(
+                    InstructionTiming(
+                        chain_index, ip, names[ip], time.perf_counter() - start
+                    )
+                )
+                ip = next_ip
+
+    def _run(
+        self,
+        raw_args: Tuple[torch.Tensor, ...],
+        timings: Optional[List[InstructionTiming]],
+    ) -> PyTree:
         # pyre-fixme[16]: Module `pytree` has no attribute `tree_flatten`.
         args, pytree = ex_pytree.tree_flatten((raw_args, {}))
 
@@ -385,41 +557,33 @@ class Interpreter:
             idx = self.execution_plan.inputs[i]
             self._value_list[idx] = args[i]
 
-        assert len(self.execution_plan.chains) == 1
-        chain = self.execution_plan.chains[0]
-
-        # instruction pointer
-        ip = 0
-
-        # Kernel loop
-        while ip < len(chain.instructions):
-            instruction = chain.instructions[ip]
-            if isinstance(instruction.instr_args, KernelCall):
-                self.call_kernel(instruction.instr_args)
-            elif isinstance(instruction.instr_args, JumpFalseCall):
-                self.load_value(instruction.instr_args.cond_value_index)
-                ip = (
-                    ip + 1
-                    # pyre-ignore
-                    if self._value_list[instruction.instr_args.cond_val_index]
-                    # pyre-ignore
-                    else instruction.instr_args.destination_instruction
-                )
-                continue
-            elif isinstance(instruction.instr_args, MoveCall):
-                move_to = instruction.instr_args.move_to
-                move_from = instruction.instr_args.move_from
-                self.load_value(move_from)
-                self.load_value(move_to)
-                self._value_list[move_to] = self._value_list[move_from]
-            else:
-                raise RuntimeError(
-                    f"Received unknown instruction from program: {instruction}."
-                )
-            ip += 1
+        self.compile()
+        self._run_chains(timings)
 
         ret = [self._value_list[i] for i in self.execution_plan.outputs]
         # pyre-fixme[16]: Module `pytree` has no attribute `from_str`.
         treespec = ex_pytree.from_str(self.container_metatype.encoded_out_str)
         # pyre-fixme[16]: Module `pytree` has no attribute `tree_unflatten`.
         return ex_pytree.tree_unflatten(ret, treespec)
+
+    def run(self, *raw_args: torch.Tensor) -> PyTree:
+        """
+        Loops through instructions given some inputs
+
+        Args:
+        `args` : list of inputs required for interpretation
+
+        Returns:
+        Outputs after completing all computations
+        """
+        return self._run(raw_args, None)
+
+    def run_with_timing(
+        self, *raw_args: torch.Tensor
+    ) -> Tuple[PyTree, List[InstructionTiming]]:
+        """
+        Like run(), but also returns the time taken by each executed instruction, in
+        the order they were executed.
+        """
+        timings: List[InstructionTiming] = []
+        return self._run(raw_args, timings), timings
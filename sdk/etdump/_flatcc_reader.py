@@ -0,0 +1,268 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+Reads ETDump flatbuffers (etdump_schema_flatcc.fbs) directly from their binary
+encoding into the dataclasses of schema_flatcc, without going through flatc and
+JSON.
+
+The decoders mirror the tables of the schema: the field indices below are the
+positions of the fields in their table, and must be updated with the schema.
+"""
+
+import struct
+from typing import Callable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+import executorch.sdk.etdump.schema_flatcc as flatcc
+from executorch.exir.scalar_type import ScalarType
+
+T = TypeVar("T")
+
+_UINT16 = struct.Struct("<H")
+_UINT32 = struct.Struct("<I")
+_INT32 = struct.Struct("<i")
+
+# Names of the members of the ValueType enum, as stored in Value.val.
+_VALUE_TYPES: Tuple[str, ...] = tuple(
+    value_type.value for value_type in flatcc.ValueType
+)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class _Table:
+    """A table of a flatbuffer, at position pos of buf."""
+
+    __slots__ = ("buf", "pos", "offsets")
+
+    def __init__(self, buf: memoryview, pos: int) -> None:
+        self.buf = buf
+        self.pos = pos
+        vtable = pos - _INT32.unpack_from(buf, pos)[0]
+        vtable_size = _UINT16.unpack_from(buf, vtable)[0]
+        # The offsets of the fields in the table, 0 for absent fields.
+        self.offsets: Tuple[int, ...] = struct.unpack_from(
+            f"<{(vtable_size - 4) // 2}H", buf, vtable + 4
+        )
+
+    def scalar(self, index: int, fmt: struct.Struct, default: T) -> T:
+        offsets = self.offsets
+        offset = offsets[index] if index < len(offsets) else 0
+        if offset == 0:
+            return default
+        return fmt.unpack_from(self.buf, self.pos + offset)[0]
+
+    def _indirect(self, index: int) -> Optional[int]:
+        """Returns the position of the object referenced by field index."""
+        offsets = self.offsets
+        offset = offsets[index] if index < len(offsets) else 0
+        if offset == 0:
+            return None
+        pos = self.pos + offset
+        return pos + _UINT32.unpack_from(self.buf, pos)[0]
+
+    def table(self, index: int) -> Optional["_Table"]:
+        pos = self._indirect(index)
+        return None if pos is None else _Table(self.buf, pos)
+
+    def string(self, index: int) -> Optional[str]:
+        pos = self._indirect(index)
+        if pos is None:
+            return None
+        length = _UINT32.unpack_from(self.buf, pos)[0]
+        return str(self.buf[pos + 4 : pos + 4 + length], "utf-8")
+
+    def _vector(self, index: int) -> Optional[Tuple[int, int]]:
+        """Returns the position of the first element and the length of a vector."""
+        pos = self._indirect(index)
+        if pos is None:
+            return None
+        return pos + 4, _UINT32.unpack_from(self.buf, pos)[0]
+
+    def bytes(self, index: int) -> Optional[bytes]:
+        vector = self._vector(index)
+        if vector is None:
+            return None
+        start, length = vector
+        return bytes(self.buf[start : start + length])
+
+    def scalars(self, index: int, fmt: str) -> Optional[List[int]]:
+        vector = self._vector(index)
+        if vector is None:
+            return None
+        start, length = vector
+        return list(struct.unpack_from(f"<{length}{fmt}", self.buf, start))
+
+    def tables(self, index: int, first: int = 0) -> Optional[Iterator["_Table"]]:
+        """
+        Returns an iterator decoding the tables of a vector one at a time, from
+        the table at index first.
+        """
+        vector = self._vector(index)
+        if vector is None:
+            return None
+        start, length = vector
+        buf = self.buf
+        return (
+            _Table(buf, pos + _UINT32.unpack_from(buf, pos)[0])
+            for pos in range(start + 4 * first, start + 4 * length, 4)
+        )
+
+
+_BYTE = struct.Struct("<b")
+_BOOL = struct.Struct("<?")
+_INT64 = struct.Struct("<q")
+_UINT64 = struct.Struct("<Q")
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+
+
+def _optional(table: Optional[_Table], decode: Callable[[_Table], T]) -> Optional[T]:
+    return None if table is None else decode(table)
+
+
+def _decode_tensor(table: _Table) -> flatcc.Tensor:
+    return flatcc.Tensor(
+        scalar_type=ScalarType(table.scalar(0, _BYTE, 0)),
+        sizes=table.scalars(1, "q") or [],
+        strides=table.scalars(2, "q") or [],
+        offset=table.scalar(3, _INT64, 0),
+    )
+
+
+def _decode_tensor_list(table: _Table) -> flatcc.TensorList:
+    tensors = table.tables(0)
+    return flatcc.TensorList(
+        tensors=[] if tensors is None else [_decode_tensor(t) for t in tensors]
+    )
+
+
+def _decode_value(table: _Table) -> flatcc.Value:
+    int_value = table.table(3)
+    float_value = table.table(4)
+    double_value = table.table(5)
+    bool_value = table.table(6)
+    output = table.table(7)
+    return flatcc.Value(
+        val=_VALUE_TYPES[table.scalar(0, _BYTE, 0)],
+        tensor=_optional(table.table(1), _decode_tensor),
+        tensor_list=_optional(table.table(2), _decode_tensor_list),
+        int_value=(
+            None if int_value is None else flatcc.Int(int_value.scalar(0, _INT64, 0))
+        ),
+        float_value=(
+            None
+            if float_value is None
+            else flatcc.Float(float_value.scalar(0, _FLOAT, 0.0))
+        ),
+        double_value=(
+            None
+            if double_value is None
+            else flatcc.Double(double_value.scalar(0, _DOUBLE, 0.0))
+        ),
+        bool_value=(
+            None
+            if bool_value is None
+            else flatcc.Bool(bool_value.scalar(0, _BOOL, False))
+        ),
+        output=None if output is None else flatcc.Bool(output.scalar(0, _BOOL, False)),
+    )
+
+
+def _decode_debug_event(table: _Table) -> flatcc.DebugEvent:
+    return flatcc.DebugEvent(
+        chain_index=table.scalar(0, _UINT64, 0),
+        instruction_id=table.scalar(1, _INT32, -1),
+        # pyre-ignore[6]: A debug event always has an entry.
+        debug_entry=_optional(table.table(2), _decode_value),
+    )
+
+
+def _decode_profile_event(table: _Table) -> flatcc.ProfileEvent:
+    return flatcc.ProfileEvent(
+        name=table.string(0),
+        chain_index=table.scalar(1, _INT32, 0),
+        instruction_id=table.scalar(2, _INT32, -1),
+        delegate_debug_id_int=table.scalar(3, _INT32, -1),
+        delegate_debug_id_str=table.string(4),
+        delegate_debug_metadata=table.bytes(5),
+        start_time=table.scalar(6, _UINT64, 0),
+        end_time=table.scalar(7, _UINT64, 0),
+    )
+
+
+def _decode_allocation_event(table: _Table) -> flatcc.AllocationEvent:
+    return flatcc.AllocationEvent(
+        allocator_id=table.scalar(0, _INT32, 0),
+        allocation_size=table.scalar(1, _UINT64, 0),
+    )
+
+
+def _decode_event(table: _Table) -> flatcc.Event:
+    return flatcc.Event(
+        profile_event=_optional(table.table(0), _decode_profile_event),
+        allocation_event=_optional(table.table(1), _decode_allocation_event),
+        debug_event=_optional(table.table(2), _decode_debug_event),
+    )
+
+
+def _decode_run_data(table: _Table) -> flatcc.RunData:
+    allocators = table.tables(2)
+    events = table.tables(3)
+    return flatcc.RunData(
+        name=table.string(0) or "",
+        bundled_input_index=table.scalar(1, _INT32, -1),
+        allocators=(
+            None
+            if allocators is None
+            else [flatcc.Allocator(name=a.string(0) or "") for a in allocators]
+        ),
+        events=None if events is None else [_decode_event(e) for e in events],
+    )
+
+
+def _root(data: Buffer, size_prefixed: bool) -> _Table:
+    buf = memoryview(data)
+    try:
+        if size_prefixed:
+            size = _UINT32.unpack_from(buf, 0)[0]
+            buf = buf[4 : 4 + size]
+        return _Table(buf, _UINT32.unpack_from(buf, 0)[0])
+    except struct.error as e:
+        raise ValueError("Invalid ETDump flatbuffer") from e
+
+
+def read_etdump_version(data: Buffer, size_prefixed: bool = True) -> int:
+    return _root(data, size_prefixed).scalar(0, _UINT32, 0)
+
+
+def read_etdump_num_runs(data: Buffer, size_prefixed: bool = True) -> int:
+    """Returns the number of RunData of an ETDump flatbuffer, without decoding them."""
+    runs = _root(data, size_prefixed)._vector(1)
+    return 0 if runs is None else runs[1]
+
+
+def iter_etdump_run_data(
+    data: Buffer, size_prefixed: bool = True, start: int = 0
+) -> Iterator[flatcc.RunData]:
+    """
+    Decodes the RunData of an ETDump flatbuffer one at a time, skipping the first
+    start ones without decoding them.
+    """
+    runs = _root(data, size_prefixed).tables(1, start)
+    if runs is None:
+        return
+    for run in runs:
+        yield _decode_run_data(run)
+
+
+def read_etdump(data: Buffer, size_prefixed: bool = True) -> flatcc.ETDumpFlatCC:
+    return flatcc.ETDumpFlatCC(
+        version=read_etdump_version(data, size_prefixed),
+        run_data=list(iter_etdump_run_data(data, size_prefixed)),
+    )
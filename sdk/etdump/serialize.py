@@ -9,13 +9,19 @@
 import json
 import os
 import tempfile
+from typing import Iterator, Union
 
 import pkg_resources
 
 from executorch.exir._serialize._dataclass import _DataclassEncoder, _json_to_dataclass
 
 from executorch.exir._serialize._flatbuffer import _flatc_compile, _flatc_decompile
-from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC
+from executorch.sdk.etdump._flatcc_reader import (
+    iter_etdump_run_data,
+    read_etdump,
+    read_etdump_num_runs,
+)
+from executorch.sdk.etdump.schema_flatcc import ETDumpFlatCC, RunData
 
 # The prefix of schema files used for etdump
 ETDUMP_FLATCC_SCHEMA_NAME = "etdump_schema_flatcc"
@@ -95,7 +101,7 @@ def serialize_to_etdump_flatcc(
 
 
 def deserialize_from_etdump_flatcc(
-    data: bytes, size_prefixed: bool = True
+    data: Union[bytes, bytearray, memoryview], size_prefixed: bool = True
 ) -> ETDumpFlatCC:
     """
     Given an etdump binary blob (constructed using the FlatCC schema) this function will deserialize
@@ -105,6 +111,37 @@ def deserialize_from_etdump_flatcc(
     Returns:
         Deserialized ETDump python object.
     """
-    return _deserialize_from_json_to_etdump_flatcc(
-        _convert_from_flatcc(data, size_prefixed)
-    )
+    return read_etdump(data, size_prefixed)
+
+
+def deserialize_run_data_from_etdump_flatcc(
+    data: Union[bytes, bytearray, memoryview],
+    size_prefixed: bool = True,
+    start: int = 0,
+) -> Iterator[RunData]:
+    """
+    Given an etdump binary blob (constructed using the FlatCC schema) this function will
+    deserialize its runs one at a time, so that they can be processed before the whole
+    etdump is deserialized.
+    Args:
+        data: Serialized etdump binary blob.
+        start: Index of the first run to deserialize. The runs before it are skipped
+            without being deserialized.
+    Returns:
+        An iterator over the deserialized RunData python objects.
+    """
+    return iter_etdump_run_data(data, size_prefixed, start)
+
+
+def deserialize_num_runs_from_etdump_flatcc(
+    data: Union[bytes, bytearray, memoryview], size_prefixed: bool = True
+) -> int:
+    """
+    Given an etdump binary blob (constructed using the FlatCC schema) this function will
+    return the number of its runs, without deserializing them.
+    Args:
+        data: Serialized etdump binary blob.
+    Returns:
+        The number of runs in the etdump.
+    """
+    return read_etdump_num_runs(data, size_prefixed)
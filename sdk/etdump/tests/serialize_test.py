@@ -8,6 +8,7 @@
 
 import difflib
 import json
+import struct
 import unittest
 from pprint import pformat
 from typing import List
@@ -16,7 +17,11 @@ import executorch.sdk.etdump.schema_flatcc as flatcc
 from executorch.exir._serialize._dataclass import _DataclassEncoder
 
 from executorch.sdk.etdump.serialize import (
+    _convert_from_flatcc,
+    _deserialize_from_json_to_etdump_flatcc,
     deserialize_from_etdump_flatcc,
+    deserialize_num_runs_from_etdump_flatcc,
+    deserialize_run_data_from_etdump_flatcc,
     serialize_to_etdump_flatcc,
 )
 
@@ -137,3 +142,43 @@ class TestSerializeFlatCC(unittest.TestCase):
                 )
             ),
         )
+
+    def test_deserialize_matches_flatc(self) -> None:
+        program = get_sample_etdump_flatcc()
+        program.run_data.append(
+            flatcc.RunData(
+                name="empty_block", bundled_input_index=0, allocators=None, events=None
+            )
+        )
+
+        flatcc_from_py = serialize_to_etdump_flatcc(program)
+        self.assertEqual(
+            deserialize_from_etdump_flatcc(flatcc_from_py, size_prefixed=False),
+            _deserialize_from_json_to_etdump_flatcc(
+                _convert_from_flatcc(flatcc_from_py, size_prefixed=False)
+            ),
+        )
+
+    def test_deserialize_run_data(self) -> None:
+        program = get_sample_etdump_flatcc()
+        program.run_data.append(program.run_data[0])
+
+        # Runtime etdumps are size prefixed.
+        flatcc_from_py = serialize_to_etdump_flatcc(program)
+        size_prefixed = struct.pack("<I", len(flatcc_from_py)) + flatcc_from_py
+        self.assertEqual(
+            list(deserialize_run_data_from_etdump_flatcc(size_prefixed)),
+            program.run_data,
+        )
+        # The runs before start are skipped.
+        self.assertEqual(
+            list(deserialize_run_data_from_etdump_flatcc(size_prefixed, start=1)),
+            program.run_data[1:],
+        )
+        self.assertEqual(
+            deserialize_num_runs_from_etdump_flatcc(size_prefixed),
+            len(program.run_data),
+        )
+
+        with self.assertRaises(ValueError):
+            deserialize_from_etdump_flatcc(b"\x00")
@@ -6,5 +6,23 @@
 
 from executorch.sdk.inspector._inspector import Event, EventBlock, Inspector, PerfData
 from executorch.sdk.inspector._inspector_utils import TimeScale
+from executorch.sdk.inspector._perf_comparison import (
+    compare_etdumps,
+    ETDumpComparison,
+    OpLatencyDelta,
+    RegressionThresholds,
+)
+from executorch.sdk.inspector._streaming_inspector import StreamingInspector
 
-__all__ = ["Event", "EventBlock", "Inspector", "PerfData", "TimeScale"]
+__all__ = [
+    "ETDumpComparison",
+    "Event",
+    "EventBlock",
+    "Inspector",
+    "OpLatencyDelta",
+    "PerfData",
+    "RegressionThresholds",
+    "StreamingInspector",
+    "TimeScale",
+    "compare_etdumps",
+]
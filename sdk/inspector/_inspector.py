@@ -8,13 +8,14 @@ import dataclasses
 import logging
 import sys
 import warnings
-from collections import defaultdict, OrderedDict
+from collections import OrderedDict
 from dataclasses import dataclass
 from functools import cached_property
 from typing import (
     Any,
     Callable,
     Dict,
+    Generic,
     IO,
     List,
     Mapping,
@@ -23,6 +24,7 @@ from typing import (
     Tuple,
     TypeAlias,
     TypedDict,
+    TypeVar,
     Union,
 )
 
@@ -46,6 +48,8 @@ from executorch.sdk.inspector._inspector_utils import (
     gen_graphs_from_etrecord,
     inflate_runtime_output,
     is_debug_output,
+    map_debug_buffer,
+    OutputBuffer,
     ProgramOutput,
     RESERVED_FRAMEWORK_EVENT_NAMES,
     TIME_SCALE_DICT,
@@ -241,34 +245,139 @@ DelegateMetadata = TypedDict(
 )
 
 
-@dataclass
+class _PerfDataTable:
+    """
+    The durations of a set of events, with one row per event and one column per
+    run, and their statistics, computed for all the rows at once.
+    """
+
+    def __init__(self, durations: np.ndarray) -> None:
+        self.durations: np.ndarray = durations
+
+    @cached_property
+    def percentiles(self) -> np.ndarray:
+        """The p10, p50 and p90 of each row, with one row per percentile."""
+        return np.percentile(self.durations, [10, 50, 90], axis=1)
+
+    @cached_property
+    def avg(self) -> np.ndarray:
+        return self.durations.mean(axis=1)
+
+    @cached_property
+    def min(self) -> np.ndarray:
+        return self.durations.min(axis=1)
+
+    @cached_property
+    def max(self) -> np.ndarray:
+        return self.durations.max(axis=1)
+
+
 class PerfData:
-    def __init__(self, raw: List[float]):
-        self.raw: List[float] = raw
+    """
+    The durations of the runs of an Event.
+
+    The PerfData of the Events of an EventBlock are views of the rows of a table
+    shared by the EventBlock, so that the statistics of all its Events are computed
+    at once.
+    """
+
+    def __init__(self, raw: Union[Sequence[float], np.ndarray]) -> None:
+        self._table = _PerfDataTable(np.asarray(raw, dtype=np.float64).reshape(1, -1))
+        self._row = 0
+
+    @staticmethod
+    def _from_table(table: _PerfDataTable, row: int) -> "PerfData":
+        perf_data = PerfData.__new__(PerfData)
+        perf_data._table = table
+        perf_data._row = row
+        return perf_data
+
+    @property
+    def data(self) -> np.ndarray:
+        """The durations, as a read-only array."""
+        data = self._table.durations[self._row]
+        data.flags.writeable = False
+        return data
+
+    @property
+    def raw(self) -> List[float]:
+        return self._table.durations[self._row].tolist()
 
     @property
     def p10(self) -> float:
-        return np.percentile(self.raw, 10)
+        return self._table.percentiles[0, self._row]
 
     @property
     def p50(self) -> float:
-        return np.percentile(self.raw, 50)
+        return self._table.percentiles[1, self._row]
 
     @property
     def p90(self) -> float:
-        return np.percentile(self.raw, 90)
+        return self._table.percentiles[2, self._row]
 
     @property
     def avg(self) -> float:
-        return np.mean(self.raw)
+        return self._table.avg[self._row]
 
     @property
     def min(self) -> float:
-        return min(self.raw)
+        return self._table.min[self._row]
 
     @property
     def max(self) -> float:
-        return max(self.raw)
+        return self._table.max[self._row]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PerfData):
+            return NotImplemented
+        return np.array_equal(self.data, other.data)
+
+    def __repr__(self) -> str:
+        return f"PerfData(raw={self.raw})"
+
+
+class _LazyProgramOutput:
+    """
+    Debug values of an ETDump, inflated from the output buffer when needed
+    """
+
+    def __init__(
+        self, values: List[flatcc.Value], output_buffer: Optional[OutputBuffer]
+    ) -> None:
+        self.values = values
+        self.output_buffer = output_buffer
+
+    def inflate(self) -> ProgramOutput:
+        return [
+            inflate_runtime_output(value, self.output_buffer) for value in self.values
+        ]
+
+
+class _LazyDebugData:
+    """
+    Descriptor of Event.debug_data, which can be set to a _LazyProgramOutput that
+    is inflated when debug_data is first accessed
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self._attribute: str = "_" + name
+
+    def __get__(
+        self, obj: Optional[object], objtype: Optional[type] = None
+    ) -> Optional[ProgramOutput]:
+        if obj is None:
+            # Default value of the dataclass field, replaced with [] by __set__
+            return None
+        value = obj.__dict__[self._attribute]
+        if isinstance(value, _LazyProgramOutput):
+            value = value.inflate()
+            obj.__dict__[self._attribute] = value
+        return value
+
+    def __set__(
+        self, obj: object, value: Union[ProgramOutput, _LazyProgramOutput, None]
+    ) -> None:
+        obj.__dict__[self._attribute] = [] if value is None else value
 
 
 @dataclass
@@ -291,7 +400,7 @@ class Event:
             Available parsed (if parser provided) as Event.delegate_debug_metadatas
             Available as Event.raw_delegate_debug_metadatas
 
-        debug_data: A list containing intermediate data collected.
+        debug_data: A list containing intermediate data collected, inflated from the debug buffer when first accessed.
 
         _instruction_id: Instruction Identifier for Symbolication
         _delegate_metadata_parser: Optional Parser for _delegate_debug_metadatas
@@ -308,7 +417,8 @@ class Event:
     delegate_backend_name: Optional[str] = None
     _delegate_debug_metadatas: List[str] = dataclasses.field(default_factory=list)
 
-    debug_data: ProgramOutput = dataclasses.field(default_factory=list)
+    # pyre-ignore[8]: The descriptor provides the value.
+    debug_data: ProgramOutput = _LazyDebugData()
     _instruction_id: Optional[int] = None
 
     _delegate_metadata_parser: Optional[Callable[[List[str]], Dict[str, Any]]] = None
@@ -387,7 +497,7 @@ class Event:
         signature: EventSignature,
         events: List[InstructionEvent],
         scale_factor: float = 1.0,
-        output_buffer: Optional[bytes] = None,
+        output_buffer: Optional[OutputBuffer] = None,
         delegate_metadata_parser: Optional[
             Callable[[List[str]], Dict[str, Any]]
         ] = None,
@@ -501,7 +611,7 @@ class Event:
         ret_event: "Event",
         debug_event_signature: Optional[DebugEventSignature],
         events: List[InstructionEvent],
-        output_buffer: Optional[bytes] = None,
+        output_buffer: Optional[OutputBuffer] = None,
     ) -> None:
         """
         Given a partially constructed Event, populate the fields related to
@@ -527,10 +637,8 @@ class Event:
                     intermediate data present in this ETDump and indicates potential issues
                     with the model/runtime."""
 
-        ret_event.debug_data = [
-            inflate_runtime_output(debug_value, output_buffer)
-            for debug_value in debug_data
-        ]
+        # The debug data is inflated when it is first accessed
+        ret_event.debug_data = _LazyProgramOutput(debug_data, output_buffer)
 
     def _associate_with_op_graph_nodes(
         self,
@@ -562,6 +670,283 @@ class Event:
                     self.op_types += [node.op]
 
 
+# Fields of a ProfileEvent or DebugEvent that its signatures are generated from
+_EventKey: TypeAlias = Optional[Tuple[Any, ...]]
+
+
+def _gen_event_key(event: flatcc.Event) -> _EventKey:
+    """
+    Given an ETDump Event, return the fields that its signatures and its role in
+    the run depend on
+    """
+    if (profile_event := event.profile_event) is not None:
+        return (
+            profile_event.name,
+            profile_event.chain_index,
+            profile_event.instruction_id,
+            profile_event.delegate_debug_id_int,
+            profile_event.delegate_debug_id_str,
+        )
+    if (debug_event := event.debug_event) is not None:
+        return (
+            debug_event.chain_index,
+            debug_event.instruction_id,
+            is_debug_output(debug_event.debug_entry),
+        )
+    return None
+
+
+@dataclass
+class _RunLayout:
+    """
+    The EventSignatures of a run, and the positions of their events in the run.
+
+    Runs whose events have the same keys (see _gen_event_key) have the same layout,
+    so it is only generated once for all of them.
+
+    Args:
+        run_signature: Signature of the run
+        instruction_events: The InstructionEvent of each EventSignature, from the
+            run the layout was generated from
+        profile_positions: Position of the ProfileEvent of each EventSignature,
+            -1 if it has none
+        debug_positions: Positions of the DebugEvents of each EventSignature
+    """
+
+    run_signature: RunSignature
+    instruction_events: List[InstructionEvent]
+    profile_positions: List[int]
+    debug_positions: List[List[int]]
+
+    @staticmethod
+    def gen_from_run(
+        run: flatcc.RunData, run_events: List[flatcc.Event]
+    ) -> "_RunLayout":
+        # Collate the run_events into InstructionEvents
+        instruction_events: List[InstructionEvent] = InstructionEvent.gen_from_events(
+            run_events
+        )
+
+        # Map EventSignatures to the InstructionEvents
+        event_signatures: Dict[EventSignature, InstructionEvent] = OrderedDict()
+        for instruction_event in instruction_events:
+            if (
+                instruction_event.debug_events is None
+                and instruction_event.profile_events is None
+            ):
+                # Currently corresponds to run output
+                continue
+
+            generated_event_signatures: List[
+                Tuple[EventSignature, InstructionEvent]
+            ] = EventSignature.gen_from_instruction_event(instruction_event)
+            for (
+                event_signature,
+                filtered_instruction_event,
+            ) in generated_event_signatures:
+                event_signatures[event_signature] = filtered_instruction_event
+
+        # Locate the events of each EventSignature in the run
+        positions: Dict[int, int] = {
+            id(find_populated_event(event)): position
+            for position, event in enumerate(run_events)
+        }
+        profile_positions = []
+        debug_positions = []
+        for instruction_event in event_signatures.values():
+            profile_events = instruction_event.profile_events
+            profile_positions.append(
+                positions[id(profile_events[0])] if profile_events is not None else -1
+            )
+            debug_positions.append(
+                [positions[id(event)] for event in instruction_event.debug_events or []]
+            )
+
+        return _RunLayout(
+            run_signature=RunSignature(
+                name=run.name,
+                events=tuple(event_signatures.keys()),
+                bundled_input_index=run.bundled_input_index,
+            ),
+            instruction_events=list(event_signatures.values()),
+            profile_positions=profile_positions,
+            debug_positions=debug_positions,
+        )
+
+    def gen_profile_data(
+        self, run_events: List[flatcc.Event]
+    ) -> Tuple[np.ndarray, Dict[int, Union[bytes, str]]]:
+        """
+        Given the events of a run with this layout, return the duration of the
+        ProfileEvent of each EventSignature (NaN if it has none), and the delegate
+        debug metadatas that are present
+        """
+        durations = np.full(len(self.profile_positions), np.nan)
+        delegate_debug_metadatas = {}
+        for row, position in enumerate(self.profile_positions):
+            if position < 0:
+                continue
+            profile_event = run_events[position].profile_event
+            assert profile_event is not None
+            durations[row] = profile_event.end_time - profile_event.start_time
+            if metadata := profile_event.delegate_debug_metadata:
+                delegate_debug_metadatas[row] = metadata
+        return durations, delegate_debug_metadatas
+
+    def gen_events(
+        self,
+        scale_factor: float = 1.0,
+        output_buffer: Optional[OutputBuffer] = None,
+        delegate_metadata_parser: Optional[
+            Callable[[List[str]], Dict[str, Any]]
+        ] = None,
+    ) -> List[Event]:
+        """
+        Generate an Event for each EventSignature, from the run the layout was
+        generated from
+        """
+        # pyre-ignore[6]: The run signature of a layout always has events.
+        signatures: Tuple[EventSignature, ...] = self.run_signature.events
+        return [
+            Event._gen_from_inference_events(
+                signature,
+                [instruction_event],
+                scale_factor,
+                output_buffer,
+                delegate_metadata_parser,
+            )
+            for signature, instruction_event in zip(signatures, self.instruction_events)
+        ]
+
+
+def _gen_scale_factors(events: List[Event], scale_factor: float) -> np.ndarray:
+    """
+    Given the Events of a run, return the factor dividing the duration of each
+    """
+    # Scale factor should only be applied to non-delegated ops
+    return np.array(
+        [1.0 if event.is_delegated_op else scale_factor for event in events]
+    )
+
+
+_RunGroupT = TypeVar("_RunGroupT")
+
+
+class _RunGroups(Generic[_RunGroupT]):
+    """
+    Groups runs by RunSignature, only generating the layout of runs whose events
+    have new keys
+    """
+
+    def __init__(self, gen_group: Callable[[_RunLayout], _RunGroupT]) -> None:
+        self.gen_group = gen_group
+        # Map each RunSignature to the group of its runs
+        self.groups: Dict[RunSignature, _RunGroupT] = {}
+        # Map the keys of the events of runs to their layout and group
+        self.layouts: Dict[Tuple[Any, ...], Tuple[_RunLayout, _RunGroupT]] = {}
+
+    def get(
+        self, run: flatcc.RunData, run_events: List[flatcc.Event]
+    ) -> Tuple[_RunLayout, _RunGroupT]:
+        """Return the layout of the run and the group it belongs to"""
+        layout_key = (
+            run.name,
+            run.bundled_input_index,
+            *(_gen_event_key(event) for event in run_events),
+        )
+        if (layout_and_group := self.layouts.get(layout_key)) is not None:
+            return layout_and_group
+
+        layout = _RunLayout.gen_from_run(run, run_events)
+        if (run_group := self.groups.get(layout.run_signature)) is None:
+            run_group = self.gen_group(layout)
+            self.groups[layout.run_signature] = run_group
+        self.layouts[layout_key] = (layout, run_group)
+        return layout, run_group
+
+
+class _RunGroup:
+    """
+    Collects the runs of a RunSignature into columns: the durations of the
+    ProfileEvents of all the runs are kept in arrays, and only the first run's
+    InstructionEvents are kept to generate the Events.
+    """
+
+    def __init__(self, layout: _RunLayout) -> None:
+        self.layout = layout
+        # Durations of the ProfileEvent of each EventSignature, one array per run
+        self.durations: List[np.ndarray] = []
+        # Delegate debug metadatas of the EventSignatures that have some
+        self.delegate_debug_metadatas: Dict[int, List[Union[bytes, str]]] = {}
+        self.debug_entries: List[List[flatcc.Value]] = [
+            [debug_event.debug_entry for debug_event in event.debug_events or []]
+            for event in layout.instruction_events
+        ]
+        self.run_output: ProgramOutput = []
+
+    def add_run(self, layout: _RunLayout, run_events: List[flatcc.Event]) -> None:
+        num_runs = len(self.durations)
+        durations, delegate_debug_metadatas = layout.gen_profile_data(run_events)
+        self.durations.append(durations)
+        for row, metadatas in self.delegate_debug_metadatas.items():
+            metadatas.append(delegate_debug_metadatas.pop(row, ""))
+        for row, metadata in delegate_debug_metadatas.items():
+            self.delegate_debug_metadatas[row] = [""] * num_runs + [metadata]
+
+        # The debug entries of the first run are used, verify the others against them
+        if num_runs == 0:
+            return
+        for positions, values in zip(layout.debug_positions, self.debug_entries):
+            for position, value in zip(positions, values):
+                debug_event = run_events[position].debug_event
+                assert (
+                    debug_event is not None and debug_event.debug_entry == value
+                ), """Corresponding debug events in multiple iterations of the model
+                must have the same debug entry values. This is not the case for the
+                intermediate data present in this ETDump and indicates potential issues
+                with the model/runtime."""
+
+    def gen_events(
+        self,
+        scale_factor: float,
+        output_buffer: Optional[OutputBuffer],
+        delegate_metadata_parser: Optional[Callable[[List[str]], Dict[str, Any]]],
+    ) -> List[Event]:
+        """
+        Generate the Events of the run group, whose perf_data are views of a table
+        of the durations of all its runs
+        """
+        layout = self.layout
+        events = layout.gen_events(
+            scale_factor, output_buffer, delegate_metadata_parser
+        )
+
+        scale_factors = _gen_scale_factors(events, scale_factor)
+        table = _PerfDataTable(
+            np.stack(self.durations, axis=1) / scale_factors[:, np.newaxis]
+        )
+        for row, event in enumerate(events):
+            if layout.profile_positions[row] < 0:
+                continue
+            event.perf_data = PerfData._from_table(table, row)
+            # pyre-ignore[6]: Metadatas are bytes, as in Event._populate_profiling_related_fields.
+            event._delegate_debug_metadatas = self.delegate_debug_metadatas.get(row, [])
+        return events
+
+
+def _gen_column(values: List[Any]) -> pd.Series:
+    """
+    Given the values of a column of Event.asdict(), return the column as it would
+    be in the concatenation of the Events' DataFrames
+    """
+    # asdict() wraps lists in another list, to build single row DataFrames
+    values = [value[0] if isinstance(value, list) else value for value in values]
+    # Numbers are not turned into floats to fit NaNs
+    if any(value is None for value in values):
+        return pd.Series(values, dtype=object)
+    return pd.Series(values)
+
+
 @dataclass
 class EventBlock:
     r"""
@@ -604,7 +989,11 @@ class EventBlock:
 
         units = " (" + self.target_time_scale.value + ")" if include_units else ""
 
-        df = pd.concat([e.to_dataframe(units) for e in self.events], ignore_index=True)
+        # Build the columns at once rather than concatenating the Events' DataFrames
+        rows = [event.asdict(_units=units) for event in self.events]
+        df = pd.DataFrame(
+            {column: _gen_column([row[column] for row in rows]) for column in rows[0]}
+        )
         df.insert(
             0,
             "event_block_name",
@@ -642,7 +1031,7 @@ class EventBlock:
         etdump: ETDumpFlatCC,
         source_time_scale: TimeScale = TimeScale.NS,
         target_time_scale: TimeScale = TimeScale.MS,
-        output_buffer: Optional[bytes] = None,
+        output_buffer: Optional[OutputBuffer] = None,
         delegate_metadata_parser: Optional[
             Callable[[List[str]], Dict[str, Any]]
         ] = None,
@@ -659,111 +1048,47 @@ class EventBlock:
         An optional delegate metadata parser function to parse delegate profiling metadata
         """
 
-        # Map each RunSignatures to instances of its constituent events.
-        #   The value of the map is a GroupedRunInstance which contains:
-        #   (1) a map from each EventSignature to InstructionEvents with the signature
-        #   (2) the run output for this RunSignature
-        @dataclass
-        class GroupedRunInstances:
-            events: OrderedDict[EventSignature, List[InstructionEvent]]
-            run_output: ProgramOutput
-
-        run_groups: Mapping[RunSignature, GroupedRunInstances] = defaultdict(
-            lambda: GroupedRunInstances(OrderedDict(), [])
-        )
+        # Group the runs by RunSignature
+        run_groups: _RunGroups[_RunGroup] = _RunGroups(_RunGroup)
 
         # Collect all the run data
         for run in etdump.run_data:
             if (run_events := run.events) is None:
                 continue
 
-            # Collate the run_events into InstructionEvents
-            instruction_events: List[InstructionEvent] = (
-                InstructionEvent.gen_from_events(run_events)
-            )
-
-            # Map EventSignatures to the InstructionEvents
-            event_signatures: Dict[EventSignature, InstructionEvent] = OrderedDict()
-            for instruction_event in instruction_events:
-                if (
-                    instruction_event.debug_events is None
-                    and instruction_event.profile_events is None
-                ):
-                    # Currently corresponds to run output
-                    continue
-
-                generated_event_signatures: List[
-                    Tuple[EventSignature, InstructionEvent]
-                ] = EventSignature.gen_from_instruction_event(instruction_event)
-                for (
-                    event_signature,
-                    filtered_instruction_event,
-                ) in generated_event_signatures:
-                    event_signatures[event_signature] = filtered_instruction_event
-
-            # Create a RunSignature from the EventSignatures
-            run_signature = RunSignature(
-                name=run.name,
-                events=tuple(event_signatures.keys()),
-                bundled_input_index=run.bundled_input_index,
-            )
-
-            # Update the Run Groups, indexed on the RunSignature
-            run_signature_events: OrderedDict[
-                EventSignature, List[InstructionEvent]
-            ] = run_groups[run_signature].events
-            for event_signature, event in event_signatures.items():
-                run_signature_events.setdefault(event_signature, []).append(event)
+            layout, run_group = run_groups.get(run, run_events)
+            run_group.add_run(layout, run_events)
 
             # Populate (or Verify if already populated) Run Outputs
             run_outputs: ProgramOutput = EventBlock._collect_run_outputs(
                 run_events, output_buffer
             )
-            if len(existing_run_outputs := run_groups[run_signature].run_output) == 0:
+            if len(existing_run_outputs := run_group.run_output) == 0:
                 existing_run_outputs.extend(run_outputs)
             else:
                 verify_debug_data_equivalence(existing_run_outputs, run_outputs)
 
         # Construct the EventBlocks
-        event_blocks = []
         scale_factor = (
             TIME_SCALE_DICT[source_time_scale] / TIME_SCALE_DICT[target_time_scale]
         )
-        for run_signature, grouped_run_instance in run_groups.items():
-            run_group: OrderedDict[EventSignature, List[InstructionEvent]] = (
-                grouped_run_instance.events
-            )
-            run_outputs: ProgramOutput = grouped_run_instance.run_output
-
-            # Construct the Events
-            events: List[Event] = [
-                Event._gen_from_inference_events(
-                    signature,
-                    instruction_events,
-                    scale_factor,
-                    output_buffer,
-                    delegate_metadata_parser,
-                )
-                for signature, instruction_events in run_group.items()
-            ]
-
-            # Add the EventBlock to the return list
-            event_blocks.append(
-                EventBlock(
-                    name=run_signature.name,
-                    events=events,
-                    source_time_scale=source_time_scale,
-                    target_time_scale=target_time_scale,
-                    bundled_input_index=run_signature.bundled_input_index,
-                    run_output=run_outputs,
-                )
+        return [
+            EventBlock(
+                name=run_signature.name,
+                events=run_group.gen_events(
+                    scale_factor, output_buffer, delegate_metadata_parser
+                ),
+                source_time_scale=source_time_scale,
+                target_time_scale=target_time_scale,
+                bundled_input_index=run_signature.bundled_input_index,
+                run_output=run_group.run_output,
             )
-
-        return event_blocks
+            for run_signature, run_group in run_groups.groups.items()
+        ]
 
     @staticmethod
     def _collect_run_outputs(
-        events: List[flatcc.Event], output_buffer: Optional[bytes] = None
+        events: List[flatcc.Event], output_buffer: Optional[OutputBuffer] = None
     ) -> ProgramOutput:
         """
         Given a list of events, search the events for ProgramOutputs (aka lists of InferenceOutputs) marked
@@ -915,8 +1240,7 @@ class Inspector:
         # Create EventBlocks from ETDump
         etdump = gen_etdump_object(etdump_path=etdump_path)
         if debug_buffer_path is not None:
-            with open(debug_buffer_path, "rb") as f:
-                output_buffer = f.read()
+            output_buffer = map_debug_buffer(debug_buffer_path)
         else:
             output_buffer = None
             warnings.warn(
@@ -5,6 +5,8 @@
 # LICENSE file in the root directory of this source tree.
 
 import math
+import mmap
+import os
 from enum import Enum
 from typing import Dict, List, Mapping, Optional, Tuple, TypeAlias, Union
 
@@ -70,51 +72,97 @@ InferenceOutput: TypeAlias = Union[
 ProgramOutput: TypeAlias = List[InferenceOutput]
 
 
+# Buffer holding the debug data referenced by an ETDump
+OutputBuffer: TypeAlias = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+_SCALAR_TYPE_TO_TORCH_DTYPE: Dict[ScalarType, torch.dtype] = {
+    ScalarType.BYTE: torch.uint8,
+    ScalarType.CHAR: torch.int8,
+    ScalarType.SHORT: torch.int16,
+    ScalarType.INT: torch.int32,
+    ScalarType.LONG: torch.int64,
+    ScalarType.HALF: torch.float16,
+    ScalarType.FLOAT: torch.float32,
+    ScalarType.DOUBLE: torch.float64,
+    ScalarType.COMPLEX32: torch.complex32,
+    ScalarType.COMPLEX64: torch.complex64,
+    ScalarType.COMPLEX128: torch.complex128,
+    ScalarType.BOOL: torch.bool,
+    ScalarType.QINT8: torch.qint8,
+    ScalarType.QUINT8: torch.quint8,
+    ScalarType.QINT32: torch.qint32,
+    ScalarType.BFLOAT16: torch.bfloat16,
+    ScalarType.QUINT4x2: torch.quint4x2,
+    ScalarType.QUINT2x4: torch.quint2x4,
+}
+
+# The debug buffer only holds the integer representation of quantized tensors
+_QUANTIZED_TO_INT_REPR_DTYPE: Dict[torch.dtype, torch.dtype] = {
+    torch.qint8: torch.int8,
+    torch.quint8: torch.uint8,
+    torch.qint32: torch.int32,
+}
+
+
+def get_scalar_type_size(scalar_type: ScalarType) -> Tuple[torch.dtype, int]:
+    """
+    Return the torch dtype of the scalar type and its size in bytes
+    """
+    if (torch_dtype := _SCALAR_TYPE_TO_TORCH_DTYPE.get(scalar_type)) is None:
+        raise RuntimeError(
+            f"Unsupported scalar type in get_scalar_type_size : {scalar_type}"
+        )
+    return (torch_dtype, torch_dtype.itemsize)
+
+
+def map_debug_buffer(debug_buffer_path: str) -> OutputBuffer:
+    """
+    Map the debug buffer file into memory, so that the tensors inflated from it
+    share its pages rather than being read into copies
+    """
+    with open(debug_buffer_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            return b""
+        # Copy on write: the tensors can be modified without changing the file
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+
 # Given a ETDump Tensor object and offset, extract into a torch.Tensor
 def _parse_tensor_value(
-    tensor: Optional[Tensor], output_buffer: Optional[bytes]
+    tensor: Optional[Tensor], output_buffer: Optional[OutputBuffer]
 ) -> torch.Tensor:
-    def get_scalar_type_size(scalar_type: ScalarType) -> Tuple[torch.dtype, int]:
-        """
-        Return the size of the scalar type in bytes
-        """
-        if scalar_type == ScalarType.INT:
-            return (torch.int, 4)
-        elif scalar_type == ScalarType.BOOL:
-            return (torch.bool, 1)
-        elif scalar_type == ScalarType.FLOAT:
-            return (torch.float, 4)
-        elif scalar_type == ScalarType.DOUBLE:
-            return (torch.double, 8)
-        elif scalar_type == ScalarType.LONG:
-            return (torch.long, 8)
-        else:
-            raise RuntimeError(
-                f"Unsupported scalar type in get_scalar_type_size : {scalar_type}"
-            )
-
     if tensor is None or tensor.offset is None:
         raise ValueError("Tensor cannot be None")
 
     torch_dtype, dtype_size = get_scalar_type_size(tensor.scalar_type)
+    if torch_dtype in (torch.quint4x2, torch.quint2x4):
+        raise RuntimeError(
+            f"Tensors of sub-byte scalar type {tensor.scalar_type} cannot be inflated"
+        )
+    torch_dtype = _QUANTIZED_TO_INT_REPR_DTYPE.get(torch_dtype, torch_dtype)
 
     if output_buffer is None:
         # Empty buffer provided. Cannot deserialize tensors.
         return torch.zeros(tensor.sizes, dtype=torch_dtype)
 
     tensor_bytes_size = math.prod(tensor.sizes) * dtype_size
-
-    if tensor.offset is None:
-        raise ValueError("Tensor offset cannot be None")
-
-    return torch.frombuffer(
-        output_buffer[tensor.offset : tensor.offset + tensor_bytes_size],
-        dtype=torch_dtype,
-    ).view(tensor.sizes)
+    if tensor_bytes_size == 0:
+        return torch.empty(tensor.sizes, dtype=torch_dtype)
+
+    # Slicing a memoryview does not copy the data
+    tensor_data = memoryview(output_buffer)[
+        tensor.offset : tensor.offset + tensor_bytes_size
+    ]
+    if len(tensor_data) != tensor_bytes_size:
+        raise ValueError(
+            f"Tensor data at offset {tensor.offset} is outside of the debug buffer"
+        )
+    return torch.frombuffer(tensor_data, dtype=torch_dtype).view(tensor.sizes)
 
 
 def inflate_runtime_output(
-    value: Value, output_buffer: Optional[bytes]
+    value: Value, output_buffer: Optional[OutputBuffer]
 ) -> InferenceOutput:
     """
     Parse the given ETDump Value object into an InferenceOutput object
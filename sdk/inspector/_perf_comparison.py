@@ -0,0 +1,385 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import dataclasses
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from executorch.sdk.inspector._inspector import Event, Inspector
+from executorch.sdk.inspector._inspector_utils import TimeScale
+
+# Identifies an operator across ETDumps: the name of its EventBlock, how its event is
+# aligned ("nodes", "debug_handles" or "event"), the op graph node names, debug
+# handles or event name it is aligned by, and the number of events of the EventBlock
+# before it that are aligned by the same values.
+_OpKey = Tuple[str, str, Tuple[Any, ...], int]
+
+
+# Statistics that the latencies of an operator can be compared on, computed over the
+# last axis of the samples.
+_STATISTICS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "avg": lambda samples: np.mean(samples, axis=-1),
+    "min": lambda samples: np.min(samples, axis=-1),
+    "max": lambda samples: np.max(samples, axis=-1),
+    "p10": lambda samples: np.percentile(samples, 10, axis=-1),
+    "p50": lambda samples: np.percentile(samples, 50, axis=-1),
+    "p90": lambda samples: np.percentile(samples, 90, axis=-1),
+}
+
+
+# The most resampled latencies that the bootstrap holds at once, about 64 MiB with
+# their indices.
+_BOOTSTRAP_CHUNK_SIZE = 1 << 22
+
+
+@dataclass
+class _OpSamples:
+    event_name: str
+    op_types: List[str]
+    durations: np.ndarray
+
+
+@dataclass
+class RegressionThresholds:
+    """
+    The latency increases of an operator that are reported as regressions, when the
+    bootstrap confidence interval of the increase excludes 0.
+
+    Args:
+        relative: Minimum increase, as a fraction of the baseline latency.
+        absolute: Minimum increase, in the target time scale.
+    """
+
+    relative: float = 0.05
+    absolute: float = 0.0
+
+
+@dataclass
+class OpLatencyDelta:
+    """
+    The change of the latency of an operator between a baseline ETDump and a
+    candidate ETDump, on the statistic of the comparison.
+
+    Args:
+        event_block_name: Name of the EventBlock of the operator.
+        event_name: Name of the event of the operator in the candidate.
+        op_types: Op types of the event of the operator in the candidate.
+        key: How the events were aligned, e.g. "nodes:aten_add_tensor".
+        baseline: Latency of the operator in the baseline.
+        candidate: Latency of the operator in the candidate.
+        delta: candidate - baseline.
+        relative_delta: delta as a fraction of baseline, None if baseline is 0.
+        ci_low: Lower bound of the bootstrap confidence interval of delta.
+        ci_high: Upper bound of the bootstrap confidence interval of delta.
+        significant: Whether the confidence interval excludes 0, which requires at
+            least 2 samples on each side.
+        regression: Whether the increase is significant and beyond the thresholds.
+    """
+
+    event_block_name: str
+    event_name: str
+    op_types: List[str]
+    key: str
+    baseline: float
+    candidate: float
+    delta: float
+    relative_delta: Optional[float]
+    ci_low: float
+    ci_high: float
+    significant: bool
+    regression: bool
+
+
+@dataclass
+class ETDumpComparison:
+    """
+    The latency changes of the operators of a candidate ETDump against a baseline.
+
+    Args:
+        baseline_path: Path of the baseline ETDump.
+        candidate_path: Path of the candidate ETDump.
+        statistic: The statistic of the latencies that are compared.
+        deltas: An OpLatencyDelta for each operator of both ETDumps.
+        missing: Keys of the operators of the baseline that the candidate lacks.
+        added: Keys of the operators of the candidate that the baseline lacks.
+    """
+
+    baseline_path: str
+    candidate_path: str
+    statistic: str
+    deltas: List[OpLatencyDelta]
+    missing: List[str]
+    added: List[str]
+
+    @property
+    def regressions(self) -> List[OpLatencyDelta]:
+        return [delta for delta in self.deltas if delta.regression]
+
+    def asdict(self) -> Dict[str, Any]:
+        """
+        Convert the comparison into a dict that can be serialized to JSON
+        """
+        return dataclasses.asdict(self)
+
+
+def _format_key(key: _OpKey) -> str:
+    _, kind, values, occurrence = key
+    formatted_key = f"{kind}:" + ",".join(str(value) for value in values)
+    return formatted_key if occurrence == 0 else f"{formatted_key}#{occurrence}"
+
+
+def _gen_op_keys(event_block_name: str, events: List[Event]) -> List[_OpKey]:
+    """
+    Generate the keys that align the events of an EventBlock with the events of
+    other ETDumps: by op graph node when the ETRecord associated the event with
+    nodes, by debug handle when it only resolved its debug handles, and by name
+    otherwise.
+    """
+    keys = []
+    occurrences: Dict[Tuple[str, Tuple[Any, ...]], int] = {}
+    for event in events:
+        if event.stack_traces:
+            aligned_by = ("nodes", tuple(sorted(event.stack_traces)))
+        elif (debug_handles := event.debug_handles) is not None:
+            if isinstance(debug_handles, int):
+                debug_handles = [debug_handles]
+            aligned_by = ("debug_handles", tuple(debug_handles))
+        else:
+            aligned_by = ("event", (event.name,))
+        occurrence = occurrences.get(aligned_by, 0)
+        occurrences[aligned_by] = occurrence + 1
+        keys.append((event_block_name, *aligned_by, occurrence))
+    return keys
+
+
+def _load_op_samples(
+    etdump_path: str,
+    etrecord_path: Optional[str],
+    source_time_scale: TimeScale,
+    target_time_scale: TimeScale,
+) -> Dict[_OpKey, _OpSamples]:
+    """
+    Load the latencies of the profiled operators of an ETDump, keyed by _OpKey.
+    The latencies of EventBlocks of the same name, like those of different bundled
+    inputs, are concatenated.
+    """
+    with warnings.catch_warnings():
+        # Debug data is not needed
+        warnings.simplefilter("ignore")
+        inspector = Inspector(
+            etdump_path=etdump_path,
+            etrecord=etrecord_path,
+            source_time_scale=source_time_scale,
+            target_time_scale=target_time_scale,
+        )
+
+    op_samples: Dict[_OpKey, _OpSamples] = {}
+    for event_block in inspector.event_blocks:
+        events = event_block.events
+        for key, event in zip(_gen_op_keys(event_block.name, events), events):
+            if (perf_data := event.perf_data) is None:
+                continue
+            if (samples := op_samples.get(key)) is not None:
+                samples.durations = np.concatenate([samples.durations, perf_data.data])
+            else:
+                op_samples[key] = _OpSamples(
+                    event.name, list(event.op_types), np.array(perf_data.data)
+                )
+    return op_samples
+
+
+def _bootstrap_statistic(
+    samples: np.ndarray,
+    statistic: Callable[[np.ndarray], np.ndarray],
+    num_resamples: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    statistic of each of num_resamples resamples of samples. The resamples are drawn
+    in chunks of at most _BOOTSTRAP_CHUNK_SIZE latencies, so that memory does not grow
+    with num_resamples * len(samples).
+    """
+    chunk_size = max(1, _BOOTSTRAP_CHUNK_SIZE // max(1, len(samples)))
+    stats = []
+    for start in range(0, num_resamples, chunk_size):
+        num_rows = min(chunk_size, num_resamples - start)
+        stats.append(
+            statistic(samples[rng.integers(0, len(samples), (num_rows, len(samples)))])
+        )
+    return np.concatenate(stats)
+
+
+def _bootstrap_delta_ci(
+    baseline: np.ndarray,
+    candidate: np.ndarray,
+    statistic: Callable[[np.ndarray], np.ndarray],
+    num_resamples: int,
+    confidence: float,
+    rng: np.random.Generator,
+) -> Tuple[float, float]:
+    """
+    Percentile bootstrap confidence interval of statistic(candidate) -
+    statistic(baseline), resampling both sets of samples independently.
+    """
+    baseline_stats = _bootstrap_statistic(baseline, statistic, num_resamples, rng)
+    candidate_stats = _bootstrap_statistic(candidate, statistic, num_resamples, rng)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(candidate_stats - baseline_stats, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def _compare_op_samples(
+    baseline_path: str,
+    baseline: Dict[_OpKey, _OpSamples],
+    candidate_path: str,
+    candidate: Dict[_OpKey, _OpSamples],
+    statistic: str,
+    thresholds: RegressionThresholds,
+    num_resamples: int,
+    confidence: float,
+    rng: np.random.Generator,
+) -> ETDumpComparison:
+    compute_statistic = _STATISTICS[statistic]
+    deltas = []
+    for key, candidate_samples in candidate.items():
+        if (baseline_samples := baseline.get(key)) is None:
+            continue
+        baseline_durations = baseline_samples.durations
+        candidate_durations = candidate_samples.durations
+        baseline_value = float(compute_statistic(baseline_durations))
+        candidate_value = float(compute_statistic(candidate_durations))
+        delta = candidate_value - baseline_value
+        relative_delta = delta / baseline_value if baseline_value else None
+        ci_low, ci_high = _bootstrap_delta_ci(
+            baseline_durations,
+            candidate_durations,
+            compute_statistic,
+            num_resamples,
+            confidence,
+            rng,
+        )
+        significant = min(len(baseline_durations), len(candidate_durations)) > 1 and (
+            ci_low > 0 or ci_high < 0
+        )
+        deltas.append(
+            OpLatencyDelta(
+                event_block_name=key[0],
+                event_name=candidate_samples.event_name,
+                op_types=candidate_samples.op_types,
+                key=_format_key(key),
+                baseline=baseline_value,
+                candidate=candidate_value,
+                delta=delta,
+                relative_delta=relative_delta,
+                ci_low=ci_low,
+                ci_high=ci_high,
+                significant=significant,
+                regression=significant
+                and delta > 0
+                and delta >= thresholds.absolute
+                and (relative_delta is None or relative_delta >= thresholds.relative),
+            )
+        )
+    return ETDumpComparison(
+        baseline_path=baseline_path,
+        candidate_path=candidate_path,
+        statistic=statistic,
+        deltas=deltas,
+        missing=[_format_key(key) for key in baseline if key not in candidate],
+        added=[_format_key(key) for key in candidate if key not in baseline],
+    )
+
+
+def compare_etdumps(
+    etdump_paths: Sequence[str],
+    etrecord_paths: Optional[Sequence[Optional[str]]] = None,
+    statistic: str = "p50",
+    thresholds: Optional[RegressionThresholds] = None,
+    num_resamples: int = 1000,
+    confidence: float = 0.95,
+    source_time_scale: TimeScale = TimeScale.NS,
+    target_time_scale: TimeScale = TimeScale.MS,
+    max_workers: Optional[int] = None,
+    seed: int = 0,
+) -> List[ETDumpComparison]:
+    """
+    Compare the operator latencies of ETDumps, e.g. of different devices, builds or
+    model versions, against the first one.
+
+    The ETDumps are loaded in parallel worker processes. The events of the ETDumps
+    are aligned by the op graph nodes or debug handles that their ETRecord resolves
+    them to, and by name and order in their EventBlock without ETRecord. The
+    significance of each latency change is estimated with a bootstrap confidence
+    interval over the runs of the ETDumps.
+
+    Args:
+        etdump_paths: Paths of the ETDumps, the first of which is the baseline.
+        etrecord_paths: Optional path of the ETRecord of each ETDump, or a single
+            ETRecord for all of them.
+        statistic: The statistic of the latencies of the runs that is compared: one
+            of avg, min, max, p10, p50 and p90.
+        thresholds: The increases reported as regressions. Defaults to
+            RegressionThresholds().
+        num_resamples: Number of bootstrap resamples.
+        confidence: Confidence level of the bootstrap confidence intervals.
+        source_time_scale: The time scale of the performance data retrieved from the runtime.
+        target_time_scale: The time scale of the latencies of the comparisons.
+        max_workers: The maximum number of worker processes. Defaults to the number of
+            CPUs, and 1 loads the ETDumps in the calling process.
+        seed: Seed of the bootstrap resampling.
+
+    Returns:
+        An ETDumpComparison of each ETDump after the first against the first.
+    """
+    if len(etdump_paths) < 2:
+        raise ValueError("At least 2 ETDumps are needed for a comparison.")
+    if statistic not in _STATISTICS:
+        raise ValueError(
+            f"Unsupported statistic {statistic}, expected one of {list(_STATISTICS)}"
+        )
+    if etrecord_paths is None:
+        etrecord_paths = [None] * len(etdump_paths)
+    elif len(etrecord_paths) == 1:
+        etrecord_paths = list(etrecord_paths) * len(etdump_paths)
+    elif len(etrecord_paths) != len(etdump_paths):
+        raise ValueError(
+            "Expected an ETRecord for each ETDump or a single ETRecord, got "
+            f"{len(etrecord_paths)} for {len(etdump_paths)} ETDumps."
+        )
+
+    num_etdumps = len(etdump_paths)
+    load_args = (
+        etdump_paths,
+        etrecord_paths,
+        [source_time_scale] * num_etdumps,
+        [target_time_scale] * num_etdumps,
+    )
+    max_workers = min(max_workers or os.cpu_count() or 1, num_etdumps)
+    if max_workers < 2:
+        op_samples = list(map(_load_op_samples, *load_args))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            op_samples = list(executor.map(_load_op_samples, *load_args))
+
+    rng = np.random.default_rng(seed)
+    return [
+        _compare_op_samples(
+            etdump_paths[0],
+            op_samples[0],
+            candidate_path,
+            candidate,
+            statistic,
+            thresholds or RegressionThresholds(),
+            num_resamples,
+            confidence,
+            rng,
+        )
+        for candidate_path, candidate in zip(etdump_paths[1:], op_samples[1:])
+    ]
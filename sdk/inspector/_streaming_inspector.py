@@ -0,0 +1,262 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import mmap
+import os
+import struct
+from functools import cached_property
+from typing import Dict, Iterable, List
+
+import executorch.sdk.etdump.schema_flatcc as flatcc
+
+import numpy as np
+import pandas as pd
+from executorch.sdk.etdump.serialize import (
+    deserialize_num_runs_from_etdump_flatcc,
+    deserialize_run_data_from_etdump_flatcc,
+)
+
+from executorch.sdk.inspector._inspector import (
+    _gen_scale_factors,
+    _PerfDataTable,
+    _RunGroups,
+    _RunLayout,
+    Event,
+    EventBlock,
+    PerfData,
+)
+from executorch.sdk.inspector._inspector_utils import TIME_SCALE_DICT, TimeScale
+
+
+class _StreamingRunGroup:
+    """
+    Aggregates of the durations of the runs of a RunSignature, updated run by run:
+    the count, sum, min and max of the durations of each EventSignature, and the
+    durations of the most recent runs in a ring buffer.
+    """
+
+    def __init__(self, layout: _RunLayout, window_size: int) -> None:
+        self.layout = layout
+        num_signatures = len(layout.profile_positions)
+        self.num_runs = 0
+        self.sums: np.ndarray = np.zeros(num_signatures)
+        self.mins: np.ndarray = np.full(num_signatures, np.inf)
+        self.maxs: np.ndarray = np.full(num_signatures, -np.inf)
+        # Column num_runs % window_size holds the durations of the latest run
+        self.window: np.ndarray = np.empty((num_signatures, window_size))
+
+    def add_run(self, layout: _RunLayout, run_events: List[flatcc.Event]) -> None:
+        durations, _ = layout.gen_profile_data(run_events)
+        self.sums += durations
+        np.minimum(self.mins, durations, out=self.mins)
+        np.maximum(self.maxs, durations, out=self.maxs)
+        self.window[:, self.num_runs % self.window.shape[1]] = durations
+        self.num_runs += 1
+
+    @cached_property
+    def events(self) -> List[Event]:
+        return self.layout.gen_events()
+
+    def window_durations(self) -> np.ndarray:
+        """
+        Return the durations of the runs in the window, from the oldest to the latest
+        """
+        window_size = self.window.shape[1]
+        if self.num_runs <= window_size:
+            return self.window[:, : self.num_runs]
+        return np.roll(self.window, -(self.num_runs % window_size), axis=1)
+
+
+class StreamingInspector:
+    """
+    Aggregates the performance data of ETDump runs as they are ingested, for ETDumps
+    that keep growing or keep coming, like those of soak tests.
+
+    Runs are grouped by signature like in `Inspector`. Ingesting a run updates the
+    count, average, min and max of the durations of its events, and the window of
+    the durations of the latest runs that percentiles are computed on, in time
+    proportional to its number of events.
+
+    The runs of all the ETDumps are aggregated together: use an instance per device
+    to keep their data apart.
+
+    Args:
+        window_size: Number of latest runs of each run signature that percentiles
+            are computed on.
+        source_time_scale: The time scale of the performance data retrieved from the runtime.
+        target_time_scale: The time scale to which the performance data is converted.
+    """
+
+    def __init__(
+        self,
+        window_size: int = 1000,
+        source_time_scale: TimeScale = TimeScale.NS,
+        target_time_scale: TimeScale = TimeScale.MS,
+    ) -> None:
+        if window_size < 1:
+            raise ValueError(f"window_size must be positive, got {window_size}")
+        if (source_time_scale == TimeScale.CYCLES) ^ (
+            target_time_scale == TimeScale.CYCLES
+        ):
+            raise RuntimeError(
+                "For TimeScale in cycles both the source and target time scale have to be in cycles."
+            )
+        self._source_time_scale = source_time_scale
+        self._target_time_scale = target_time_scale
+        self._scale_factor: float = (
+            TIME_SCALE_DICT[source_time_scale] / TIME_SCALE_DICT[target_time_scale]
+        )
+        self._run_groups: _RunGroups[_StreamingRunGroup] = _RunGroups(
+            lambda layout: _StreamingRunGroup(layout, window_size)
+        )
+        # Number of runs ingested from each ETDump file
+        self._ingested_file_runs: Dict[str, int] = {}
+
+    @property
+    def num_runs(self) -> int:
+        """
+        Number of runs ingested, excluding runs without events
+        """
+        return sum(group.num_runs for group in self._run_groups.groups.values())
+
+    def ingest_run_data(self, run_data: Iterable[flatcc.RunData]) -> int:
+        """
+        Ingest runs from an ETDump.
+
+        Args:
+            run_data: The runs to ingest, which can be generated as they are ingested.
+
+        Returns:
+            The number of runs that were read from run_data.
+        """
+        num_runs = 0
+        for run in run_data:
+            num_runs += 1
+            if (run_events := run.events) is None:
+                continue
+            layout, run_group = self._run_groups.get(run, run_events)
+            run_group.add_run(layout, run_events)
+        return num_runs
+
+    def ingest_etdump(self, etdump: bytes, size_prefixed: bool = True) -> int:
+        """
+        Ingest the runs of a serialized ETDump, like one received from a device.
+
+        Returns:
+            The number of runs ingested.
+        """
+        return self.ingest_run_data(
+            deserialize_run_data_from_etdump_flatcc(etdump, size_prefixed)
+        )
+
+    def ingest_etdump_file(self, etdump_path: str) -> int:
+        """
+        Ingest the runs of the ETDump at etdump_path that previous calls did not
+        ingest, so that an ETDump that the runtime keeps writing runs to can be
+        polled. The file is memory-mapped, and the runs already ingested are
+        skipped without being read.
+
+        If the ETDump now has fewer runs than were ingested from it, it was
+        rewritten, and all its runs are ingested. The runs ingested before are
+        still aggregated.
+
+        Returns:
+            The number of runs ingested, 0 if the ETDump is still being written.
+        """
+        with open(etdump_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < 4:
+                return 0
+            # The mapping outlives the file, and is unmapped once unreferenced.
+            etdump = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        # The runtime writes size prefixed ETDumps
+        if len(etdump) - 4 < struct.unpack_from("<I", etdump)[0]:
+            return 0
+
+        start = self._ingested_file_runs.get(etdump_path, 0)
+        if deserialize_num_runs_from_etdump_flatcc(etdump) < start:
+            start = 0
+        num_runs = self.ingest_run_data(
+            deserialize_run_data_from_etdump_flatcc(etdump, start=start)
+        )
+        self._ingested_file_runs[etdump_path] = start + num_runs
+        return num_runs
+
+    @property
+    def event_blocks(self) -> List[EventBlock]:
+        r"""
+        The `EventBlock`\ s of the run signatures, with the durations of the runs
+        in the window as the perf_data of their `Event`\ s.
+        """
+        event_blocks = []
+        for run_signature, group in self._run_groups.groups.items():
+            events = group.layout.gen_events(self._scale_factor)
+            table = _PerfDataTable(
+                group.window_durations()
+                / _gen_scale_factors(events, self._scale_factor)[:, np.newaxis]
+            )
+            for row, event in enumerate(events):
+                if group.layout.profile_positions[row] >= 0:
+                    event.perf_data = PerfData._from_table(table, row)
+            event_blocks.append(
+                EventBlock(
+                    name=run_signature.name,
+                    events=events,
+                    source_time_scale=self._source_time_scale,
+                    target_time_scale=self._target_time_scale,
+                    bundled_input_index=run_signature.bundled_input_index,
+                )
+            )
+        return event_blocks
+
+    def to_dataframe(self, include_units: bool = True) -> pd.DataFrame:
+        """
+        Args:
+            include_units: Whether headers should include units (default true)
+
+        Returns:
+            A pandas DataFrame with a row per profiled Event of each run signature,
+            with the count, average, min and max of its durations over all the
+            runs, and their p10, p50 and p90 over the runs in the window.
+        """
+        units = " (" + self._target_time_scale.value + ")" if include_units else ""
+        columns: Dict[str, List[np.ndarray]] = {
+            "event_block_name": [],
+            "event_name": [],
+            "count": [],
+            "avg" + units: [],
+            "min" + units: [],
+            "max" + units: [],
+            "p10" + units: [],
+            "p50" + units: [],
+            "p90" + units: [],
+        }
+        for run_signature, group in self._run_groups.groups.items():
+            events = group.events
+            profiled = np.array(group.layout.profile_positions) >= 0
+            scale_factors = _gen_scale_factors(events, self._scale_factor)[profiled]
+            percentiles = np.percentile(
+                group.window_durations()[profiled], [10, 50, 90], axis=1
+            )
+            columns["event_block_name"].append(
+                np.full(profiled.sum(), run_signature.name, dtype=object)
+            )
+            columns["event_name"].append(
+                np.array([event.name for event in events], dtype=object)[profiled]
+            )
+            columns["count"].append(np.full(profiled.sum(), group.num_runs))
+            columns["avg" + units].append(
+                group.sums[profiled] / group.num_runs / scale_factors
+            )
+            columns["min" + units].append(group.mins[profiled] / scale_factors)
+            columns["max" + units].append(group.maxs[profiled] / scale_factors)
+            for name, values in zip(("p10", "p50", "p90"), percentiles):
+                columns[name + units].append(values / scale_factors)
+        return pd.DataFrame(
+            {
+                name: np.concatenate(values) if values else []
+                for name, values in columns.items()
+            }
+        )
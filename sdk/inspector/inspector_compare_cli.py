@@ -0,0 +1,101 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import argparse
+import json
+import sys
+
+from executorch.sdk.inspector import compare_etdumps, RegressionThresholds, TimeScale
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the operator latencies of ETDumps against the first one."
+    )
+    parser.add_argument(
+        "--etdump_paths",
+        nargs="+",
+        required=True,
+        help="Provide the ETDump file paths, the first of which is the baseline.",
+    )
+    parser.add_argument(
+        "--etrecord_paths",
+        nargs="+",
+        required=False,
+        help="Provide an optional ETRecord file path for each ETDump, or one for all of them.",
+    )
+    parser.add_argument(
+        "--statistic",
+        default="p50",
+        choices=["avg", "min", "max", "p10", "p50", "p90"],
+        help="Statistic of the latencies of the runs to compare.",
+    )
+    parser.add_argument(
+        "--relative_threshold",
+        type=float,
+        default=0.05,
+        help="Minimum latency increase of a regression, as a fraction of the baseline.",
+    )
+    parser.add_argument(
+        "--absolute_threshold",
+        type=float,
+        default=0.0,
+        help="Minimum latency increase of a regression, in the target time scale.",
+    )
+    parser.add_argument("--num_resamples", type=int, default=1000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument(
+        "--source_time_scale",
+        default=TimeScale.NS.value,
+        choices=[time_scale.value for time_scale in TimeScale],
+    )
+    parser.add_argument(
+        "--target_time_scale",
+        default=TimeScale.MS.value,
+        choices=[time_scale.value for time_scale in TimeScale],
+    )
+    parser.add_argument("--max_workers", type=int, default=None)
+    parser.add_argument(
+        "--output_path",
+        required=False,
+        help="Provide an optional JSON file path for the comparisons, printed otherwise.",
+    )
+    parser.add_argument(
+        "--fail_on_regression",
+        action="store_true",
+        help="Exit with status 1 if any regression is found.",
+    )
+
+    args = parser.parse_args()
+
+    comparisons = compare_etdumps(
+        etdump_paths=args.etdump_paths,
+        etrecord_paths=args.etrecord_paths,
+        statistic=args.statistic,
+        thresholds=RegressionThresholds(
+            relative=args.relative_threshold, absolute=args.absolute_threshold
+        ),
+        num_resamples=args.num_resamples,
+        confidence=args.confidence,
+        source_time_scale=TimeScale(args.source_time_scale),
+        target_time_scale=TimeScale(args.target_time_scale),
+        max_workers=args.max_workers,
+    )
+    output = json.dumps([comparison.asdict() for comparison in comparisons], indent=2)
+    if args.output_path is None:
+        print(output)
+    else:
+        with open(args.output_path, "w") as f:
+            f.write(output)
+
+    if args.fail_on_regression and any(
+        comparison.regressions for comparison in comparisons
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
@@ -147,6 +147,64 @@ class TestEventBlock(unittest.TestCase):
                 run_counts.add((len(block.events), len(perf_data.raw)))
         self.assertSetEqual(run_counts, {(1, 2), (2, 1)})
 
+    def test_gen_from_etdump_perf_data(self) -> None:
+        """
+        Test that the perf data of the Events of an EventBlock hold the durations
+        of every run, and that their statistics match the per Event computations
+        """
+        num_runs = 5
+        run_data = []
+        for run in range(num_runs):
+            events = [
+                TestEventBlock._gen_sample_profile_event(
+                    name="op", instruction_id=0, time=(0, 1000 * (run + 1))
+                ),
+                TestEventBlock._gen_sample_profile_event(
+                    name="delegated",
+                    instruction_id=1,
+                    time=(0, 10 * (num_runs - run)),
+                    delegate_debug_id=100,
+                    delegate_debug_metadata="metadata" if run == 2 else None,
+                ),
+            ]
+            run_data.append(
+                flatcc.RunData(
+                    name="signature",
+                    bundled_input_index=-1,
+                    allocators=[],
+                    events=[
+                        flatcc.Event(
+                            allocation_event=None,
+                            debug_event=None,
+                            profile_event=profile_event,
+                        )
+                        for profile_event in events
+                    ],
+                )
+            )
+        blocks = EventBlock._gen_from_etdump(ETDumpFlatCC(version=0, run_data=run_data))
+
+        self.assertEqual(len(blocks), 1)
+        op, delegated = blocks[0].events
+        # Durations of non-delegated events are scaled from NS to MS
+        expected_raws = [
+            [0.001 * (run + 1) for run in range(num_runs)],
+            [10.0 * (num_runs - run) for run in range(num_runs)],
+        ]
+        for event, expected_raw in zip((op, delegated), expected_raws):
+            perf_data = event.perf_data
+            assert perf_data is not None
+            self.assertEqual(perf_data, PerfData(expected_raw))
+            expected_perf_data = PerfData(expected_raw)
+            for stat in ("p10", "p50", "p90", "avg", "min", "max"):
+                self.assertEqual(
+                    getattr(perf_data, stat), getattr(expected_perf_data, stat)
+                )
+        self.assertEqual(op.raw_delegate_debug_metadatas, [])
+        self.assertEqual(
+            delegated.raw_delegate_debug_metadatas, ["", "", "metadata", "", ""]
+        )
+
     def test_inspector_event_generation(self) -> None:
         """
         Test Inspector.Event derivation from various ProfileEvent cases
@@ -221,11 +279,14 @@ class TestEventBlock(unittest.TestCase):
             )
 
             is_delegated = delegate_debug_id is not None
+            # Durations of delegated events are not scaled
+            expected_durations = [
+                float(duration) / (1 if is_delegated else scale_factor)
+                for duration in durations
+            ]
             expected_event = Event(
                 name=str(delegate_debug_id) if is_delegated else name,
-                perf_data=PerfData(
-                    [float(duration) / scale_factor for duration in durations]
-                ),
+                perf_data=PerfData(expected_durations),
                 delegate_debug_identifier=delegate_debug_id,
                 is_delegated_op=is_delegated,
                 _delegate_debug_metadatas=(
@@ -239,9 +300,7 @@ class TestEventBlock(unittest.TestCase):
             if is_delegated:
                 expected_event = Event(
                     name=str(delegate_debug_id) if is_delegated else name,
-                    perf_data=PerfData(
-                        [float(duration) / scale_factor for duration in durations]
-                    ),
+                    perf_data=PerfData(expected_durations),
                     delegate_debug_identifier=delegate_debug_id,
                     is_delegated_op=is_delegated,
                     _delegate_debug_metadatas=delegate_debug_metadatas,
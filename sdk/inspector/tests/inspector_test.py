@@ -17,9 +17,15 @@ from unittest.mock import patch
 from executorch.exir import ExportedProgram
 from executorch.sdk import generate_etrecord, parse_etrecord
 from executorch.sdk.debug_format.et_schema import OperatorNode
+from executorch.sdk.etdump import schema_flatcc as flatcc
 from executorch.sdk.etrecord.tests.etrecord_test import TestETRecord
 
 from executorch.sdk.inspector import _inspector, Event, EventBlock, Inspector, PerfData
+from executorch.sdk.inspector._inspector import (
+    EventSignature,
+    InstructionEvent,
+    InstructionEventSignature,
+)
 
 
 OP_TYPE = "aten::add"
@@ -39,6 +45,41 @@ class TestInspector(unittest.TestCase):
         # Intentionally use a different way to calculate p50 from the implementation
         self.assertEqual(perfData.p50, statistics.median(random_floats))
 
+    def test_event_debug_data_is_lazy(self) -> None:
+        debug_event = flatcc.DebugEvent(
+            chain_index=0,
+            instruction_id=0,
+            debug_entry=flatcc.Value(
+                val=flatcc.ValueType.INT.value,
+                tensor=None,
+                tensor_list=None,
+                int_value=flatcc.Int(7),
+                float_value=None,
+                double_value=None,
+                bool_value=None,
+                output=None,
+            ),
+        )
+        instruction_event = InstructionEvent(
+            signature=InstructionEventSignature(instruction_id=0, chain_index=0),
+            debug_events=[debug_event],
+        )
+        with patch.object(
+            _inspector,
+            "inflate_runtime_output",
+            side_effect=_inspector.inflate_runtime_output,
+        ) as inflate:
+            event = Event._gen_from_inference_events(
+                EventSignature(instruction_id=0), [instruction_event]
+            )
+            inflate.assert_not_called()
+
+            self.assertEqual(event.debug_data, [7])
+            self.assertEqual(event.debug_data, [7])
+            inflate.assert_called_once()
+
+        self.assertEqual(Event(name="event").debug_data, [])
+
     def test_event_block_to_dataframe(self) -> None:
         eventBlock = EventBlock(name=EVENT_BLOCK_NAME, events=self._gen_random_events())
 
@@ -4,10 +4,13 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import os
 import tempfile
 import unittest
 from typing import Dict, Tuple
 
+import torch
+
 from executorch.sdk import generate_etrecord, parse_etrecord
 
 from executorch.sdk.debug_format.base_schema import (
@@ -25,6 +28,9 @@ from executorch.sdk.inspector._inspector_utils import (
     EDGE_DIALECT_GRAPH_KEY,
     find_populated_event,
     gen_graphs_from_etrecord,
+    get_scalar_type_size,
+    inflate_runtime_output,
+    map_debug_buffer,
 )
 
 
@@ -126,6 +132,69 @@ class TestInspectorUtils(unittest.TestCase):
         )
         self.assertEqual(find_populated_event(event), profile_event)
 
+    def test_get_scalar_type_size(self):
+        for scalar_type in flatcc.ScalarType:
+            torch_dtype, size = get_scalar_type_size(scalar_type)
+            self.assertEqual(size, torch_dtype.itemsize)
+        self.assertEqual(
+            get_scalar_type_size(flatcc.ScalarType.BFLOAT16), (torch.bfloat16, 2)
+        )
+
+    def test_inflate_runtime_output(self):
+        tensors = [
+            torch.randn(2, 3),
+            torch.randn(4).half(),
+            torch.randn(3).bfloat16(),
+            torch.arange(-3, 3, dtype=torch.int8),
+        ]
+        scalar_types = [
+            flatcc.ScalarType.FLOAT,
+            flatcc.ScalarType.HALF,
+            flatcc.ScalarType.BFLOAT16,
+            flatcc.ScalarType.CHAR,
+        ]
+        data = b""
+        values = []
+        for tensor, scalar_type in zip(tensors, scalar_types):
+            values.append(
+                flatcc.Value(
+                    val=flatcc.ValueType.TENSOR.value,
+                    tensor=flatcc.Tensor(
+                        scalar_type=scalar_type,
+                        sizes=list(tensor.shape),
+                        strides=list(tensor.stride()),
+                        offset=len(data),
+                    ),
+                    tensor_list=None,
+                    int_value=None,
+                    float_value=None,
+                    double_value=None,
+                    bool_value=None,
+                    output=None,
+                )
+            )
+            data += tensor.view(torch.uint8).numpy().tobytes()
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            path = os.path.join(tmpdirname, "debug_buffer.bin")
+            with open(path, "wb") as f:
+                f.write(data)
+            output_buffer = map_debug_buffer(path)
+
+            for value, tensor in zip(values, tensors):
+                inflated = inflate_runtime_output(value, output_buffer)
+                self.assertTrue(torch.equal(inflated, tensor))
+                # Writing to the tensor does not change the file
+                inflated.zero_()
+
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+
+        value = values[-1]
+        value.tensor.offset = len(data)
+        with self.assertRaises(ValueError):
+            inflate_runtime_output(value, data)
+
 
 def gen_mock_operator_graph_with_expected_map() -> (
     Tuple[OperatorGraph, Dict[int, OperatorNode]]
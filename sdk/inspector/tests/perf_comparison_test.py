@@ -0,0 +1,174 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import random
+import struct
+import tempfile
+import unittest
+from typing import Dict
+from unittest.mock import patch
+
+import executorch.sdk.etdump.schema_flatcc as flatcc
+import numpy as np
+from executorch.sdk.etdump.serialize import serialize_to_etdump_flatcc
+from executorch.sdk.inspector import (
+    compare_etdumps,
+    Event,
+    RegressionThresholds,
+    TimeScale,
+)
+from executorch.sdk.inspector._perf_comparison import (
+    _bootstrap_delta_ci,
+    _gen_op_keys,
+    _STATISTICS,
+)
+
+
+def _gen_etdump(durations: Dict[str, int], num_runs: int) -> bytes:
+    """
+    Generate a size prefixed ETDump with num_runs runs of an instruction per
+    (name, duration) of durations, whose durations vary by up to 10%.
+    """
+    run_data = []
+    for _ in range(num_runs):
+        events = []
+        time = 0
+        for instruction_id, (name, duration) in enumerate(durations.items()):
+            duration = random.randint(duration, duration * 11 // 10)
+            events.append(
+                flatcc.Event(
+                    profile_event=flatcc.ProfileEvent(
+                        name=name,
+                        chain_index=0,
+                        instruction_id=instruction_id,
+                        delegate_debug_id_int=-1,
+                        delegate_debug_id_str="",
+                        delegate_debug_metadata=None,
+                        start_time=time,
+                        end_time=time + duration,
+                    ),
+                    allocation_event=None,
+                    debug_event=None,
+                )
+            )
+            time += duration
+        run_data.append(
+            flatcc.RunData(
+                name="forward", bundled_input_index=-1, allocators=None, events=events
+            )
+        )
+    etdump = serialize_to_etdump_flatcc(
+        flatcc.ETDumpFlatCC(version=0, run_data=run_data)
+    )
+    return struct.pack("<I", len(etdump)) + etdump
+
+
+class TestPerfComparison(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(0)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def _write_etdump(self, name: str, durations: Dict[str, int]) -> str:
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(_gen_etdump(durations, num_runs=30))
+        return path
+
+    def test_compare_etdumps(self) -> None:
+        baseline = self._write_etdump("baseline.etdp", {"conv": 1000, "add": 100})
+        same = self._write_etdump("same.etdp", {"conv": 1000, "add": 100})
+        slower = self._write_etdump(
+            "slower.etdp", {"conv": 2000, "add": 100, "mul": 100}
+        )
+
+        comparisons = compare_etdumps(
+            [baseline, same, slower],
+            target_time_scale=TimeScale.NS,
+            num_resamples=200,
+            max_workers=2,
+        )
+        self.assertEqual([c.candidate_path for c in comparisons], [same, slower])
+        self.assertEqual(comparisons[0].regressions, [])
+
+        comparison = comparisons[1]
+        self.assertEqual(comparison.missing, [])
+        self.assertEqual(comparison.added, ["event:mul"])
+        deltas = {delta.key: delta for delta in comparison.deltas}
+        self.assertEqual(set(deltas), {"event:conv", "event:add"})
+        self.assertEqual(comparison.regressions, [deltas["event:conv"]])
+        conv = deltas["event:conv"]
+        self.assertTrue(conv.significant)
+        self.assertAlmostEqual(conv.delta, conv.candidate - conv.baseline)
+        self.assertGreater(conv.ci_low, 0)
+        self.assertLessEqual(conv.ci_low, conv.delta)
+        self.assertGreaterEqual(conv.ci_high, conv.delta)
+        self.assertGreater(conv.relative_delta, 0.8)
+
+        # Increases below the thresholds are not regressions.
+        comparison = compare_etdumps(
+            [baseline, slower],
+            target_time_scale=TimeScale.NS,
+            thresholds=RegressionThresholds(relative=2.0),
+            num_resamples=200,
+            max_workers=1,
+        )[0]
+        self.assertEqual(comparison.regressions, [])
+
+        # The comparisons can be serialized to JSON.
+        json.loads(json.dumps(comparison.asdict()))
+
+    def test_gen_op_keys(self) -> None:
+        events = [
+            Event(name="conv", stack_traces={"aten_convolution_default": ""}),
+            Event(name="add", debug_handles=[1, 2]),
+            Event(name="add", debug_handles=[1, 2]),
+            Event(name="Method::execute"),
+        ]
+        self.assertEqual(
+            _gen_op_keys("forward", events),
+            [
+                ("forward", "nodes", ("aten_convolution_default",), 0),
+                ("forward", "debug_handles", (1, 2), 0),
+                ("forward", "debug_handles", (1, 2), 1),
+                ("forward", "event", ("Method::execute",), 0),
+            ],
+        )
+
+    def test_bootstrap_chunks(self) -> None:
+        baseline = np.random.default_rng(1).normal(10, 1, 37)
+        candidate = np.random.default_rng(2).normal(11, 1, 41)
+
+        def ci(chunk_size: int):
+            with patch(
+                "executorch.sdk.inspector._perf_comparison._BOOTSTRAP_CHUNK_SIZE",
+                chunk_size,
+            ):
+                return _bootstrap_delta_ci(
+                    baseline,
+                    candidate,
+                    _STATISTICS["p50"],
+                    1000,
+                    0.95,
+                    np.random.default_rng(0),
+                )
+
+        # Resampling in chunks draws the same resamples as all at once.
+        expected = ci(1000 * 41)
+        for chunk_size in (1, 41 * 7, 100 * 41 + 3):
+            self.assertEqual(ci(chunk_size), expected)
+        self.assertLess(expected[0], 1)
+        self.assertGreater(expected[1], 1)
+
+    def test_invalid_arguments(self) -> None:
+        with self.assertRaises(ValueError):
+            compare_etdumps(["baseline.etdp"])
+        with self.assertRaises(ValueError):
+            compare_etdumps(["a.etdp", "b.etdp"], statistic="p99")
+        with self.assertRaises(ValueError):
+            compare_etdumps(["a.etdp", "b.etdp", "c.etdp"], etrecord_paths=["a", "b"])
@@ -0,0 +1,140 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import random
+import struct
+import tempfile
+import unittest
+from typing import List
+
+import executorch.sdk.etdump.schema_flatcc as flatcc
+import numpy as np
+import pandas as pd
+from executorch.sdk.etdump.serialize import serialize_to_etdump_flatcc
+from executorch.sdk.inspector import EventBlock, StreamingInspector
+
+
+def _gen_run_data(name: str, num_ops: int) -> flatcc.RunData:
+    events = []
+    time = 0
+    for instruction_id in range(num_ops):
+        duration = random.randint(1, 1000)
+        events.append(
+            flatcc.Event(
+                profile_event=flatcc.ProfileEvent(
+                    name=f"op_{instruction_id}",
+                    chain_index=0,
+                    instruction_id=instruction_id,
+                    delegate_debug_id_int=-1,
+                    delegate_debug_id_str="",
+                    delegate_debug_metadata=None,
+                    start_time=time,
+                    end_time=time + duration,
+                ),
+                allocation_event=None,
+                debug_event=None,
+            )
+        )
+        time += duration
+    return flatcc.RunData(
+        name=name, bundled_input_index=-1, allocators=None, events=events
+    )
+
+
+def _serialize(run_data: List[flatcc.RunData]) -> bytes:
+    etdump = serialize_to_etdump_flatcc(
+        flatcc.ETDumpFlatCC(version=0, run_data=run_data)
+    )
+    # Runtime etdumps are size prefixed.
+    return struct.pack("<I", len(etdump)) + etdump
+
+
+class TestStreamingInspector(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(0)
+        self.run_data = [
+            _gen_run_data(name, num_ops)
+            for _ in range(20)
+            for name, num_ops in (("forward", 5), ("other", 3))
+        ]
+
+    def test_ingest_matches_inspector(self) -> None:
+        window_size = 8
+        inspector = StreamingInspector(window_size=window_size)
+        for start in range(0, len(self.run_data), 7):
+            inspector.ingest_etdump(_serialize(self.run_data[start : start + 7]))
+        self.assertEqual(inspector.num_runs, len(self.run_data))
+
+        df = inspector.to_dataframe()
+        expected_blocks = EventBlock._gen_from_etdump(
+            flatcc.ETDumpFlatCC(version=0, run_data=self.run_data)
+        )
+        self.assertEqual(len(df), 8)
+        for expected_block, event_block in zip(expected_blocks, inspector.event_blocks):
+            self.assertEqual(event_block.name, expected_block.name)
+            rows = df[df["event_block_name"] == expected_block.name]
+            for row, expected_event, event in zip(
+                rows.itertuples(index=False),
+                expected_block.events,
+                event_block.events,
+            ):
+                durations = np.array(expected_event.perf_data.raw)
+                window = durations[-window_size:]
+                self.assertEqual(event.name, expected_event.name)
+                self.assertEqual(event.perf_data.raw, window.tolist())
+
+                self.assertEqual(row[1], expected_event.name)
+                self.assertEqual(row[2], len(durations))
+                self.assertAlmostEqual(row[3], durations.mean())
+                self.assertEqual(row[4], durations.min())
+                self.assertEqual(row[5], durations.max())
+                np.testing.assert_allclose(row[6:], np.percentile(window, [10, 50, 90]))
+
+    def test_ingest_etdump_file(self) -> None:
+        inspector = StreamingInspector(window_size=8)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            etdump_path = os.path.join(tmp_dir, "etdump.etdp")
+            # The runtime rewrites the whole ETDump as runs are added.
+            for num_runs, expected in ((0, 0), (10, 10), (10, 0), (40, 30)):
+                with open(etdump_path, "wb") as f:
+                    f.write(_serialize(self.run_data[:num_runs]))
+                self.assertEqual(inspector.ingest_etdump_file(etdump_path), expected)
+
+            # An ETDump that is still being written is not ingested.
+            etdump = _serialize(self.run_data)
+            with open(etdump_path, "wb") as f:
+                f.write(etdump[: len(etdump) // 2])
+            self.assertEqual(inspector.ingest_etdump_file(etdump_path), 0)
+
+        expected = StreamingInspector(window_size=8)
+        expected.ingest_run_data(self.run_data)
+        pd.testing.assert_frame_equal(inspector.to_dataframe(), expected.to_dataframe())
+
+    def test_rewritten_etdump_file(self) -> None:
+        inspector = StreamingInspector(window_size=8)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            etdump_path = os.path.join(tmp_dir, "etdump.etdp")
+            # An empty file is still being written.
+            open(etdump_path, "wb").close()
+            self.assertEqual(inspector.ingest_etdump_file(etdump_path), 0)
+            # The runtime restarted, and rewrote the ETDump with fewer runs than
+            # were ingested: all of them are new.
+            for num_runs, expected in ((30, 30), (10, 10), (20, 10)):
+                with open(etdump_path, "wb") as f:
+                    f.write(_serialize(self.run_data[:num_runs]))
+                self.assertEqual(inspector.ingest_etdump_file(etdump_path), expected)
+
+        expected = StreamingInspector(window_size=8)
+        expected.ingest_run_data(self.run_data[:30] + self.run_data[:20])
+        pd.testing.assert_frame_equal(inspector.to_dataframe(), expected.to_dataframe())
+
+    def test_empty(self) -> None:
+        df = StreamingInspector().to_dataframe(include_units=False)
+        self.assertEqual(len(df), 0)
+        self.assertIn("p50", df.columns)
+        with self.assertRaises(ValueError):
+            StreamingInspector(window_size=0)